@@ -6,7 +6,8 @@ import os
 import re
 import threading
 from dataclasses import dataclass
-from typing import Any, Dict, Optional
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional, Tuple
 
 from dotenv import load_dotenv
 from telegram import (BotCommand, InlineKeyboardButton, InlineKeyboardMarkup,
@@ -17,6 +18,10 @@ from telegram.ext import (Application, CallbackQueryHandler, CommandHandler,
                           ContextTypes, MessageHandler, filters)
 from telegram.request import HTTPXRequest
 
+from cache import parse_ttls, shared_record_cache
+from metrics import instrumented_session
+from recording import TrafficReplay, mount_traffic, open_recorder, parse_redact_fields
+from replica import LocalReplica
 from supabase_client import SupabaseClient
 
 try:
@@ -112,6 +117,9 @@ EXCLUDED_EXTRA_KEYS = {
     "img_urls",
 }
 EXCLUDED_KEY_CONTAINS = ("description", "photo", "image", "img")
+TITLE_KEYS = ("title", "name", "headline", "project_name")
+EMPTY_VALUES = (None, "", [])
+NON_NUMERIC_RE = re.compile(r"[^\d.,-]")
 
 
 def ensure_env() -> Dict[str, str]:
@@ -125,6 +133,14 @@ def ensure_env() -> Dict[str, str]:
     webapp_autostart = os.getenv("WEBAPP_AUTOSTART", "false").lower() in {"1", "true", "yes"}
     webapp_host = os.getenv("WEBAPP_HOST", "0.0.0.0")
     webapp_port = int(os.getenv("WEBAPP_PORT", "8000"))
+    cache_size = int(os.getenv("SUPABASE_CACHE_SIZE", "0"))
+    cache_ttls = parse_ttls(os.getenv("SUPABASE_CACHE_TTLS", "objects=30,owners=300"))
+    replica_path = os.getenv("SUPABASE_REPLICA_PATH") or None
+    replica_max_staleness = float(os.getenv("SUPABASE_REPLICA_MAX_STALENESS", "60"))
+    traffic_record_path = os.getenv("TRAFFIC_RECORD_PATH") or None
+    traffic_replay_path = os.getenv("TRAFFIC_REPLAY_PATH") or None
+    traffic_replay_latency_scale = float(os.getenv("TRAFFIC_REPLAY_LATENCY_SCALE", "1"))
+    traffic_redact_fields = parse_redact_fields(os.getenv("TRAFFIC_REDACT_FIELDS"))
     missing = [
         name
         for name, value in [
@@ -155,6 +171,14 @@ def ensure_env() -> Dict[str, str]:
         "WEBAPP_AUTOSTART": webapp_autostart,
         "WEBAPP_HOST": webapp_host,
         "WEBAPP_PORT": webapp_port,
+        "SUPABASE_CACHE_SIZE": cache_size,
+        "SUPABASE_CACHE_TTLS": cache_ttls,
+        "SUPABASE_REPLICA_PATH": replica_path,
+        "SUPABASE_REPLICA_MAX_STALENESS": replica_max_staleness,
+        "TRAFFIC_RECORD_PATH": traffic_record_path,
+        "TRAFFIC_REPLAY_PATH": traffic_replay_path,
+        "TRAFFIC_REPLAY_LATENCY_SCALE": traffic_replay_latency_scale,
+        "TRAFFIC_REDACT_FIELDS": traffic_redact_fields,
     }
 
 
@@ -170,6 +194,14 @@ class BotConfig:
     webapp_autostart: bool
     webapp_host: str
     webapp_port: int
+    cache_size: int
+    cache_ttls: Dict[str, float]
+    replica_path: Optional[str] = None
+    replica_max_staleness: float = 60.0
+    traffic_record_path: Optional[str] = None
+    traffic_replay_path: Optional[str] = None
+    traffic_replay_latency_scale: float = 1.0
+    traffic_redact_fields: Tuple[str, ...] = ()
 
 
 def _stringify_value(value: Any) -> str:
@@ -196,11 +228,10 @@ def _stringify_value(value: Any) -> str:
 
 def _take_value(obj: Dict[str, Any], keys: tuple[str, ...], used_keys: set[str]) -> Optional[Any]:
     for key in keys:
-        if key in obj:
-            value = obj[key]
-            if value not in (None, "", []):
-                used_keys.add(key)
-                return value
+        value = obj.get(key)
+        if value is not None and value not in EMPTY_VALUES:
+            used_keys.add(key)
+            return value
     return None
 
 
@@ -231,7 +262,7 @@ def _to_float(value: Any) -> Optional[float]:
     if isinstance(value, (int, float)):
         return float(value)
     if isinstance(value, str):
-        cleaned = re.sub(r"[^\d.,-]", "", value)
+        cleaned = NON_NUMERIC_RE.sub("", value)
         if not cleaned:
             return None
         cleaned = cleaned.replace(",", ".")
@@ -242,54 +273,60 @@ def _to_float(value: Any) -> Optional[float]:
     return None
 
 
+SUMMARY_FORMATTERS: Dict[Optional[str], Callable[[Any], str]] = {
+    None: _stringify_value,
+    "price": _format_price,
+    "area": _format_area,
+    "height": _format_height,
+}
+
+# (line prefix, alias keys, formatter) per field
+CompiledFields = Tuple[Tuple[str, Tuple[str, ...], Callable[[Any], str]], ...]
+
+
+def _compile_fields(fields: list[tuple[str, tuple[str, ...], Optional[str]]]) -> CompiledFields:
+    return tuple((f"{EMOJI_BULLET} <b>{label}:</b> ", keys, SUMMARY_FORMATTERS[formatter]) for label, keys, formatter in fields)
+
+
+# The field tables resolved once: section header (None for the identity block), then its fields.
+SUMMARY_PLAN: Tuple[Tuple[Optional[str], CompiledFields], ...] = (
+    (None, _compile_fields(IDENTITY_FIELDS)),
+    ("<b>🏠 Квартира</b>", _compile_fields(APARTMENT_FIELDS)),
+    ("<b>🏢 Дом / ЖК</b>", _compile_fields(BUILDING_FIELDS)),
+    ("<b>📍 Локация</b>", _compile_fields(LOCATION_FIELDS)),
+    ("<b>💰 Условия</b>", _compile_fields(CONDITION_FIELDS)),
+)
+
+
+@lru_cache(maxsize=4096)
+def _is_excluded_extra_key(key: str) -> bool:
+    lowered = key.lower()
+    return lowered in EXCLUDED_EXTRA_KEYS or any(part in lowered for part in EXCLUDED_KEY_CONTAINS)
+
+
 def build_object_summary(obj: Dict[str, Any]) -> str:
     lines: list[str] = []
     used_keys: set[str] = set()
-    title = _take_value(
-        obj,
-        ("title", "name", "headline", "project_name"),
-        used_keys,
-    )
+    title = _take_value(obj, TITLE_KEYS, used_keys)
     if title:
         lines.append(f"🏡 <b>{html.escape(str(title))}</b>")
 
-    identity_lines: list[str] = []
-    for label, keys, _ in IDENTITY_FIELDS:
-        value = _take_value(obj, keys, used_keys)
-        if value in (None, "", []):
-            continue
-        identity_lines.append(f"{EMOJI_BULLET} <b>{label}:</b> {html.escape(_stringify_value(value))}")
-    if identity_lines:
-        if lines:
-            lines.append("")
-        lines.extend(identity_lines)
-
-    def append_section(title_label: str, fields: list[tuple[str, tuple[str, ...], Optional[str]]]) -> None:
+    for header, fields in SUMMARY_PLAN:
         section_lines: list[str] = []
-        for label, keys, formatter in fields:
-            value = _take_value(obj, keys, used_keys)
-            if value in (None, "", []):
-                continue
-            if formatter == "price":
-                formatted = _format_price(value)
-            elif formatter == "area":
-                formatted = _format_area(value)
-            elif formatter == "height":
-                formatted = _format_height(value)
-            else:
-                formatted = _stringify_value(value)
-            section_lines.append(f"{EMOJI_BULLET} <b>{label}:</b> {html.escape(formatted)}")
+        for prefix, keys, formatter in fields:
+            for key in keys:
+                value = obj.get(key)
+                if value is not None and value not in EMPTY_VALUES:
+                    used_keys.add(key)
+                    section_lines.append(prefix + html.escape(formatter(value)))
+                    break
         if section_lines:
             if lines:
                 lines.append("")
-            lines.append(f"<b>{title_label}</b>")
+            if header:
+                lines.append(header)
             lines.extend(section_lines)
 
-    append_section("🏠 Квартира", APARTMENT_FIELDS)
-    append_section("🏢 Дом / ЖК", BUILDING_FIELDS)
-    append_section("📍 Локация", LOCATION_FIELDS)
-    append_section("💰 Условия", CONDITION_FIELDS)
-
     contact_name = _take_value(obj, CONTACT_NAME_KEYS, used_keys)
     contact_phone = _take_value(obj, CONTACT_PHONE_KEYS, used_keys)
     if contact_name or contact_phone:
@@ -312,12 +349,7 @@ def build_object_summary(obj: Dict[str, Any]) -> str:
 
     extra_lines: list[str] = []
     for key, value in obj.items():
-        if key in used_keys:
-            continue
-        lowered = key.lower()
-        if lowered in EXCLUDED_EXTRA_KEYS or any(part in lowered for part in EXCLUDED_KEY_CONTAINS):
-            continue
-        if value in (None, "", []):
+        if key in used_keys or value is None or value in EMPTY_VALUES or _is_excluded_extra_key(key):
             continue
         extra_lines.append(f"{EMOJI_BULLET} <b>{key}:</b> {html.escape(_stringify_value(value))}")
     if extra_lines:
@@ -575,11 +607,45 @@ def main() -> None:
         webapp_autostart=env["WEBAPP_AUTOSTART"],
         webapp_host=env["WEBAPP_HOST"],
         webapp_port=env["WEBAPP_PORT"],
+        cache_size=env["SUPABASE_CACHE_SIZE"],
+        cache_ttls=env["SUPABASE_CACHE_TTLS"],
+        replica_path=env["SUPABASE_REPLICA_PATH"],
+        replica_max_staleness=env["SUPABASE_REPLICA_MAX_STALENESS"],
+        traffic_record_path=env["TRAFFIC_RECORD_PATH"],
+        traffic_replay_path=env["TRAFFIC_REPLAY_PATH"],
+        traffic_replay_latency_scale=env["TRAFFIC_REPLAY_LATENCY_SCALE"],
+        traffic_redact_fields=env["TRAFFIC_REDACT_FIELDS"],
     )
     supabase_client = SupabaseClient(
         base_url=config.supabase_url,
         api_key=config.supabase_key,
         object_id_column=config.object_id_column,
+        # shows up on /metrics when the mini app server runs in this process
+        session=mount_traffic(
+            instrumented_session("bot-supabase"),
+            recorder=(
+                open_recorder(config.traffic_record_path, config.traffic_redact_fields)
+                if config.traffic_record_path
+                else None
+            ),
+            replay=(
+                TrafficReplay.load(config.traffic_replay_path, config.traffic_redact_fields)
+                if config.traffic_replay_path
+                else None
+            ),
+            latency_scale=config.traffic_replay_latency_scale,
+        ),
+        cache=shared_record_cache(config.cache_size, config.cache_ttls),
+        # the mini app server keeps this file in sync; the bot only reads it while it is fresh
+        replica=(
+            LocalReplica(
+                config.replica_path,
+                {"objects": config.object_id_column, "owners": "id"},
+                max_staleness=config.replica_max_staleness,
+            )
+            if config.replica_path
+            else None
+        ),
     )
     maybe_start_webapp_server()
 
@@ -0,0 +1,245 @@
+import asyncio
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+CacheKey = Tuple[str, str, str]
+
+
+def parse_ttls(value: Optional[str]) -> Dict[str, float]:
+    """Parse ``"objects=30,owners=300"`` into per-table TTLs (seconds)."""
+    ttls: Dict[str, float] = {}
+    for part in (value or "").split(","):
+        table, _, seconds = part.partition("=")
+        if table.strip() and seconds.strip():
+            ttls[table.strip()] = float(seconds)
+    return ttls
+
+
+@dataclass
+class RecordCache:
+    """Bounded LRU cache for single-row reads keyed by (table, column, value).
+
+    Entries expire after the table's TTL (``ttls`` or ``default_ttl``); a TTL of 0
+    disables caching for that table. Rows are copied on the way in and out so
+    callers may mutate what they get back.
+    """
+
+    max_size: int = 1024
+    default_ttl: float = 30.0
+    ttls: Dict[str, float] = field(default_factory=dict)
+    hits: int = 0
+    misses: int = 0
+    _entries: "OrderedDict[CacheKey, Tuple[float, Dict[str, Any]]]" = field(default_factory=OrderedDict, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def _ttl(self, table: str) -> float:
+        return self.ttls.get(table, self.default_ttl)
+
+    def get(self, table: str, column: str, value: Any) -> Optional[Dict[str, Any]]:
+        key = (table, column, str(value))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[1])
+
+    def set(self, table: str, column: str, value: Any, row: Dict[str, Any]) -> None:
+        ttl = self._ttl(table)
+        if ttl <= 0 or self.max_size <= 0:
+            return
+        key = (table, column, str(value))
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, dict(row))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, table: str, column: str, value: Any) -> None:
+        """Drop every cached row of ``table`` matching ``column = value``, whatever key it was read by."""
+        value = str(value)
+        with self._lock:
+            stale = [
+                key
+                for key, (_, row) in self._entries.items()
+                if key[0] == table and (key[1:] == (column, value) or str(row.get(column)) == value)
+            ]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+_shared_cache: Optional[RecordCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def shared_record_cache(max_size: int, ttls: Dict[str, float]) -> Optional[RecordCache]:
+    """The process-wide RecordCache (None if ``max_size`` is 0).
+
+    The bot and the mini app server it autostarts share this instance, so a
+    write through either client invalidates the rows the other one cached.
+    """
+    global _shared_cache
+    if max_size <= 0:
+        return None
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = RecordCache(max_size=max_size, ttls=ttls)
+        return _shared_cache
+
+
+class StaleWhileRevalidateCache:
+    """Async cache for upstream payloads with stale-while-revalidate semantics.
+
+    A payload is served from memory for ``ttl`` seconds. For the next
+    ``stale_ttl`` seconds it is still served immediately while a single
+    background task refreshes it. If a refresh or a cold load fails, the last
+    good payload is served for as long as it is kept (``max_size`` keys, LRU).
+    """
+
+    def __init__(self, ttl: float = 60.0, stale_ttl: float = 3600.0, max_size: int = 256) -> None:
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._refreshing: Dict[Hashable, "asyncio.Task[None]"] = {}
+
+    async def get(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            age = time.monotonic() - entry[0]
+            if age < self.ttl:
+                self.hits += 1
+                return copy.copy(entry[1])
+            if age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                self._refresh(key, loader)
+                return copy.copy(entry[1])
+
+        self.misses += 1
+        try:
+            value = await loader()
+        except Exception:
+            if entry is None:
+                raise
+            self.errors += 1
+            logging.warning("Serving cached payload for %s after upstream error", key, exc_info=True)
+            return copy.copy(entry[1])
+        self._store(key, value)
+        return copy.copy(value)
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _refresh(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> None:
+        if key in self._refreshing:
+            return
+
+        async def refresh() -> None:
+            try:
+                self._store(key, await loader())
+            except Exception:
+                self.errors += 1
+                logging.warning("Background refresh of %s failed; keeping cached payload", key, exc_info=True)
+            finally:
+                self._refreshing.pop(key, None)
+
+        self._refreshing[key] = asyncio.create_task(refresh())
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "size": len(self._entries),
+        }
+
+
+class BackgroundCounter:
+    """An upstream count kept in memory and refreshed by a background task.
+
+    ``get`` only waits for the upstream on the very first read; after that it
+    returns the remembered value, which ``run`` reloads every ``interval``
+    seconds and writers nudge with ``adjust`` so their own changes show up
+    before the next reload. A failed reload keeps the last value. ``on_change``
+    is called with the new value whenever it changes.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], Awaitable[int]],
+        interval: float = 30.0,
+        on_change: Optional[Callable[[int], None]] = None,
+    ) -> None:
+        self.loader = loader
+        self.interval = interval
+        self.on_change = on_change
+        self.value: Optional[int] = None
+        self.refreshed_at: Optional[float] = None
+        self.refreshes = 0
+        self.errors = 0
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> int:
+        if self.value is None:
+            async with self._lock:
+                if self.value is None:
+                    await self._load()
+        return self.value or 0
+
+    def adjust(self, delta: int) -> None:
+        if self.value is not None:
+            self._set(max(self.value + delta, 0))
+
+    async def refresh(self) -> None:
+        try:
+            await self._load()
+        except Exception:
+            self.errors += 1
+            logging.warning("Background count refresh failed; keeping %s", self.value, exc_info=True)
+
+    async def run(self) -> None:
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.interval)
+
+    async def _load(self) -> None:
+        # the upstream count wins over optimistic adjustments made meanwhile
+        self._set(await self.loader())
+        self.refreshed_at = time.monotonic()
+        self.refreshes += 1
+
+    def _set(self, value: int) -> None:
+        changed = value != self.value
+        self.value = value
+        if changed and self.on_change is not None:
+            self.on_change(value)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"value": self.value, "refreshes": self.refreshes, "errors": self.errors}
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import re
+from typing import Any, Dict, Optional
+
+import httpx
+
+from supabase_client import AsyncSupabaseClient
+
+
+def is_missing(value: Any) -> bool:
+    if value is None:
+        return True
+    if isinstance(value, str):
+        normalized = value.strip().upper()
+        return normalized in {"", "EMPTY", "NULL", "NONE"}
+    return False
+
+
+def extract_cian_digits(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        digits = re.sub(r"\D", "", str(int(value)))
+        return digits or None
+    if isinstance(value, str):
+        match = re.search(r"(\d{5,})", value)
+        if match:
+            return match.group(1)
+    return None
+
+
+def build_cian_listing_url(object_id: Any) -> Optional[str]:
+    if object_id is None:
+        return None
+    digits = "".join(ch for ch in str(object_id) if ch.isdigit())
+    if not digits:
+        return None
+    return f"https://www.cian.ru/rent/flat/{digits}/"
+
+
+def cian_identifier_patch(item: Dict[str, Any], object_id: Any) -> Dict[str, Any]:
+    """Return the cian_id/cian_url values ``item`` is missing (empty dict if none)."""
+    cian_id_existing = item.get("cian_id")
+    cian_url_existing = item.get("cian_url")
+
+    digits = None if is_missing(cian_id_existing) else extract_cian_digits(cian_id_existing)
+    if not digits:
+        for candidate in (
+            item.get("external_id"),
+            object_id,
+            cian_url_existing,
+        ):
+            digits = extract_cian_digits(candidate)
+            if digits:
+                break
+
+    url = None if is_missing(cian_url_existing) else cian_url_existing
+    if not url and digits:
+        url = build_cian_listing_url(digits)
+
+    patch: Dict[str, Any] = {}
+    if digits and (is_missing(cian_id_existing) or str(cian_id_existing) != digits):
+        patch["cian_id"] = digits
+    if url and is_missing(cian_url_existing):
+        patch["cian_url"] = url
+    return patch
+
+
+class CianIdentifierQueue:
+    """Collects cian_id/cian_url corrections from read paths and writes them in the background.
+
+    Corrections are de-duplicated per object and flushed every ``flush_interval``
+    seconds, or sooner once ``chunk_size`` are pending; each chunk is a single
+    ``patch_records`` call. The write only touches existing rows, and ``discard``
+    drops the correction of an object that has just been deleted.
+    """
+
+    def __init__(
+        self,
+        client: AsyncSupabaseClient,
+        chunk_size: int = 100,
+        flush_interval: float = 2.0,
+        max_pending: int = 10000,
+    ) -> None:
+        self.client = client
+        self.chunk_size = chunk_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._wakeup = asyncio.Event()
+
+    def submit(self, object_id: Any, patch: Dict[str, Any]) -> None:
+        key = str(object_id)
+        if key not in self._pending and len(self._pending) >= self.max_pending:
+            return
+        self._pending.setdefault(key, {}).update(patch)
+        if len(self._pending) >= self.chunk_size:
+            self._wakeup.set()
+
+    def discard(self, object_id: Any) -> None:
+        self._pending.pop(str(object_id), None)
+
+    async def flush(self) -> int:
+        written = 0
+        while self._pending:
+            keys = list(self._pending)[: self.chunk_size]
+            rows = [{self.client.object_id_column: key, **self._pending.pop(key)} for key in keys]
+            try:
+                written += await self.client.patch_records(self.client.table, rows, self.client.object_id_column)
+            except httpx.HTTPError as exc:
+                logging.warning("Не удалось сохранить cian данные для %s объектов: %s", len(rows), exc)
+        return written
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
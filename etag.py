@@ -0,0 +1,67 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+
+def weak_etag(body: bytes) -> str:
+    """Weak validator for a rendered response body.
+
+    Weak because the body may still be gzipped on the way out, and a strong
+    ETag must differ between the identity and the compressed representation.
+    """
+    return 'W/"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison as RFC 9110 prescribes for If-None-Match."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    opaque = etag.removeprefix("W/")
+    return any(tag.removeprefix("W/") == opaque for tag in candidates)
+
+
+def rows_fingerprint(rows: Iterable[Dict[str, Any]], id_column: str) -> Optional[str]:
+    """Digest of the (id, updated_at) pairs of ``rows``, or None if any row has no updated_at."""
+    digest = hashlib.sha256()
+    for row in rows:
+        updated_at = row.get("updated_at")
+        if updated_at is None:
+            return None
+        digest.update(f"{row.get(id_column)}\x1f{updated_at}\x1e".encode())
+    return digest.hexdigest()
+
+
+class ValidatorCache:
+    """Remembers the ETag served for a resource together with the row fingerprint it was built from.
+
+    When a client revalidates, comparing a freshly read fingerprint (only the ID
+    and ``updated_at`` columns) with the remembered one is enough to answer 304
+    without loading and serializing the full rows.
+    """
+
+    def __init__(self, max_size: int = 2048) -> None:
+        self.max_size = max_size
+        self._entries: "OrderedDict[Hashable, Tuple[str, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Tuple[str, str]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: Hashable, fingerprint: str, etag: str) -> None:
+        with self._lock:
+            self._entries[key] = (fingerprint, etag)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,90 @@
+import asyncio
+import json
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Set, Tuple
+
+
+SSE_RETRY_MS = 5000
+
+# (event id, encoded frame); None tells a subscriber to disconnect
+Frame = Optional[Tuple[int, str]]
+
+
+class EventBroker:
+    """Fan-out of server events to Server-Sent Events clients.
+
+    ``publish`` never blocks: every connected client has a bounded queue, and
+    a client that falls that far behind is disconnected so it reconnects and
+    resynchronises instead of holding memory. The last ``history`` events are
+    kept so a client reconnecting with ``Last-Event-ID`` gets what it missed;
+    if that is no longer possible it receives a ``resync`` event and should
+    reload its data.
+    """
+
+    def __init__(self, history: int = 256, queue_size: int = 256, heartbeat: float = 15.0) -> None:
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+        self.published = 0
+        self.disconnected = 0
+        self._last_id = 0
+        self._history: Deque[Tuple[int, str]] = deque(maxlen=history)
+        self._subscribers: Set["asyncio.Queue[Frame]"] = set()
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, event: str, data: Any) -> None:
+        self._last_id += 1
+        payload = json.dumps(data, ensure_ascii=False, default=str)
+        frame = (self._last_id, f"id: {self._last_id}\nevent: {event}\ndata: {payload}\n\n")
+        self._history.append(frame)
+        self.published += 1
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                self._subscribers.discard(queue)
+                self.disconnected += 1
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    async def stream(self, last_event_id: Optional[str] = None) -> AsyncIterator[str]:
+        queue: "asyncio.Queue[Frame]" = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        # anything published from here on is in the queue; older events come from the history
+        sent, frames = self._replay(last_event_id) if last_event_id is not None else (self._last_id, [])
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+            for frame in frames:
+                yield frame
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout=self.heartbeat)
+                except asyncio.TimeoutError:
+                    # comment line keeps proxies from closing an idle connection
+                    yield ": ping\n\n"
+                    continue
+                if item is None:
+                    return
+                event_id, frame = item
+                if event_id > sent:
+                    sent = event_id
+                    yield frame
+        finally:
+            self._subscribers.discard(queue)
+
+    def stats(self) -> Dict[str, int]:
+        return {"subscribers": self.subscribers, "published": self.published, "disconnected": self.disconnected}
+
+    def _replay(self, last_event_id: str) -> Tuple[int, List[str]]:
+        try:
+            since = int(last_event_id)
+        except ValueError:
+            since = -1
+        oldest = self._history[0][0] if self._history else self._last_id + 1
+        if since < oldest - 1 or since > self._last_id:
+            # missed events are gone (or the server restarted): the client must reload
+            return self._last_id, ["event: resync\ndata: {}\n\n"]
+        return self._last_id, [frame for event_id, frame in self._history if event_id > since]
@@ -0,0 +1,504 @@
+import bisect
+import json
+import re
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, TypeVar
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+SUPABASE_PATH_RE = re.compile(r"^/rest/v1/((?:rpc/)?[\w.]+)")
+TELEGRAM_PATH_RE = re.compile(r"^/bot[^/]+/(\w+)")
+SERVER_TIMING_NAME_RE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Sequence[str]) -> LabelValues:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} ожидает метки {self.labelnames}")
+        return tuple(str(label) for label in labels)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, *labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: bucket counts (non-cumulative, last one is +Inf), sum
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        key = self._key(labels)
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[slot] += 1
+            total[0] += value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), total[0])) for key, (counts, total) in self._values.items())
+        lines: List[str] = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+_M = TypeVar("_M", bound=_Metric)
+
+
+class Registry:
+    """Metrics in the Prometheus text exposition format, without the client library.
+
+    ``on_collect`` callbacks run right before rendering, for gauges that are
+    cheaper to read on demand (cache sizes, queue lengths) than to keep current.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def on_collect(self, callback: Callable[[], None]) -> None:
+        self._collectors.append(callback)
+
+    def render(self) -> str:
+        for callback in self._collectors:
+            callback()
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric: _M) -> _M:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing  # type: ignore[return-value]
+        self._metrics[metric.name] = metric
+        return metric
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "miniapp_http_request_duration_seconds",
+    "Время обработки запросов к мини-приложению по маршрутам.",
+    ("route", "method", "status"),
+)
+UPSTREAM_DURATION = REGISTRY.histogram(
+    "miniapp_upstream_request_duration_seconds",
+    "Время исходящих запросов (до конца тела ответа) по адресатам.",
+    ("target", "method"),
+)
+UPSTREAM_RESPONSES = REGISTRY.counter(
+    "miniapp_upstream_responses_total",
+    "Ответы внешних сервисов по коду статуса.",
+    ("target", "method", "status"),
+)
+UPSTREAM_ERRORS = REGISTRY.counter(
+    "miniapp_upstream_errors_total",
+    "Исходящие запросы, не получившие ответа: timeout, connect или network.",
+    ("target", "method", "error"),
+)
+POOL_IN_USE = REGISTRY.gauge(
+    "miniapp_upstream_pool_in_use",
+    "Исходящие запросы, занимающие соединение пула прямо сейчас.",
+    ("pool",),
+)
+POOL_LIMIT = REGISTRY.gauge(
+    "miniapp_upstream_pool_limit",
+    "Размер пула соединений (max_connections).",
+    ("pool",),
+)
+
+
+def upstream_target(url: "httpx.URL | str") -> str:
+    """Low-cardinality name of an outbound call: ``supabase:objects``, ``cian:/v1/get-order``, ``telegram:sendMessage``."""
+    parts = urlsplit(str(url))
+    path = parts.path or "/"
+    match = SUPABASE_PATH_RE.match(path)
+    if match:
+        return f"supabase:{match.group(1)}"
+    match = TELEGRAM_PATH_RE.match(path)
+    if match:
+        # never the path itself: it carries the bot token
+        return f"telegram:{match.group(1)}"
+    if "cian" in (parts.hostname or ""):
+        return f"cian:{path}"
+    return parts.hostname or "unknown"
+
+
+@dataclass
+class UpstreamCall:
+    """One outbound call made while handling a request; ``status`` is None when no response arrived."""
+
+    target: str
+    method: str
+    status: Optional[int]
+    duration: float
+    bytes: int = 0
+    error: Optional[str] = None
+
+    @property
+    def failed(self) -> bool:
+        return self.status is None or self.status == 429 or self.status >= 500
+
+
+# Calls of the request being handled; the list is shared with tasks and threads copied from its context.
+_request_calls: ContextVar[Optional[List[UpstreamCall]]] = ContextVar("upstream_calls", default=None)
+
+
+def _record_call(call: UpstreamCall) -> None:
+    calls = _request_calls.get()
+    if calls is not None:
+        calls.append(call)
+
+
+def summarize_calls(calls: Sequence[UpstreamCall]) -> List[Dict[str, Any]]:
+    """Group calls by target and method; a call made after a failed one to the same target counts as a retry."""
+    groups: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    failed_before: Dict[Tuple[str, str], bool] = {}
+    for call in calls:
+        key = (call.target, call.method)
+        group = groups.setdefault(
+            key, {"target": call.target, "method": call.method, "calls": 0, "retries": 0, "duration": 0.0, "bytes": 0}
+        )
+        group["calls"] += 1
+        group["retries"] += int(failed_before.get(key, False))
+        group["duration"] += call.duration
+        group["bytes"] += call.bytes
+        failed_before[key] = call.failed
+    return list(groups.values())
+
+
+def server_timing_header(calls: Sequence[UpstreamCall], total: float) -> str:
+    """``Server-Timing`` value: one entry per upstream target plus ``app`` for the whole handler (ms)."""
+    entries = [f"app;dur={total * 1000:.1f}"]
+    for group in summarize_calls(calls):
+        name = SERVER_TIMING_NAME_RE.sub("-", f"{group['target']}-{group['method']}").strip("-").lower()
+        description = f"{group['method']} {group['target']} x{group['calls']}, {group['bytes']} B"
+        if group["retries"]:
+            description += f", retries {group['retries']}"
+        entries.append(f'{name};dur={group["duration"] * 1000:.1f};desc="{description.replace(chr(34), "")}"')
+    return ", ".join(entries)
+
+
+def _error_kind(exc: BaseException) -> str:
+    if isinstance(exc, (httpx.TimeoutException, requests.Timeout)):
+        return "timeout"
+    if isinstance(exc, (httpx.ConnectError, requests.ConnectionError)):
+        return "connect"
+    return "network"
+
+
+class _ObservedStream(httpx.AsyncByteStream):
+    def __init__(self, stream: httpx.AsyncByteStream, on_close: Callable[[int], None]) -> None:
+        self._stream = stream
+        self._on_close: Optional[Callable[[int], None]] = on_close
+        self._bytes = 0
+
+    async def __aiter__(self):  # type: ignore[override]
+        async for chunk in self._stream:
+            self._bytes += len(chunk)
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if self._on_close is not None:
+                on_close, self._on_close = self._on_close, None
+                on_close(self._bytes)
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """httpx transport wrapper that records latency, status codes, errors and pool usage."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, pool: str, max_connections: Optional[int] = None) -> None:
+        self.transport = transport
+        self.pool = pool
+        POOL_IN_USE.set(0, pool)
+        if max_connections is not None:
+            POOL_LIMIT.set(max_connections, pool)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        target = upstream_target(request.url)
+        started = time.perf_counter()
+        POOL_IN_USE.inc(self.pool)
+        try:
+            response = await self.transport.handle_async_request(request)
+        except BaseException as exc:
+            POOL_IN_USE.dec(self.pool)
+            if isinstance(exc, Exception):
+                error = _error_kind(exc)
+                UPSTREAM_ERRORS.inc(target, request.method, error)
+                _record_call(UpstreamCall(target, request.method, None, time.perf_counter() - started, error=error))
+            raise
+        UPSTREAM_RESPONSES.inc(target, request.method, str(response.status_code))
+
+        def finished(size: int) -> None:
+            duration = time.perf_counter() - started
+            POOL_IN_USE.dec(self.pool)
+            UPSTREAM_DURATION.observe(duration, target, request.method)
+            _record_call(UpstreamCall(target, request.method, response.status_code, duration, size))
+
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_ObservedStream(response.stream, finished),  # type: ignore[arg-type]
+            extensions=response.extensions,
+            request=request,
+        )
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+def instrumented_session(pool: str, session: Optional[requests.Session] = None) -> requests.Session:
+    """A requests session whose calls are recorded like InstrumentedTransport's (errors via ``send``)."""
+    session = session or requests.Session()
+    send = session.send
+
+    def observed_send(request: requests.PreparedRequest, **kwargs):  # type: ignore[no-untyped-def]
+        target = upstream_target(request.url or "")
+        method = request.method or "GET"
+        started = time.perf_counter()
+        try:
+            response = send(request, **kwargs)
+        except requests.RequestException as exc:
+            error = _error_kind(exc)
+            UPSTREAM_ERRORS.inc(target, method, error)
+            _record_call(UpstreamCall(target, method, None, time.perf_counter() - started, error=error))
+            raise
+        duration = time.perf_counter() - started
+        UPSTREAM_DURATION.observe(duration, target, method)
+        UPSTREAM_RESPONSES.inc(target, method, str(response.status_code))
+        size = len(response.content) if not kwargs.get("stream") else int(response.headers.get("content-length") or 0)
+        _record_call(UpstreamCall(target, method, response.status_code, duration, size))
+        return response
+
+    session.send = observed_send  # type: ignore[method-assign]
+    return session
+
+
+class MetricsMiddleware:
+    """Records request duration per route template (``/api/objects/{object_id}``, not the raw path)."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = "500"
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            # unmatched paths (scanners, typos) share one label to keep cardinality bounded
+            template = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - started, template, scope["method"], status)
+
+
+class ServerTimingMiddleware:
+    """Adds ``Server-Timing`` with the upstream calls made while handling each request.
+
+    With ``debug`` on, ``?debug=timing`` also appends the individual calls to the
+    body: as a ``_timing`` key of a JSON object, or as a last ``{"_timing": ...}``
+    line of an NDJSON stream (whose later pages are fetched after the headers
+    have already gone out). Such a body differs on every request, so debug
+    requests are never answered with 304 and their responses carry no ETag.
+    """
+
+    def __init__(self, app: ASGIApp, debug: bool = False) -> None:
+        self.app = app
+        self.debug = debug
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        calls: List[UpstreamCall] = []
+        token = _request_calls.set(calls)
+        started = time.perf_counter()
+        debug = self.debug and b"debug=timing" in scope.get("query_string", b"")
+        if debug:
+            scope = {**scope, "headers": [(k, v) for k, v in scope.get("headers", []) if k.lower() != b"if-none-match"]}
+        start_message: Optional[Message] = None
+        content_type = b""
+        body: List[bytes] = []
+
+        def trailer() -> Dict[str, Any]:
+            return {
+                "total_ms": round((time.perf_counter() - started) * 1000, 1),
+                "calls": [asdict(call) for call in calls],
+                "summary": summarize_calls(calls),
+            }
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start_message, content_type
+            if message["type"] == "http.response.start":
+                dropped = (b"server-timing", b"etag") if debug else (b"server-timing",)
+                headers = [(k, v) for k, v in message.get("headers", []) if k.lower() not in dropped]
+                headers.append((b"server-timing", server_timing_header(calls, time.perf_counter() - started).encode()))
+                message = {**message, "headers": headers}
+                content_type = next((v for k, v in headers if k.lower() == b"content-type"), b"")
+                if debug and content_type.startswith(b"application/json"):
+                    start_message = message  # held back until the body can be rewritten
+                    return
+                await send(message)
+                return
+            if message["type"] == "http.response.body" and debug:
+                if start_message is not None:
+                    body.append(message.get("body", b""))
+                    if message.get("more_body"):
+                        return
+                    rewritten = _json_with_timing(b"".join(body), trailer())
+                    await send(_with_content_length(start_message, rewritten))
+                    await send({"type": "http.response.body", "body": rewritten})
+                    return
+                if content_type.startswith(b"application/x-ndjson") and not message.get("more_body"):
+                    line = json.dumps({"_timing": trailer()}, ensure_ascii=False).encode() + b"\n"
+                    message = {**message, "body": message.get("body", b"") + line}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_calls.reset(token)
+
+
+def _json_with_timing(body: bytes, timing: Dict[str, Any]) -> bytes:
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return body
+    if not isinstance(payload, dict):
+        return body
+    payload["_timing"] = timing
+    return json.dumps(payload, ensure_ascii=False, default=str).encode()
+
+
+def _with_content_length(message: Message, body: bytes) -> Message:
+    headers = [(k, v) for k, v in message["headers"] if k.lower() != b"content-length"]
+    headers.append((b"content-length", str(len(body)).encode()))
+    return {**message, "headers": headers}
+
+
+def set_gauges(gauge: Gauge, values: Iterable[Tuple[str, float]]) -> None:
+    for label, value in values:
+        gauge.set(value, label)
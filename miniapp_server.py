@@ -1,19 +1,43 @@
+import asyncio
+import json
 import os
-from collections import OrderedDict
+from contextlib import asynccontextmanager
 import logging
 import re
+import time
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
 import html
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, Query
-from fastapi.responses import FileResponse
-from fastapi.staticfiles import StaticFiles
-import requests
-from requests import HTTPError, ConnectionError as RequestsConnectionError
-
-from supabase_client import SupabaseClient
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+import anyio.to_thread
+import httpx
+from httpx import HTTPStatusError, ConnectError
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from cache import BackgroundCounter, StaleWhileRevalidateCache, parse_ttls, shared_record_cache
+from cian_identifiers import CianIdentifierQueue, build_cian_listing_url, cian_identifier_patch, extract_cian_digits
+from events import EventBroker
+from etag import ValidatorCache, etag_matches, rows_fingerprint, weak_etag
+from metrics import CONTENT_TYPE, REGISTRY, InstrumentedTransport, MetricsMiddleware, ServerTimingMiddleware, set_gauges
+from singleflight import SingleFlight
+from recording import (
+    RecordingMiddleware,
+    RecordingTransport,
+    ReplayTransport,
+    TrafficReplay,
+    open_recorder,
+    parse_redact_fields,
+)
+from replica import LocalReplica, ReplicaSyncer
+from search_index import AddressIndex, PriceIndex
+from static_assets import AssetPipeline
+from supabase_client import AsyncSupabaseClient
+from telegram_outbox import TelegramOutbox
 
 load_dotenv()
 
@@ -28,38 +52,243 @@ CIAN_API_TOKEN = os.getenv("CIAN_API_TOKEN")
 SHOWING_BOT_TOKEN = os.getenv("SHOWING_BOT_TOKEN")
 SHOWING_CHAT_ID = os.getenv("SHOWING_CHAT_ID")
 SHOWING_THREAD_ID = os.getenv("SHOWING_THREAD_ID")
+SUPABASE_POOL_MAX_CONNECTIONS = int(os.getenv("SUPABASE_POOL_MAX_CONNECTIONS", "100"))
+SUPABASE_POOL_MAX_KEEPALIVE = int(os.getenv("SUPABASE_POOL_MAX_KEEPALIVE", "20"))
+# rows per apply_patches() call of the status sync: one request per chunk, the rows travel in the body
+CIAN_SYNC_CHUNK_SIZE = 500
+API_GZIP_MIN_SIZE = int(os.getenv("API_GZIP_MIN_SIZE", "1024"))
+BATCH_MAX_IDS = 500
+TELEGRAM_API_BASE_URL = os.getenv("TELEGRAM_API_BASE_URL", "https://api.telegram.org")
+TELEGRAM_OUTBOX_DB = os.getenv("TELEGRAM_OUTBOX_DB") or None
+TELEGRAM_OUTBOX_SIZE = int(os.getenv("TELEGRAM_OUTBOX_SIZE", "1000"))
+CIAN_NOTICE_MERGE_WINDOW = float(os.getenv("CIAN_NOTICE_MERGE_WINDOW", "30"))
+OBJECT_CARD_COLUMNS = tuple(
+    column.strip()
+    for column in os.getenv(
+        "OBJECT_CARD_COLUMNS",
+        "address,full_address,location,complex_name,price,price_total,price_rub,status,moderator,owners_id",
+    ).split(",")
+    if column.strip()
+)
+# identifiers, the keyset cursor and the cian_id/cian_url backfill need these in every view
+REQUIRED_LIST_COLUMNS = (OBJECT_ID_COLUMN, "id", "external_id", "updated_at", "cian_id", "cian_url")
+VALIDATOR_SELECT = ",".join(dict.fromkeys([OBJECT_ID_COLUMN, "updated_at"]))
+FIELD_NAME_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+CIAN_CACHE_TTL = float(os.getenv("CIAN_CACHE_TTL", "60"))
+CIAN_CACHE_STALE_TTL = float(os.getenv("CIAN_CACHE_STALE_TTL", "3600"))
+SUPABASE_CACHE_SIZE = int(os.getenv("SUPABASE_CACHE_SIZE", "0"))
+SUPABASE_CACHE_TTLS = parse_ttls(os.getenv("SUPABASE_CACHE_TTLS", "objects=30,owners=300"))
+MODERATION_COUNT_MODE = os.getenv("MODERATION_COUNT_MODE", "exact")
+MODERATION_COUNT_REFRESH = float(os.getenv("MODERATION_COUNT_REFRESH", "30"))
+MODERATION_FILTER = {"moderator": "eq.false"}
+EVENTS_POLL_INTERVAL = float(os.getenv("EVENTS_POLL_INTERVAL", "30"))
+EVENTS_BATCH_SIZE = 200
+SERVER_TIMING_DEBUG = os.getenv("SERVER_TIMING_DEBUG", "false").lower() in {"1", "true", "yes"}
+TRAFFIC_RECORD_PATH = os.getenv("TRAFFIC_RECORD_PATH") or None
+TRAFFIC_REPLAY_PATH = os.getenv("TRAFFIC_REPLAY_PATH") or None
+TRAFFIC_REPLAY_LATENCY_SCALE = float(os.getenv("TRAFFIC_REPLAY_LATENCY_SCALE", "1"))
+TRAFFIC_REDACT_FIELDS = parse_redact_fields(os.getenv("TRAFFIC_REDACT_FIELDS"))
+SUPABASE_REPLICA_PATH = os.getenv("SUPABASE_REPLICA_PATH") or None
+SUPABASE_REPLICA_MAX_STALENESS = float(os.getenv("SUPABASE_REPLICA_MAX_STALENESS", "60"))
+SUPABASE_REPLICA_SYNC_INTERVAL = float(os.getenv("SUPABASE_REPLICA_SYNC_INTERVAL", "10"))
+SUPABASE_REPLICA_RECONCILE_INTERVAL = float(os.getenv("SUPABASE_REPLICA_RECONCILE_INTERVAL", "600"))
 
 if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
     raise RuntimeError("SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set for the mini app server.")
-
-supabase_client = SupabaseClient(
+if MODERATION_COUNT_MODE not in {"exact", "planned", "estimated"}:
+    raise RuntimeError("MODERATION_COUNT_MODE must be exact, planned or estimated.")
+if TRAFFIC_RECORD_PATH and TRAFFIC_REPLAY_PATH:
+    raise RuntimeError("Set either TRAFFIC_RECORD_PATH or TRAFFIC_REPLAY_PATH, not both.")
+
+traffic_recorder = open_recorder(TRAFFIC_RECORD_PATH, TRAFFIC_REDACT_FIELDS) if TRAFFIC_RECORD_PATH else None
+traffic_replay = TrafficReplay.load(TRAFFIC_REPLAY_PATH, TRAFFIC_REDACT_FIELDS) if TRAFFIC_REPLAY_PATH else None
+
+
+def _upstream_transport(transport: httpx.AsyncBaseTransport) -> httpx.AsyncBaseTransport:
+    """The network, or its recording/replay when TRAFFIC_RECORD_PATH / TRAFFIC_REPLAY_PATH is set."""
+    if traffic_replay is not None:
+        return ReplayTransport(traffic_replay, TRAFFIC_REPLAY_LATENCY_SCALE)
+    if traffic_recorder is not None:
+        return RecordingTransport(transport, traffic_recorder)
+    return transport
+
+
+# Identical Supabase/CIAN requests in flight at the same time share one upstream call.
+upstream_flight = SingleFlight()
+replica = (
+    LocalReplica(
+        SUPABASE_REPLICA_PATH,
+        {"objects": OBJECT_ID_COLUMN, "owners": "id"},
+        max_staleness=SUPABASE_REPLICA_MAX_STALENESS,
+        indexes={"objects": [AddressIndex(), PriceIndex()]},
+        filter_columns={"objects": list(MODERATION_FILTER)},
+    )
+    if SUPABASE_REPLICA_PATH
+    else None
+)
+supabase_client = AsyncSupabaseClient(
     base_url=SUPABASE_URL,
     api_key=SUPABASE_SERVICE_ROLE_KEY,
     object_id_column=OBJECT_ID_COLUMN,
+    max_connections=SUPABASE_POOL_MAX_CONNECTIONS,
+    max_keepalive_connections=SUPABASE_POOL_MAX_KEEPALIVE,
+    cache=shared_record_cache(SUPABASE_CACHE_SIZE, SUPABASE_CACHE_TTLS),
+    flight=upstream_flight,
+    replica=replica,
+    metrics_pool="supabase",
+    wrap_transport=_upstream_transport,
+)
+# Shared keep-alive client for CIAN and Telegram calls.
+HTTP_POOL_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+http_client = httpx.AsyncClient(
+    timeout=15,
+    transport=InstrumentedTransport(
+        _upstream_transport(httpx.AsyncHTTPTransport(limits=HTTP_POOL_LIMITS)), "shared", HTTP_POOL_LIMITS.max_connections
+    ),
+)
+cian_identifier_queue = CianIdentifierQueue(supabase_client)
+cian_cache = StaleWhileRevalidateCache(ttl=CIAN_CACHE_TTL, stale_ttl=CIAN_CACHE_STALE_TTL)
+event_broker = EventBroker()
+moderation_counter = BackgroundCounter(
+    lambda: supabase_client.count_records("objects", MODERATION_FILTER, mode=MODERATION_COUNT_MODE),
+    interval=MODERATION_COUNT_REFRESH,
+    on_change=lambda count: event_broker.publish("moderation-count", {"count": count}),
 )
-app = FastAPI(title="HAPPINESS CRM Mini App")
+etag_validators = ValidatorCache()
+telegram_outbox = TelegramOutbox(
+    http_client,
+    base_url=TELEGRAM_API_BASE_URL,
+    max_pending=TELEGRAM_OUTBOX_SIZE,
+    merge_window=CIAN_NOTICE_MERGE_WINDOW,
+    db_path=TELEGRAM_OUTBOX_DB,
+)
+telegram_outbox.register("notify", NOTIFY_BOT_TOKEN, NOTIFY_CHAT_ID, NOTIFY_THREAD_ID)
+telegram_outbox.register("showing", SHOWING_BOT_TOKEN, SHOWING_CHAT_ID, SHOWING_THREAD_ID)
+
+THREADPOOL_TOKENS = REGISTRY.gauge(
+    "miniapp_threadpool_tokens", "Потоки пула run_in_threadpool: занятые (in_use) и всего (limit).", ("state",)
+)
+COMPONENT_STATS = REGISTRY.gauge(
+    "miniapp_component_stat",
+    "Счётчики внутренних компонентов (кэши, single-flight, очередь Telegram, SSE, счётчик модерации).",
+    ("component", "stat"),
+)
+
+
+def _collect_runtime_metrics() -> None:
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    set_gauges(THREADPOOL_TOKENS, [("in_use", limiter.borrowed_tokens), ("limit", limiter.total_tokens)])
+    components: Dict[str, Dict[str, Any]] = {
+        "cian_cache": cian_cache.stats(),
+        "singleflight": upstream_flight.stats(),
+        "telegram_outbox": telegram_outbox.stats(),
+        "events": event_broker.stats(),
+        "moderation_counter": moderation_counter.stats(),
+    }
+    if supabase_client.cache is not None:
+        components["record_cache"] = supabase_client.cache.stats()
+    if traffic_replay is not None:
+        components["traffic_replay"] = traffic_replay.stats()
+    for component, stats in components.items():
+        for stat, value in stats.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                COMPONENT_STATS.set(value, component, stat)
+
+
+REGISTRY.on_collect(_collect_runtime_metrics)
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    writer = asyncio.create_task(cian_identifier_queue.run())
+    sender = asyncio.create_task(telegram_outbox.run())
+    counter = asyncio.create_task(moderation_counter.run())
+    watcher = asyncio.create_task(watch_upstream_changes())
+    syncer = None
+    if replica is not None:
+        syncer = asyncio.create_task(
+            ReplicaSyncer(
+                supabase_client,
+                replica,
+                interval=SUPABASE_REPLICA_SYNC_INTERVAL,
+                reconcile_interval=SUPABASE_REPLICA_RECONCILE_INTERVAL,
+            ).run()
+        )
+    yield
+    writer.cancel()
+    sender.cancel()
+    counter.cancel()
+    watcher.cancel()
+    if syncer is not None:
+        syncer.cancel()
+    await cian_identifier_queue.flush()
+    await telegram_outbox.flush()
+    await supabase_client.aclose()
+    await http_client.aclose()
+    if replica is not None:
+        replica.close()
+
+
+app = FastAPI(title="HAPPINESS CRM Mini App", lifespan=lifespan)
 
 WEBAPP_DIR = Path(__file__).resolve().parent / "webapp"
 if not WEBAPP_DIR.exists():
     raise RuntimeError("webapp directory not found. Make sure /webapp exists with index.html.")
 
-app.mount("/static", StaticFiles(directory=WEBAPP_DIR), name="static")
+static_assets = AssetPipeline(WEBAPP_DIR).build()
 
 
-def _call_cian(path: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+class ApiGZipMiddleware:
+    """gzip for JSON API responses only.
+
+    Static assets are precompressed, and streamed NDJSON would sit in the
+    compressor instead of reaching the client page by page, so both pass through.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, exclude_paths: tuple = ()) -> None:
+        self.app = app
+        self.gzip = GZipMiddleware(app, minimum_size=minimum_size, compresslevel=6)
+        self.exclude_paths = exclude_paths
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] == "http"
+            and scope["path"].startswith("/api/")
+            and scope["path"] not in self.exclude_paths
+            and b"format=ndjson" not in scope.get("query_string", b"")
+        ):
+            await self.gzip(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+
+# inside gzip, so the debug trailer is added to the uncompressed body
+app.add_middleware(ServerTimingMiddleware, debug=SERVER_TIMING_DEBUG)
+app.add_middleware(ApiGZipMiddleware, minimum_size=API_GZIP_MIN_SIZE, exclude_paths=("/api/events",))
+# outermost, so the histogram includes compression time
+app.add_middleware(MetricsMiddleware)
+if traffic_recorder is not None:
+    app.add_middleware(RecordingMiddleware, recorder=traffic_recorder)
+
+
+async def _call_cian(path: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     if not CIAN_API_BASE_URL or not CIAN_API_TOKEN:
         raise RuntimeError("CIAN API credentials are not configured")
     if not path.startswith("/"):
         path = f"/{path}"
+    key = (path, tuple(sorted((params or {}).items())))
+    return await cian_cache.get(key, lambda: upstream_flight.do(("cian",) + key, lambda: _fetch_cian(path, params)))
+
+
+async def _fetch_cian(path: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     url = f"{CIAN_API_BASE_URL}{path}"
-    response = requests.get(
+    response = await http_client.get(
         url,
         headers={
             "Authorization": f"Bearer {CIAN_API_TOKEN}",
             "Accept": "application/json",
         },
         params=params,
-        timeout=15,
     )
     response.raise_for_status()
     return response.json()
@@ -80,73 +309,15 @@ def _map_cian_status(value: Optional[str]) -> Optional[str]:
     return None
 
 
-def _build_cian_listing_url(object_id: Any) -> Optional[str]:
-    if object_id is None:
-        return None
-    digits = "".join(ch for ch in str(object_id) if ch.isdigit())
-    if not digits:
-        return None
-    return f"https://www.cian.ru/rent/flat/{digits}/"
-
-
-def _is_missing(value: Any) -> bool:
-    if value is None:
-        return True
-    if isinstance(value, str):
-        normalized = value.strip().upper()
-        return normalized in {"", "EMPTY", "NULL", "NONE"}
-    return False
-
-
-def _extract_cian_digits(value: Any) -> Optional[str]:
-    if value is None:
-        return None
-    if isinstance(value, (int, float)):
-        digits = re.sub(r"\D", "", str(int(value)))
-        return digits or None
-    if isinstance(value, str):
-        match = re.search(r"(\d{5,})", value)
-        if match:
-            return match.group(1)
-    return None
-
-
 def _ensure_cian_identifiers(item: Dict[str, Any]) -> None:
+    """Fill cian_id/cian_url in memory; the write-back happens in the background queue."""
     object_id = item.get(OBJECT_ID_COLUMN) or item.get("id")
     if object_id is None:
         return
-
-    cian_id_existing = item.get("cian_id")
-    cian_url_existing = item.get("cian_url")
-
-    digits = None if _is_missing(cian_id_existing) else _extract_cian_digits(cian_id_existing)
-    if not digits:
-        for candidate in (
-            item.get("external_id"),
-            object_id,
-            cian_url_existing,
-        ):
-            digits = _extract_cian_digits(candidate)
-            if digits:
-                break
-
-    url = None if _is_missing(cian_url_existing) else cian_url_existing
-    if not url and digits:
-        url = _build_cian_listing_url(digits)
-
-    payload: Dict[str, Any] = {}
-    if digits and (_is_missing(cian_id_existing) or cian_id_existing != digits):
-        payload["cian_id"] = digits
-        item["cian_id"] = digits
-    if url and _is_missing(cian_url_existing):
-        payload["cian_url"] = url
-        item["cian_url"] = url
-
-    if payload:
-        try:
-            supabase_client.update_object(str(object_id), payload)
-        except HTTPError as exc:
-            logging.warning("Не удалось обновить cian данные объекта %s: %s", object_id, exc)
+    patch = cian_identifier_patch(item, object_id)
+    if patch:
+        item.update(patch)
+        cian_identifier_queue.submit(object_id, patch)
 
 
 CLIENT_GROUP_LABELS = {
@@ -182,10 +353,15 @@ def _short_address_label(address: Optional[str]) -> str:
     return ", ".join(target[-2:]) or address
 
 
-def sync_cian_statuses() -> int:
-    data = _call_cian("/v1/get-order")
+async def sync_cian_statuses() -> Dict[str, Any]:
+    """Write CIAN statuses/identifiers back to objects, touching only rows that differ.
+
+    Changed rows go out in chunks of ``CIAN_SYNC_CHUNK_SIZE``, one ``patch_records`` request each.
+    """
+    started = time.perf_counter()
+    data = await _call_cian("/v1/get-order")
     offers = data.get("result", {}).get("offers") or []
-    updated = 0
+    desired: Dict[str, Dict[str, Any]] = {}
     for offer in offers:
         external_id = offer.get("externalId")
         if not external_id:
@@ -195,16 +371,93 @@ def sync_cian_statuses() -> int:
             continue
         payload: Dict[str, Any] = {"status": status}
         cian_offer_id = offer.get("offerId") or offer.get("id") or offer.get("cianId")
-        digits = _extract_cian_digits(cian_offer_id)
+        digits = extract_cian_digits(cian_offer_id)
         if digits:
             payload["cian_id"] = digits
-            payload["cian_url"] = _build_cian_listing_url(digits)
+            payload["cian_url"] = build_cian_listing_url(digits)
+        desired[str(external_id)] = payload
+
+    changes: List[Dict[str, Any]] = []
+    if desired:
+        current = await supabase_client.get_records(
+            supabase_client.table,
+            OBJECT_ID_COLUMN,
+            desired,
+            select=f"{OBJECT_ID_COLUMN},status,cian_id,cian_url",
+        )
+        for row in current:
+            payload = desired.get(str(row.get(OBJECT_ID_COLUMN)))
+            if payload is None:
+                continue
+            diff = {key: value for key, value in payload.items() if str(row.get(key)) != str(value)}
+            if diff:
+                changes.append({OBJECT_ID_COLUMN: row[OBJECT_ID_COLUMN], **diff})
+
+    written = failed = 0
+    for start in range(0, len(changes), CIAN_SYNC_CHUNK_SIZE):
+        chunk = changes[start : start + CIAN_SYNC_CHUNK_SIZE]
         try:
-            supabase_client.update_object(str(external_id), payload)
-            updated += 1
-        except HTTPError:
+            written += await supabase_client.patch_records(supabase_client.table, chunk, OBJECT_ID_COLUMN)
+        except HTTPStatusError as exc:
+            logging.warning("Не удалось обновить статусы CIAN для %s объектов: %s", len(chunk), exc)
+            failed += len(chunk)
+    if written:
+        etag_validators.clear()
+
+    stats = {
+        "scanned": len(offers),
+        "changed": len(changes),
+        "written": written,
+        "failed": failed,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+    logging.info("CIAN status sync: %s", stats)
+    return stats
+
+
+async def watch_upstream_changes() -> None:
+    """Publish object and CIAN import changes made outside this server while anyone listens to /api/events."""
+    watermark: Optional[str] = None
+    cian_state: Optional[str] = None
+    while True:
+        await asyncio.sleep(EVENTS_POLL_INTERVAL)
+        if not event_broker.subscribers:
+            # nobody to tell; start over from "now" when someone connects
+            watermark = cian_state = None
             continue
-    return updated
+        try:
+            watermark = await _publish_object_changes(watermark)
+        except httpx.HTTPError as exc:
+            logging.warning("Не удалось проверить изменения объектов: %s", exc)
+        try:
+            cian_state = await _publish_cian_import(cian_state)
+        except RuntimeError:
+            pass
+        except httpx.HTTPError as exc:
+            logging.warning("Не удалось проверить статус импорта CIAN: %s", exc)
+
+
+async def _publish_object_changes(since: Optional[str]) -> Optional[str]:
+    if not since:
+        # first look: only remember where "now" is
+        latest = await supabase_client.list_objects(limit=1, select=VALIDATOR_SELECT)
+        return latest[0].get("updated_at") if latest else None
+    rows = await supabase_client.list_objects(
+        limit=EVENTS_BATCH_SIZE, filters={"updated_at": f"gt.{since}"}, order="updated_at.asc"
+    )
+    for row in rows:
+        _ensure_cian_identifiers(row)
+        event_broker.publish("object-updated", {"id": row.get(OBJECT_ID_COLUMN), "item": _listing_item(row)})
+    return rows[-1]["updated_at"] if rows else since
+
+
+async def _publish_cian_import(previous: Optional[str]) -> str:
+    info = await _call_cian("/v1/get-last-order-info")
+    result = info.get("result") or {}
+    state = json.dumps(result, sort_keys=True, default=str)
+    if previous is not None and state != previous:
+        event_broker.publish("cian-import", {"result": result})
+    return state
 
 
 def _cian_demo_order() -> Dict[str, Any]:
@@ -241,24 +494,8 @@ def _cian_demo_report() -> Dict[str, Any]:
     }
 
 
-def send_notify_message(text: str) -> None:
-    if not NOTIFY_BOT_TOKEN or not NOTIFY_CHAT_ID:
-        return
-    payload: Dict[str, Any] = {
-        "chat_id": NOTIFY_CHAT_ID,
-        "text": text,
-        "parse_mode": "HTML",
-    }
-    if NOTIFY_THREAD_ID:
-        payload["message_thread_id"] = int(NOTIFY_THREAD_ID)
-    try:
-        requests.post(
-            f"https://api.telegram.org/bot{NOTIFY_BOT_TOKEN}/sendMessage",
-            json=payload,
-            timeout=10,
-        ).raise_for_status()
-    except requests.RequestException as exc:
-        logging.warning("Failed to send notify message: %s", exc)
+def send_notify_message(text: str, merge_key: Optional[str] = None) -> None:
+    telegram_outbox.enqueue("notify", text, merge_key=merge_key)
 
 
 def notify_cian_problems(report: Dict[str, Any]) -> None:
@@ -282,156 +519,323 @@ def notify_cian_problems(report: Dict[str, Any]) -> None:
     rest = len(problematic) - 5
     if rest > 0:
         lines.append(f"…и еще {rest} объявл.")
-    send_notify_message("\n".join(lines))
+    # repeated report views collapse into one notice per merge window
+    send_notify_message("\n".join(lines), merge_key="cian-problems")
 
 
 def send_showing_message(text: str) -> None:
-    if not SHOWING_BOT_TOKEN or not SHOWING_CHAT_ID:
+    if "showing" not in telegram_outbox.channels:
         logging.warning("SHOWING_BOT_TOKEN or SHOWING_CHAT_ID is missing; skipping notification")
         return
-    payload: Dict[str, Any] = {
-        "chat_id": SHOWING_CHAT_ID,
-        "text": text,
-        "parse_mode": "HTML",
-    }
-    if SHOWING_THREAD_ID:
-        payload["message_thread_id"] = int(SHOWING_THREAD_ID)
+    telegram_outbox.enqueue("showing", text)
+
+
+def _validator_key(request: Request) -> str:
+    return request.url.path + "?" + "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+
+
+def _etag_response(request: Request, payload: Any, fingerprint: Optional[str]) -> Response:
+    """Render ``payload`` with a weak ETag and answer 304 if the client already has it."""
+    body = json.dumps(jsonable_encoder(payload), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    etag = weak_etag(body)
+    if fingerprint is not None:
+        etag_validators.set(_validator_key(request), fingerprint, etag)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def _not_modified(request: Request, fetch_validator_rows: Callable[[], Awaitable[List[Dict[str, Any]]]]) -> Optional[Response]:
+    """Answer 304 from the remembered validator after re-reading only the ID and updated_at columns."""
+    if_none_match = request.headers.get("if-none-match")
+    cached = etag_validators.get(_validator_key(request)) if if_none_match else None
+    if cached is None or not etag_matches(if_none_match, cached[1]):
+        return None
     try:
-        requests.post(
-            f"https://api.telegram.org/bot{SHOWING_BOT_TOKEN}/sendMessage",
-            json=payload,
-            timeout=10,
-        ).raise_for_status()
-    except requests.RequestException as exc:
-        logging.warning("Failed to send showing notification: %s", exc)
+        rows = await fetch_validator_rows()
+    except (httpx.HTTPError, ValueError):
+        return None
+    if rows_fingerprint(rows, OBJECT_ID_COLUMN) != cached[0]:
+        return None
+    return Response(status_code=304, headers={"ETag": cached[1], "Cache-Control": "no-cache"})
+
+
+def _resolve_projection(view: str, fields: Optional[str]) -> Optional[List[str]]:
+    """Columns to select for a list view; None means the full row."""
+    if fields:
+        names = [name.strip() for name in fields.split(",") if name.strip()]
+        if not names or not all(FIELD_NAME_RE.match(name) for name in names):
+            raise HTTPException(status_code=400, detail="fields должен быть списком колонок через запятую")
+    elif view == "card":
+        names = list(OBJECT_CARD_COLUMNS)
+    else:
+        return None
+    return list(dict.fromkeys([*REQUIRED_LIST_COLUMNS, *names]))
+
+
+async def _select_projected(columns: Optional[List[str]], fetch: Callable[[str], Awaitable[Any]]) -> Any:
+    """Push the projection into PostgREST; if the table lacks one of the columns, fall back to select=*."""
+    if columns is None:
+        return await fetch("*")
+    try:
+        return await fetch(",".join(columns))
+    except HTTPStatusError as exc:
+        if exc.response.status_code != 400:
+            raise
+        logging.warning("Колонки %s недоступны, загружаем полные строки: %s", columns, exc.response.text)
+        return await fetch("*")
+
+
+def _project(item: Dict[str, Any], columns: Optional[List[str]]) -> Dict[str, Any]:
+    if columns is None:
+        return item
+    # an embedded owner (include=owner) is not a column but always belongs to the projection
+    return {key: item[key] for key in (*columns, "owner") if key in item}
+
+
+def _listing_item(item: Dict[str, Any], columns: Optional[List[str]] = None) -> Dict[str, Any]:
+    return {
+        "id": item.get(OBJECT_ID_COLUMN) or item.get("id"),
+        "address": item.get("address") or item.get("full_address"),
+        "price": item.get("price") or item.get("price_total") or item.get("price_rub"),
+        "cian_url": item.get("cian_url"),
+        "raw": _project(item, columns),
+    }
+
+
+def _ndjson_lines(items: List[Dict[str, Any]], columns: Optional[List[str]]) -> str:
+    lines = []
+    for item in items:
+        _ensure_cian_identifiers(item)
+        lines.append(json.dumps(_listing_item(item, columns), ensure_ascii=False, default=str))
+    return "".join(f"{line}\n" for line in lines)
+
+
+async def _stream_listing(
+    first_page: List[Dict[str, Any]],
+    cursor: Optional[str],
+    page_size: int,
+    filters: Optional[Dict[str, str]],
+    columns: Optional[List[str]],
+    include_owner: bool = False,
+) -> AsyncIterator[str]:
+    """Yield the already fetched first page, then keep following the cursor one page at a time."""
+    yield _ndjson_lines(first_page, columns)
+    while cursor:
+        try:
+            page, cursor = await _select_projected(
+                columns,
+                lambda select: supabase_client.list_objects_page(
+                    limit=page_size, select=select, filters=filters, cursor=cursor, include_owner=include_owner
+                ),
+            )
+        except httpx.HTTPError as exc:
+            logging.warning("Не удалось загрузить страницу объектов: %s", exc)
+            yield json.dumps({"error": "Ошибка Supabase"}, ensure_ascii=False) + "\n"
+            return
+        yield _ndjson_lines(page, columns)
 
 
 @app.get("/api/objects")
-def list_objects(
+async def list_objects(
+    request: Request,
     q: Optional[str] = Query(default=None, description="Поиск по ID или адресу"),
     limit: int = 100,
     moderator: Optional[bool] = Query(default=None),
+    cursor: Optional[str] = Query(default=None, description="next_cursor из предыдущей страницы"),
+    output: str = Query(default="json", alias="format", pattern="^(json|ndjson)$"),
+    view: str = Query(default="full", pattern="^(card|full)$"),
+    fields: Optional[str] = Query(default=None, description="Колонки через запятую вместо view"),
+    include: Optional[str] = Query(default=None, pattern="^owner$", description="owner — встроить запись собственника"),
 ):
-    try:
-        aggregated: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
-        data: List[Dict[str, Any]] = []
-
-        moderator_filter = None
-        if moderator is not None:
-            moderator_filter = {"moderator": f"eq.{str(moderator).lower()}"}
-
-        if q:
-            term = q.strip()
-            term_digits = _digits(term)
-            try:
-                obj = supabase_client.get_object(term)
-                if obj:
-                    aggregated[str(obj.get(OBJECT_ID_COLUMN) or obj.get("id"))] = obj
-            except HTTPError as exc:
-                if exc.response.status_code not in (400, 404):
-                    raise
-
-            all_items = supabase_client.list_objects(limit=min(limit, 200), filters=moderator_filter)
-            term_lower = term.lower()
-            for item in all_items:
-                identifier = str(item.get(OBJECT_ID_COLUMN) or item.get("id") or len(aggregated))
-                address = (item.get("address") or item.get("full_address") or "").lower()
-                complex_name = (item.get("complex_name") or item.get("complex") or "").lower()
-                if (
-                    term_lower in address
-                    or term_lower in complex_name
-                    or term == str(item.get(OBJECT_ID_COLUMN))
-                    or _item_price_matches(item, term_digits)
-                ):
-                    aggregated[identifier] = item
-
-            if aggregated:
-                data = list(aggregated.values())[:limit]
-            else:
-                data = all_items[:limit]
+    page_size = max(1, min(limit, 200))
+    include_owner = include == "owner"
+    columns = _resolve_projection(view, fields)
+    moderator_filter = None
+    if moderator is not None:
+        moderator_filter = {"moderator": f"eq.{str(moderator).lower()}"}
+
+    if output == "json" and not include_owner:
+        if q and q.strip():
+            validator = lambda: supabase_client.list_objects(
+                search=q, limit=page_size, select=VALIDATOR_SELECT, filters=moderator_filter
+            )
         else:
-            data = supabase_client.list_objects(limit=min(limit, 200), filters=moderator_filter)
+            async def validator() -> List[Dict[str, Any]]:
+                rows, _ = await supabase_client.list_objects_page(
+                    limit=page_size, select=VALIDATOR_SELECT, filters=moderator_filter, cursor=cursor
+                )
+                return rows
 
-        for item in data:
-            _ensure_cian_identifiers(item)
+        not_modified = await _not_modified(request, validator)
+        if not_modified is not None:
+            return not_modified
 
-        simplified = [
-            {
-                "id": item.get(OBJECT_ID_COLUMN) or item.get("id"),
-                "address": item.get("address") or item.get("full_address"),
-                "price": item.get("price") or item.get("price_total") or item.get("price_rub"),
-                "cian_url": item.get("cian_url"),
-                "raw": item,
-            }
-            for item in data
-        ]
-        return {"items": simplified}
-    except HTTPError as exc:
+    try:
+        next_cursor: Optional[str] = None
+        if q and q.strip():
+            data = await _select_projected(
+                columns,
+                lambda select: supabase_client.list_objects(
+                    search=q, limit=page_size, select=select, filters=moderator_filter, include_owner=include_owner
+                ),
+            )
+        else:
+            data, next_cursor = await _select_projected(
+                columns,
+                lambda select: supabase_client.list_objects_page(
+                    limit=page_size,
+                    select=select,
+                    filters=moderator_filter,
+                    cursor=cursor,
+                    include_owner=include_owner,
+                ),
+            )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail="Некорректный cursor") from exc
+    except HTTPStatusError as exc:
         raise HTTPException(status_code=502, detail=f"Ошибка Supabase: {exc.response.text}") from exc
-    except RequestsConnectionError as exc:
+    except ConnectError as exc:
         raise HTTPException(status_code=502, detail="Не удалось подключиться к Supabase") from exc
 
+    if output == "ndjson":
+        return StreamingResponse(
+            _stream_listing(data, next_cursor, page_size, moderator_filter, columns, include_owner),
+            media_type="application/x-ndjson",
+        )
+
+    fingerprint = None if include_owner else rows_fingerprint(data, OBJECT_ID_COLUMN)
+    for item in data:
+        _ensure_cian_identifiers(item)
+    payload = {"items": [_listing_item(item, columns) for item in data], "next_cursor": next_cursor}
+    return _etag_response(request, payload, fingerprint)
+
 @app.get("/api/moderation")
-def moderation_objects(limit: int = 50):
+async def moderation_objects(
+    request: Request,
+    limit: int = 50,
+    view: str = Query(default="full", pattern="^(card|full)$"),
+    fields: Optional[str] = Query(default=None, description="Колонки через запятую вместо view"),
+):
+    columns = _resolve_projection(view, fields)
+    not_modified = await _not_modified(
+        request,
+        lambda: supabase_client.list_objects(
+            limit=min(limit, 200), select=VALIDATOR_SELECT, filters=MODERATION_FILTER
+        ),
+    )
+    if not_modified is not None:
+        return not_modified
     try:
-        items = supabase_client.list_objects(limit=min(limit, 200), filters={"moderator": "eq.false"})
+        items = await _select_projected(
+            columns,
+            lambda select: supabase_client.list_objects(
+                limit=min(limit, 200), select=select, filters=MODERATION_FILTER
+            ),
+        )
+        fingerprint = rows_fingerprint(items, OBJECT_ID_COLUMN)
         for item in items:
             _ensure_cian_identifiers(item)
         simplified = [
             {
                 "id": item.get(OBJECT_ID_COLUMN) or item.get("id"),
                 "address": item.get("address") or item.get("full_address"),
-                "raw": item,
+                "raw": _project(item, columns),
             }
             for item in items
         ]
-        return {"items": simplified}
-    except HTTPError as exc:
+    except HTTPStatusError as exc:
         raise HTTPException(status_code=502, detail=f"Ошибка Supabase: {exc.response.text}") from exc
+    return _etag_response(request, {"items": simplified}, fingerprint)
 
 
 @app.get("/api/moderation/count")
-def moderation_count():
+async def moderation_count():
     try:
-        count = supabase_client.count_records("objects", {"moderator": "eq.false"})
-        return {"count": count}
-    except HTTPError as exc:
+        return {"count": await moderation_counter.get()}
+    except HTTPStatusError as exc:
         logging.warning("Не удалось получить очередь модерации: %s", exc)
-        return {"count": 0, "detail": exc.response.text if exc.response else "Supabase error"}
+        return {"count": 0, "detail": exc.response.text if exc.response is not None else "Supabase error"}
+
+@app.get("/api/events")
+async def events(request: Request):
+    """Server-Sent Events: moderation-count, object-updated, object-deleted, cian-import, resync."""
+    return StreamingResponse(
+        event_broker.stream(request.headers.get("last-event-id")),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text format: route and upstream latency, upstream errors, pool and threadpool saturation."""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
 
 @app.get("/api/objects/{object_id}")
-def get_object(object_id: str):
+async def get_object(
+    request: Request,
+    object_id: str,
+    include: Optional[str] = Query(default=None, pattern="^owner$", description="owner — встроить запись собственника"),
+):
+    include_owner = include == "owner"
+    # the cheap validator only tracks the object row, not the embedded owner
+    if not include_owner:
+        not_modified = await _not_modified(
+            request,
+            lambda: supabase_client.get_records(
+                supabase_client.table, OBJECT_ID_COLUMN, [object_id], select=VALIDATOR_SELECT
+            ),
+        )
+        if not_modified is not None:
+            return not_modified
     try:
-        obj = supabase_client.get_object(object_id)
-    except HTTPError as exc:
+        obj = await supabase_client.get_object(object_id, include_owner=include_owner)
+    except HTTPStatusError as exc:
         raise HTTPException(status_code=502, detail=f"Ошибка Supabase: {exc.response.text}") from exc
     if not obj:
         raise HTTPException(status_code=404, detail="Объект не найден")
+    fingerprint = None if include_owner else rows_fingerprint([obj], OBJECT_ID_COLUMN)
     _ensure_cian_identifiers(obj)
-    return obj
+    return _etag_response(request, obj, fingerprint)
 
 
 @app.patch("/api/objects/{object_id}")
-def update_object(object_id: str, payload: Dict[str, Any]):
+async def update_object(object_id: str, payload: Dict[str, Any]):
     if not payload or not isinstance(payload, dict):
         raise HTTPException(status_code=400, detail="Payload должен быть объектом JSON")
     try:
-        updated = supabase_client.update_object(object_id, payload)
-    except HTTPError as exc:
+        before = None
+        if "moderator" in payload and moderation_counter.value is not None:
+            # the live queue counter needs the previous flag only, not the whole row
+            rows = await supabase_client.get_records(
+                supabase_client.table, OBJECT_ID_COLUMN, [object_id], select=f"{OBJECT_ID_COLUMN},moderator"
+            )
+            before = rows[0] if rows else None
+        updated = await supabase_client.update_object(object_id, payload)
+    except HTTPStatusError as exc:
         raise HTTPException(status_code=502, detail=f"Ошибка Supabase: {exc.response.text}") from exc
     if not updated:
         raise HTTPException(status_code=404, detail="Объект не найден")
+    if before is not None:
+        moderation_counter.adjust(_in_moderation_queue(updated) - _in_moderation_queue(before))
+    _ensure_cian_identifiers(updated)
+    event_broker.publish("object-updated", {"id": object_id, "item": _listing_item(updated)})
+    # validators trust updated_at; don't rely on the table bumping it for our own writes
+    etag_validators.clear()
     return updated
 
 
 @app.delete("/api/objects/{object_id}")
-def delete_object_route(object_id: str, mode: str = Query(default="delete")):
+async def delete_object_route(object_id: str, mode: str = Query(default="delete")):
     mode = mode.lower()
     if mode not in {"delete", "relist", "owner"}:
         raise HTTPException(status_code=400, detail="mode должен быть delete, relist или owner")
     try:
-        obj = supabase_client.get_object(object_id)
-    except HTTPError as exc:
+        obj = await supabase_client.get_object(object_id)
+    except HTTPStatusError as exc:
         raise HTTPException(status_code=502, detail=f"Ошибка Supabase: {exc.response.text}") from exc
     if not obj:
         raise HTTPException(status_code=404, detail="Объект не найден")
@@ -439,11 +843,14 @@ def delete_object_route(object_id: str, mode: str = Query(default="delete")):
     owner_id = _resolve_owner_id(obj)
 
     try:
-        deleted = supabase_client.delete_object(object_id)
-    except HTTPError as exc:
+        deleted = await supabase_client.delete_object(object_id)
+    except HTTPStatusError as exc:
         raise HTTPException(status_code=502, detail=f"Ошибка Supabase: {exc.response.text}") from exc
     if not deleted:
         raise HTTPException(status_code=404, detail="Объект не найден")
+    cian_identifier_queue.discard(object_id)
+    moderation_counter.adjust(-_in_moderation_queue(obj))
+    event_broker.publish("object-deleted", {"id": object_id})
 
     if owner_id:
         if mode == "delete":
@@ -453,90 +860,144 @@ def delete_object_route(object_id: str, mode: str = Query(default="delete")):
         else:
             parsed_value = "owner"
         try:
-            supabase_client.update_record("owners", "id", owner_id, {"parsed": parsed_value})
-        except HTTPError as exc:
+            await supabase_client.update_record("owners", "id", owner_id, {"parsed": parsed_value})
+        except HTTPStatusError as exc:
             logging.warning("Не удалось обновить владельца %s: %s", owner_id, exc)
 
     return {"status": "ok", "mode": mode}
 
 
+def _batch_ids(payload: Dict[str, Any]) -> List[str]:
+    ids = payload.get("ids") if isinstance(payload, dict) else None
+    if not isinstance(ids, list) or not all(isinstance(value, (str, int)) for value in ids):
+        raise HTTPException(status_code=400, detail="ids должен быть списком идентификаторов")
+    ids = list(dict.fromkeys(str(value) for value in ids if str(value).strip()))
+    if len(ids) > BATCH_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"Не больше {BATCH_MAX_IDS} ID за запрос")
+    return ids
+
+
+@app.post("/api/objects/batch")
+async def objects_batch(payload: Dict[str, Any]):
+    ids = _batch_ids(payload)
+    try:
+        objects = await supabase_client.get_objects(ids)
+    except HTTPStatusError as exc:
+        raise HTTPException(status_code=502, detail=f"Ошибка Supabase: {exc.response.text}") from exc
+    for obj in objects.values():
+        _ensure_cian_identifiers(obj)
+    return {"items": objects, "missing": [object_id for object_id in ids if object_id not in objects]}
+
+
+@app.post("/api/owners/batch")
+async def owners_batch(payload: Dict[str, Any]):
+    ids = _batch_ids(payload)
+    try:
+        owners = await supabase_client.get_record_map("owners", "id", ids)
+    except HTTPStatusError as exc:
+        raise HTTPException(status_code=502, detail=f"Ошибка Supabase: {exc.response.text}") from exc
+    return {"items": owners, "missing": [owner_id for owner_id in ids if owner_id not in owners]}
+
+
 @app.get("/api/owners/{owner_id}")
-def get_owner(owner_id: str):
+async def get_owner(owner_id: str):
     try:
-        owner = supabase_client.get_record("owners", "id", owner_id)
-    except HTTPError as exc:
+        owner = await supabase_client.get_record("owners", "id", owner_id)
+    except HTTPStatusError as exc:
         raise HTTPException(status_code=502, detail=f"Ошибка Supabase: {exc.response.text}") from exc
     if not owner:
         raise HTTPException(status_code=404, detail="Владелец не найден")
     return owner
 
 
+def _asset_response(request: Request, name: str) -> Response:
+    asset = static_assets.lookup(name)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    body, encoding = asset.variant(request.headers.get("accept-encoding", ""))
+    headers = {
+        "ETag": asset.etag_for(encoding),
+        "Cache-Control": static_assets.cache_control(name),
+        "Vary": "Accept-Encoding",
+    }
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=asset.media_type, headers=headers)
+
+
+@app.api_route("/static/{name:path}", methods=["GET", "HEAD"])
+def static_file(request: Request, name: str):
+    return _asset_response(request, name)
+
+
 @app.get("/")
-def index():
-    return FileResponse(WEBAPP_DIR / "pages" / "home.html")
+def index(request: Request):
+    return _asset_response(request, "pages/home.html")
 
 
 @app.get("/home.html")
-def home_page():
-    return FileResponse(WEBAPP_DIR / "pages" / "home.html")
+def home_page(request: Request):
+    return _asset_response(request, "pages/home.html")
 
 
 @app.get("/cabinet.html")
-def cabinet():
-    return FileResponse(WEBAPP_DIR / "pages" / "cabinet.html")
+def cabinet(request: Request):
+    return _asset_response(request, "pages/cabinet.html")
 
 
 @app.get("/stub.html")
-def stub():
-    return FileResponse(WEBAPP_DIR / "pages" / "stub.html")
+def stub(request: Request):
+    return _asset_response(request, "pages/stub.html")
 
 
 @app.get("/search.html")
-def search_page():
-    return FileResponse(WEBAPP_DIR / "pages" / "search.html")
+def search_page(request: Request):
+    return _asset_response(request, "pages/search.html")
 
 
 @app.get("/moderation.html")
 @app.get("/moderation")
-def moderation_page():
-    return FileResponse(WEBAPP_DIR / "pages" / "moderation.html")
+def moderation_page(request: Request):
+    return _asset_response(request, "pages/moderation.html")
 
 
 @app.get("/listings.html")
-def listings_page():
-    return FileResponse(WEBAPP_DIR / "pages" / "listings.html")
+def listings_page(request: Request):
+    return _asset_response(request, "pages/listings.html")
 
 
 @app.get("/cian-report.html")
-def cian_report_page():
-    return FileResponse(WEBAPP_DIR / "pages" / "cian-report.html")
+def cian_report_page(request: Request):
+    return _asset_response(request, "pages/cian-report.html")
 
 
 @app.get("/object.html")
-def object_page():
-    return FileResponse(WEBAPP_DIR / "pages" / "object.html")
+def object_page(request: Request):
+    return _asset_response(request, "pages/object.html")
 
 
 @app.get("/api/cian/order-info")
-def cian_order_info():
+async def cian_order_info():
     try:
-        data = _call_cian("/v1/get-last-order-info")
+        data = await _call_cian("/v1/get-last-order-info")
         data["demo"] = False
     except RuntimeError:
         data = _cian_demo_order()
-    except requests.RequestException as exc:
+    except httpx.HTTPError as exc:
         raise HTTPException(status_code=502, detail=f"CIAN API error: {exc}") from exc
     return data
 
 
 @app.get("/api/cian/order-report")
-def cian_order_report():
+async def cian_order_report():
     try:
-        data = _call_cian("/v1/get-order")
+        data = await _call_cian("/v1/get-order")
         data["demo"] = False
     except RuntimeError:
         data = _cian_demo_report()
-    except requests.RequestException as exc:
+    except httpx.HTTPError as exc:
         raise HTTPException(status_code=502, detail=f"CIAN API error: {exc}") from exc
     else:
         notify_cian_problems(data)
@@ -544,10 +1005,10 @@ def cian_order_report():
 
 
 @app.get("/api/cian/images-report")
-def cian_images_report(page: int = Query(default=1, ge=1), page_size: int = Query(default=100, ge=1, le=500)):
+async def cian_images_report(page: int = Query(default=1, ge=1), page_size: int = Query(default=100, ge=1, le=500)):
     params = {"page": page, "pageSize": page_size}
     try:
-        data = _call_cian("/v1/get-images-report", params=params)
+        data = await _call_cian("/v1/get-images-report", params=params)
         data["demo"] = False
     except RuntimeError:
         data = {
@@ -557,22 +1018,22 @@ def cian_images_report(page: int = Query(default=1, ge=1), page_size: int = Quer
             },
             "demo": True,
         }
-    except requests.RequestException as exc:
+    except httpx.HTTPError as exc:
         raise HTTPException(status_code=502, detail=f"CIAN API error: {exc}") from exc
     return data
 
 
 @app.post("/api/cian/status-sync")
-def cian_status_sync_route():
+async def cian_status_sync_route():
     try:
-        updated = sync_cian_statuses()
-    except requests.RequestException as exc:
+        stats = await sync_cian_statuses()
+    except httpx.HTTPError as exc:
         raise HTTPException(status_code=502, detail=f"CIAN API error: {exc}") from exc
-    return {"updated": updated}
+    return {"updated": stats["written"], **stats}
 
 
 @app.post("/api/showings")
-def create_showing(payload: Dict[str, Any]):
+async def create_showing(payload: Dict[str, Any]):
     object_id = payload.get("object_id")
     if not object_id:
         raise HTTPException(status_code=400, detail="object_id обязателен")
@@ -582,21 +1043,14 @@ def create_showing(payload: Dict[str, Any]):
     if not schedule.get("date") or not schedule.get("time"):
         raise HTTPException(status_code=400, detail="Укажите дату и время показа")
     try:
-        obj = supabase_client.get_object(str(object_id))
-    except HTTPError as exc:
+        obj = await supabase_client.get_object(str(object_id), include_owner=True)
+    except HTTPStatusError as exc:
         raise HTTPException(status_code=502, detail=f"Ошибка Supabase: {exc.response.text}") from exc
     if not obj:
         raise HTTPException(status_code=404, detail="Объект не найден")
+    owner_record: Optional[Dict[str, Any]] = obj.pop("owner", None)
     _ensure_cian_identifiers(obj)
 
-    owners_id = obj.get("owners_id") or obj.get("owner_id")
-    owner_record: Optional[Dict[str, Any]] = None
-    if owners_id:
-        try:
-            owner_record = supabase_client.get_record("owners", "id", owners_id)
-        except HTTPError:
-            owner_record = None
-
     address = obj.get("address") or obj.get("full_address") or obj.get("location") or "Адрес не указан"
     short_address = _short_address_label(address)
     schedule_label = f"{schedule.get('date')} · {schedule.get('time')}"
@@ -648,7 +1102,7 @@ def create_showing(payload: Dict[str, Any]):
     if client_input.get("notes"):
         lines.append(f"📌 {_escape_label(client_input['notes'])}")
 
-    cian_url = obj.get("cian_url") or _build_cian_listing_url(object_id)
+    cian_url = obj.get("cian_url") or build_cian_listing_url(object_id)
     owner_url = owner_record.get("url") if owner_record else None
     if cian_url or owner_url:
         lines.append("")
@@ -659,24 +1113,9 @@ def create_showing(payload: Dict[str, Any]):
 
     send_showing_message("\n".join(lines))
     return {"status": "ok"}
-def _digits(value: str) -> str:
-    return "".join(ch for ch in str(value) if ch.isdigit())
-
-
-def _item_price_matches(item: Dict[str, Any], digits: str) -> bool:
-    if not digits:
-        return False
-    price_fields = ("price", "price_total", "price_rub", "price_month", "price_per_month")
-    for field in price_fields:
-        value = item.get(field)
-        if value is None:
-            continue
-        value_digits = _digits(value)
-        if not value_digits:
-            continue
-        if digits in value_digits:
-            return True
-    return False
+def _in_moderation_queue(obj: Dict[str, Any]) -> bool:
+    """Whether ``obj`` matches MODERATION_FILTER (``moderator = false``; null is not in the queue)."""
+    return str(obj.get("moderator")).lower() == "false"
 
 
 def _resolve_owner_id(obj: Dict[str, Any]) -> Optional[str]:
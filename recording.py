@@ -0,0 +1,370 @@
+import asyncio
+import json
+import logging
+import re
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import httpx
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+# personal data and secrets; "text" is the Telegram message body, which quotes owner and client contacts
+DEFAULT_REDACT_FIELDS = ("phone", "phone_number", "name", "text", "token", "api_key", "apikey", "password")
+REDACTED = "***"
+# only headers that change what the upstream returns (or how the client reads it) are kept
+REQUEST_HEADERS = ("prefer", "range", "accept")
+RESPONSE_HEADERS = ("content-type", "content-range", "etag", "retry-after")
+TELEGRAM_TOKEN_RE = re.compile(r"/bot[^/]+/")
+SECRET_PARAM_RE = re.compile(r"(token|key|secret|password)", re.IGNORECASE)
+
+logger = logging.getLogger(__name__)
+
+
+def parse_redact_fields(raw: Optional[str]) -> Tuple[str, ...]:
+    """``"phone,token"`` -> ("phone", "token"); empty falls back to DEFAULT_REDACT_FIELDS."""
+    fields = tuple(field.strip().lower() for field in (raw or "").split(",") if field.strip())
+    return fields or DEFAULT_REDACT_FIELDS
+
+
+def _redact(value: Any, fields: Tuple[str, ...]) -> Any:
+    if isinstance(value, dict):
+        return {key: REDACTED if key.lower() in fields else _redact(item, fields) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_redact(item, fields) for item in value]
+    return value
+
+
+def sanitize_body(content: bytes, fields: Tuple[str, ...]) -> str:
+    """Body as text with the listed JSON keys masked at any depth; non-JSON bodies are kept as text."""
+    if not content:
+        return ""
+    text = content.decode("utf-8", errors="replace")
+    try:
+        payload = json.loads(text)
+    except ValueError:
+        return text
+    return json.dumps(_redact(payload, fields), ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+def sanitize_url(url: str) -> Tuple[str, str, str]:
+    """(host, path, query) without secrets: the bot token in the path, token/key-like query params."""
+    parts = urlsplit(url)
+    path = TELEGRAM_TOKEN_RE.sub(f"/bot{REDACTED}/", parts.path)
+    params = [
+        (name, REDACTED if SECRET_PARAM_RE.search(name) else value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+    ]
+    return parts.hostname or "", path, urlencode(sorted(params))
+
+
+def _headers(headers: Iterable[Tuple[str, str]], keep: Tuple[str, ...]) -> Dict[str, str]:
+    return {name.lower(): value for name, value in headers if name.lower() in keep}
+
+
+class TrafficRecorder:
+    """Appends sanitized request/response pairs to a JSON Lines file.
+
+    Every line is one call: ``kind`` (``upstream`` or ``inbound``), the offset
+    ``t`` in seconds since recording started, method, host, path, query,
+    request body, status, kept headers, response body and ``duration``.
+    Credentials never reach the file: auth headers are not recorded, the bot
+    token and key-like query parameters are masked, and ``redact_fields`` are
+    masked in JSON bodies. Safe to share between threads (the bot's sync
+    client and the mini app's event loop run in one process).
+    """
+
+    def __init__(self, path: str, redact_fields: Iterable[str] = DEFAULT_REDACT_FIELDS) -> None:
+        self.path = path
+        self.redact_fields = tuple(field.lower() for field in redact_fields)
+        self.recorded = 0
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def record(
+        self,
+        kind: str,
+        method: str,
+        url: str,
+        request_headers: Iterable[Tuple[str, str]],
+        request_body: bytes,
+        status: Optional[int],
+        response_headers: Iterable[Tuple[str, str]],
+        response_body: bytes,
+        duration: float,
+        error: Optional[str] = None,
+    ) -> None:
+        host, path, query = sanitize_url(url)
+        entry = {
+            "kind": kind,
+            "t": round(time.monotonic() - self._started - duration, 4),
+            "at": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "method": method,
+            "host": host,
+            "path": path,
+            "query": query,
+            "request_headers": _headers(request_headers, REQUEST_HEADERS),
+            "request_body": sanitize_body(request_body, self.redact_fields),
+            "status": status,
+            "response_headers": _headers(response_headers, RESPONSE_HEADERS),
+            "response_body": sanitize_body(response_body, self.redact_fields),
+            "duration": round(duration, 4),
+        }
+        if error:
+            entry["error"] = error
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            self.recorded += 1
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+_recorders: Dict[str, TrafficRecorder] = {}
+_recorders_lock = threading.Lock()
+
+
+def open_recorder(path: str, redact_fields: Iterable[str] = DEFAULT_REDACT_FIELDS) -> TrafficRecorder:
+    """One recorder per file, so the bot and the mini app server in one process write through the same lock."""
+    with _recorders_lock:
+        recorder = _recorders.get(path)
+        if recorder is None:
+            recorder = _recorders[path] = TrafficRecorder(path, redact_fields)
+        return recorder
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """httpx transport that records every call through ``recorder`` and otherwise passes it on unchanged."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, recorder: TrafficRecorder) -> None:
+        self.transport = transport
+        self.recorder = recorder
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = await request.aread()
+        started = time.perf_counter()
+        try:
+            response = await self.transport.handle_async_request(request)
+            content = await response.aread()
+        except httpx.HTTPError as exc:
+            self.recorder.record(
+                "upstream", request.method, str(request.url), request.headers.items(), body,
+                None, (), b"", time.perf_counter() - started, type(exc).__name__,
+            )
+            raise
+        self.recorder.record(
+            "upstream", request.method, str(request.url), request.headers.items(), body,
+            response.status_code, response.headers.items(), content, time.perf_counter() - started,
+        )
+        await response.aclose()
+        # the body is already decoded, so it must not be decoded again
+        headers = [(k, v) for k, v in response.headers.items() if k.lower() not in ("content-encoding", "content-length")]
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=headers,
+            content=content,
+            extensions=response.extensions,
+            request=request,
+        )
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+class RecordingAdapter(HTTPAdapter):
+    """requests adapter with the same recording as RecordingTransport; mount it on the session."""
+
+    def __init__(self, recorder: TrafficRecorder, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.recorder = recorder
+
+    def send(self, request: requests.PreparedRequest, **kwargs: Any) -> requests.Response:  # type: ignore[override]
+        body = request.body or b""
+        if isinstance(body, str):
+            body = body.encode()
+        started = time.perf_counter()
+        try:
+            response = super().send(request, **kwargs)
+        except requests.RequestException as exc:
+            self.recorder.record(
+                "upstream", request.method or "GET", request.url or "", request.headers.items(), body,
+                None, (), b"", time.perf_counter() - started, type(exc).__name__,
+            )
+            raise
+        self.recorder.record(
+            "upstream", request.method or "GET", request.url or "", request.headers.items(), body,
+            response.status_code, response.headers.items(), response.content, time.perf_counter() - started,
+        )
+        return response
+
+
+class TrafficReplay:
+    """Recorded upstream calls, looked up by the request that produced them.
+
+    A request matches on method, path, query and body first, then without the
+    body, then on method and path alone; repeated matches go through the
+    recorded responses in order and start over when they run out. The host is
+    ignored, so a recording replays against any base URL.
+    """
+
+    def __init__(self, entries: Iterable[Dict[str, Any]], redact_fields: Iterable[str] = DEFAULT_REDACT_FIELDS) -> None:
+        self.redact_fields = tuple(field.lower() for field in redact_fields)
+        entries = list(entries)
+        self.entries = [entry for entry in entries if entry.get("kind") == "upstream"]
+        self.inbound = [entry for entry in entries if entry.get("kind") == "inbound"]
+        self.hits = 0
+        self.misses = 0
+        self._lookup: Dict[Tuple[str, ...], List[Dict[str, Any]]] = defaultdict(list)
+        self._cursor: Dict[Tuple[str, ...], int] = defaultdict(int)
+        self._lock = threading.Lock()
+        for entry in self.entries:
+            for key in self._keys(entry["method"], entry["path"], entry["query"], entry.get("request_body", "")):
+                self._lookup[key].append(entry)
+
+    @classmethod
+    def load(cls, path: str, redact_fields: Iterable[str] = DEFAULT_REDACT_FIELDS) -> "TrafficReplay":
+        with open(path, encoding="utf-8") as handle:
+            return cls([json.loads(line) for line in handle if line.strip()], redact_fields)
+
+    def match(self, method: str, url: str, body: bytes) -> Optional[Dict[str, Any]]:
+        _, path, query = sanitize_url(url)
+        with self._lock:
+            for key in self._keys(method, path, query, sanitize_body(body, self.redact_fields)):
+                candidates = self._lookup.get(key)
+                if candidates:
+                    index = self._cursor[key]
+                    self._cursor[key] = index + 1
+                    self.hits += 1
+                    return candidates[index % len(candidates)]
+            self.misses += 1
+        logger.warning("Нет записанного ответа для %s %s", method, path)
+        return None
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+    @staticmethod
+    def _keys(method: str, path: str, query: str, body: str) -> List[Tuple[str, ...]]:
+        return [(method, path, query, body), (method, path, query), (method, path)]
+
+
+def _replayed_status(entry: Optional[Dict[str, Any]]) -> Tuple[int, Dict[str, str], bytes]:
+    if entry is None:
+        return 599, {"content-type": "application/json"}, b'{"message": "not recorded"}'
+    return entry["status"] or 599, entry.get("response_headers") or {}, (entry.get("response_body") or "").encode()
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """Serves recorded responses instead of the network, after the recorded duration times ``latency_scale``.
+
+    Calls that failed while recording fail the same way (as a transport
+    error); requests with no recording get status 599.
+    """
+
+    def __init__(self, replay: TrafficReplay, latency_scale: float = 1.0) -> None:
+        self.replay = replay
+        self.latency_scale = latency_scale
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        entry = self.replay.match(request.method, str(request.url), await request.aread())
+        if entry is not None and self.latency_scale > 0:
+            await asyncio.sleep(entry["duration"] * self.latency_scale)
+        if entry is not None and entry.get("error"):
+            raise httpx.TransportError(f"записанная ошибка: {entry['error']}", request=request)
+        status, headers, content = _replayed_status(entry)
+        return httpx.Response(status_code=status, headers=headers, content=content, request=request)
+
+
+class ReplayAdapter(BaseAdapter):
+    """requests adapter counterpart of ReplayTransport."""
+
+    def __init__(self, replay: TrafficReplay, latency_scale: float = 1.0) -> None:
+        super().__init__()
+        self.replay = replay
+        self.latency_scale = latency_scale
+
+    def send(self, request: requests.PreparedRequest, **kwargs: Any) -> requests.Response:  # type: ignore[override]
+        body = request.body or b""
+        entry = self.replay.match(request.method or "GET", request.url or "", body.encode() if isinstance(body, str) else body)
+        if entry is not None and self.latency_scale > 0:
+            time.sleep(entry["duration"] * self.latency_scale)
+        if entry is not None and entry.get("error"):
+            raise requests.ConnectionError(f"записанная ошибка: {entry['error']}", request=request)
+        status, headers, content = _replayed_status(entry)
+        response = requests.Response()
+        response.status_code = status
+        response.headers.update(headers)
+        response._content = content
+        response.url = request.url or ""
+        response.request = request
+        response.encoding = "utf-8"
+        return response
+
+    def close(self) -> None:
+        pass
+
+
+def mount_traffic(
+    session: requests.Session,
+    recorder: Optional[TrafficRecorder] = None,
+    replay: Optional["TrafficReplay"] = None,
+    latency_scale: float = 1.0,
+) -> requests.Session:
+    """Route a requests session through the replay (no network) or the recorder; unchanged when both are None."""
+    adapter: Optional[BaseAdapter] = None
+    if replay is not None:
+        adapter = ReplayAdapter(replay, latency_scale)
+    elif recorder is not None:
+        adapter = RecordingAdapter(recorder)
+    if adapter is not None:
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+    return session
+
+
+class RecordingMiddleware:
+    """Records inbound ``/api/`` requests so a recording also holds the traffic that caused the upstream calls."""
+
+    def __init__(self, app: ASGIApp, recorder: TrafficRecorder) -> None:
+        self.app = app
+        self.recorder = recorder
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith("/api/") or scope["path"] == "/api/events":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        body: List[bytes] = []
+        status: Optional[int] = None
+
+        async def receive_wrapper() -> Message:
+            message = await receive()
+            if message["type"] == "http.request":
+                body.append(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            query = scope.get("query_string", b"").decode("latin-1")
+            headers = [(key.decode("latin-1"), value.decode("latin-1")) for key, value in scope.get("headers", [])]
+            self.recorder.record(
+                "inbound", scope["method"], f"{scope['path']}?{query}" if query else scope["path"], headers,
+                b"".join(body), status, (), b"", time.perf_counter() - started,
+            )
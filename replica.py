@@ -0,0 +1,609 @@
+import asyncio
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import anyio.to_thread
+import httpx
+
+from search_index import AddressIndex, PriceIndex, parse_price_range
+from supabase_client import NUMERIC_TERM_RE, AsyncSupabaseClient, _quote_filter_value, decode_cursor
+
+
+COLUMN_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+INTEGER_RE = re.compile(r"^-?[0-9]+$")
+FILTER_OPERATORS = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+SEARCH_TEXT_PATHS = ("$.address", "$.full_address", "$.complex_name")
+INDEX_CANDIDATES = 500
+SEARCH_PRICE_PATHS = ("$.price", "$.price_total", "$.price_rub", "$.price_month", "$.price_per_month")
+
+
+class LocalReplica:
+    """Read replica of Supabase tables in a local SQLite file.
+
+    Each table is stored as ``(pk, updated_at, data)`` with the row as JSON, so
+    no schema has to be mirrored. ``ReplicaSyncer`` keeps it current; readers
+    (the mini app and the bot can share the file) only use a table while its
+    last successful sync is younger than ``max_staleness`` seconds and fall
+    back to Supabase otherwise. Supported reads: by primary key, simple
+    PostgREST filters (eq/neq/gt/gte/lt/lte/is/in), ordering, keyset pages,
+    search and counts. Tables listed in ``indexes`` also keep in-memory
+    indexes (AddressIndex, PriceIndex), loaded from the file and updated with
+    every local write, that answer the text and price parts of ``search``.
+    Columns listed in ``filter_columns`` get expression indexes so filtered
+    selects and counts (``moderator=eq.false``) do not scan the table.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        id_columns: Dict[str, str],
+        max_staleness: float = 60.0,
+        indexes: Optional[Dict[str, List[Any]]] = None,
+        filter_columns: Optional[Dict[str, List[str]]] = None,
+    ) -> None:
+        self.path = path
+        self.id_columns = dict(id_columns)
+        self.max_staleness = max_staleness
+        self.indexes = {table: list(table_indexes) for table, table_indexes in (indexes or {}).items()}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.create_function("casefold", 1, _casefold, deterministic=True)
+        self._conn.create_function("digits", 1, _only_digits, deterministic=True)
+        with self._lock, self._conn:
+            self._conn.execute("pragma journal_mode=wal")
+            self._conn.execute(
+                "create table if not exists replica_meta ("
+                "name text primary key, watermark text, watermark_pk text, "
+                "synced_at real, reconciled_at real, incremental integer not null default 1)"
+            )
+            for table in self.id_columns:
+                _check_column(table)
+                self._conn.execute(f"create table if not exists {table} (pk primary key, updated_at text, data text not null)")
+                self._conn.execute(f"create index if not exists {table}_updated_at_idx on {table} (updated_at)")
+            for table, columns in (filter_columns or {}).items():
+                for column in columns:
+                    self._conn.execute(
+                        f"create index if not exists {table}_{_check_column(column)}_idx "
+                        f"on {table} ({_json_path_sql(column, self.id_columns[table])}, updated_at)"
+                    )
+        for table, table_indexes in self.indexes.items():
+            with self._lock:
+                rows = [(pk, json.loads(data)) for pk, data in self._conn.execute(f"select pk, data from {table}")]
+            for index in table_indexes:
+                index.rebuild(rows)
+
+    # ---- freshness -------------------------------------------------------------------------
+
+    def serves(
+        self,
+        table: str,
+        column: Optional[str] = None,
+        select: str = "*",
+        filters: Optional[Dict[str, str]] = None,
+    ) -> bool:
+        """True if the read can be answered locally within the staleness bound."""
+        if table not in self.id_columns:
+            return False
+        if column is not None and column != self.id_columns[table]:
+            return False
+        if _select_columns(select) is False or (filters and _where(filters) is None):
+            return False
+        synced_at = self.meta(table).get("synced_at")
+        return synced_at is not None and time.time() - synced_at <= self.max_staleness
+
+    def meta(self, table: str) -> Dict[str, Any]:
+        with self._lock:
+            row = self._conn.execute(
+                "select watermark, watermark_pk, synced_at, reconciled_at, incremental from replica_meta where name = ?",
+                (table,),
+            ).fetchone()
+        if row is None:
+            return {}
+        watermark, watermark_pk, synced_at, reconciled_at, incremental = row
+        return {
+            "watermark": watermark,
+            "watermark_pk": json.loads(watermark_pk) if watermark_pk is not None else None,
+            "synced_at": synced_at,
+            "reconciled_at": reconciled_at,
+            "incremental": bool(incremental),
+        }
+
+    def set_meta(self, table: str, **values: Any) -> None:
+        if "watermark_pk" in values:
+            values["watermark_pk"] = json.dumps(values["watermark_pk"])
+        columns = ", ".join(values)
+        updates = ", ".join(f"{column} = excluded.{column}" for column in values)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"insert into replica_meta (name, {columns}) values (?, {', '.join('?' * len(values))}) "
+                f"on conflict (name) do update set {updates}",
+                (table, *values.values()),
+            )
+
+    # ---- writes ----------------------------------------------------------------------------
+
+    def upsert(self, table: str, rows: Iterable[Dict[str, Any]]) -> int:
+        id_column = self.id_columns[table]
+        records = [
+            (row[id_column], row.get("updated_at"), json.dumps(row, ensure_ascii=False, default=str))
+            for row in rows
+            if row.get(id_column) is not None
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"insert into {table} (pk, updated_at, data) values (?, ?, ?) "
+                "on conflict (pk) do update set updated_at = excluded.updated_at, data = excluded.data",
+                records,
+            )
+        self._reindex(table, ((row[id_column], row) for row in rows if row.get(id_column) is not None))
+        return len(records)
+
+    def retain(self, table: str, keep: Iterable[Any]) -> int:
+        """Delete every local row whose pk is not in ``keep``; returns the number removed."""
+        with self._lock, self._conn:
+            self._conn.execute("create temp table if not exists replica_keep (pk primary key)")
+            self._conn.execute("delete from replica_keep")
+            self._conn.executemany("insert or ignore into replica_keep (pk) values (?)", ((pk,) for pk in keep))
+            gone = self._conn.execute(f"select pk from {table} where pk not in (select pk from replica_keep)").fetchall()
+            self._conn.execute(f"delete from {table} where pk not in (select pk from replica_keep)")
+            self._conn.execute("delete from replica_keep")
+        self._reindex(table, ((pk, None) for (pk,) in gone))
+        return len(gone)
+
+    def after_write(
+        self,
+        table: str,
+        column: str,
+        value: Any,
+        rows: Optional[List[Dict[str, Any]]] = None,
+        patch: Optional[Dict[str, Any]] = None,
+        deleted: bool = False,
+    ) -> None:
+        """Mirror a write that went upstream so this process reads its own writes before the next sync."""
+        if table not in self.id_columns:
+            return
+        if rows:
+            self.upsert(table, rows)
+            return
+        params = _key_params([value])
+        where = f"{_json_path_sql(column, self.id_columns[table])} in ({', '.join('?' * len(params))})"
+        changed: List[Tuple[Any, Optional[Dict[str, Any]]]] = []
+        with self._lock, self._conn:
+            if deleted:
+                matches = self._conn.execute(f"select pk from {table} where {where}", params).fetchall()
+                self._conn.execute(f"delete from {table} where {where}", params)
+                changed = [(pk, None) for (pk,) in matches]
+            elif patch:
+                matches = self._conn.execute(f"select pk, data from {table} where {where}", params).fetchall()
+                for pk, data in matches:
+                    row = {**json.loads(data), **patch}
+                    self._conn.execute(
+                        f"update {table} set data = ?, updated_at = ? where pk = ?",
+                        (json.dumps(row, ensure_ascii=False, default=str), row.get("updated_at"), pk),
+                    )
+                    changed.append((pk, row))
+        self._reindex(table, changed)
+
+    def _reindex(self, table: str, changes: Iterable[Tuple[Any, Optional[Dict[str, Any]]]]) -> None:
+        """Apply ``(pk, row)`` changes to the table's in-memory indexes; a None row is a deletion."""
+        table_indexes = self.indexes.get(table)
+        if not table_indexes:
+            return
+        # readers run in worker threads, so the indexes change under the same lock as the file
+        with self._lock:
+            for pk, row in changes:
+                for index in table_indexes:
+                    if row is None:
+                        index.remove(pk)
+                    else:
+                        index.upsert(pk, row)
+
+    # ---- reads -----------------------------------------------------------------------------
+
+    def get(self, table: str, value: Any) -> Optional[Dict[str, Any]]:
+        rows = self.get_many(table, [value])
+        return rows[0] if rows else None
+
+    def get_many(self, table: str, values: Iterable[Any], select: str = "*") -> List[Dict[str, Any]]:
+        keys = _key_params(values)
+        if not keys:
+            return []
+        with self._lock:
+            rows = self._conn.execute(f"select data from {table} where pk in ({', '.join('?' * len(keys))})", keys).fetchall()
+        return _project([json.loads(data) for (data,) in rows], select)
+
+    def select(
+        self,
+        table: str,
+        select: str = "*",
+        filters: Optional[Dict[str, str]] = None,
+        order: str = "updated_at.desc.nullslast",
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        id_column = self.id_columns[table]
+        clauses, params = _where(filters or {}, id_column) or ([], [])
+        if cursor:
+            updated_at, pk = decode_cursor(cursor)
+            if updated_at is None:
+                clauses.append("(updated_at is null and pk < ?)")
+                params.append(pk)
+            else:
+                clauses.append("(updated_at < ? or (updated_at = ? and pk < ?) or updated_at is null)")
+                params.extend([updated_at, updated_at, pk])
+        sql = f"select data from {table}"
+        if clauses:
+            sql += " where " + " and ".join(clauses)
+        sql += " order by " + _order_sql(order, id_column)
+        if limit is not None:
+            sql += " limit ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return _project([json.loads(data) for (data,) in rows], select)
+
+    def search(
+        self,
+        table: str,
+        term: str,
+        select: str = "*",
+        filters: Optional[Dict[str, str]] = None,
+        limit: int = 50,
+    ) -> List[Dict[str, Any]]:
+        """Local counterpart of sql/search_objects.sql: exact ID, then text, then price digits
+        (for purely numeric terms only).
+
+        With an AddressIndex and a PriceIndex for ``table`` the tiers come from
+        the indexes instead of scanning rows: text hits are ordered by
+        relevance, and a price range such as "50000-70000" or "до 60к" returns
+        the objects priced within it.
+        """
+        id_column = self.id_columns[table]
+        clauses, params = _where(filters or {}, id_column) or ([], [])
+        address_index = self._index(table, AddressIndex)
+        price_index = self._index(table, PriceIndex)
+        if address_index is not None and price_index is not None:
+            with self._lock:
+                candidates = _search_candidates(term, address_index, price_index, max(limit * 10, INDEX_CANDIDATES))
+            return self._ranked(table, candidates, clauses, params, select, limit)
+        exact = term.strip()
+        pattern = "%" + _escape_like(_casefold(exact.replace(",", ""))).replace(" ", "%") + "%"
+        digits = _only_digits(term) if NUMERIC_TERM_RE.match(exact) else ""
+        text_match = " or ".join(f"casefold(json_extract(data, '{path}')) like ? escape '\\'" for path in SEARCH_TEXT_PATHS)
+        price_match = " or ".join(f"digits(json_extract(data, '{path}')) like ?" for path in SEARCH_PRICE_PATHS)
+        rank = (
+            f"case when cast(pk as text) = ? then 0 when {text_match} then 1 "
+            f"when ? <> '' and ({price_match}) then 2 end"
+        )
+        rank_params = [exact, *[pattern] * len(SEARCH_TEXT_PATHS), digits, *[f"%{digits}%"] * len(SEARCH_PRICE_PATHS)]
+        sql = f"select data from (select data, updated_at, {rank} as rank from {table}"
+        if clauses:
+            sql += " where " + " and ".join(clauses)
+        sql += ") where rank is not null order by rank, updated_at desc nulls last limit ?"
+        with self._lock:
+            rows = self._conn.execute(sql, [*rank_params, *params, limit]).fetchall()
+        return _project([json.loads(data) for (data,) in rows], select)
+
+    def _index(self, table: str, kind: type) -> Any:
+        return next((index for index in self.indexes.get(table, ()) if isinstance(index, kind)), None)
+
+    def _ranked(
+        self,
+        table: str,
+        candidates: List[Tuple[Any, int, int]],
+        clauses: List[str],
+        params: List[Any],
+        select: str,
+        limit: int,
+    ) -> List[Dict[str, Any]]:
+        """Rows for ``(pk, rank, position)`` candidates that pass the filters, in candidate order."""
+        if not candidates:
+            return []
+        sql = (
+            f"select t.data from json_each(?) c join {table} t on t.pk = json_extract(c.value, '$[0]')"
+            + "".join(f" and {clause}" for clause in clauses)
+            + " order by json_extract(c.value, '$[1]'), json_extract(c.value, '$[2]'), t.updated_at desc nulls last"
+            + " limit ?"
+        )
+        with self._lock:
+            rows = self._conn.execute(sql, [json.dumps(candidates, default=str), *params, limit]).fetchall()
+        return _project([json.loads(data) for (data,) in rows], select)
+
+    def count(self, table: str, filters: Optional[Dict[str, str]] = None) -> int:
+        clauses, params = _where(filters or {}, self.id_columns[table]) or ([], [])
+        sql = f"select count(*) from {table}"
+        if clauses:
+            sql += " where " + " and ".join(clauses)
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ReplicaSyncer:
+    """Keeps a LocalReplica current from Supabase.
+
+    Every ``interval`` seconds each table pulls the rows whose ``updated_at`` is
+    past its watermark (re-reading an ``overlap`` window to catch transactions
+    that committed late), in keyset pages. Every ``reconcile_interval`` seconds
+    the full list of primary keys is compared to drop rows deleted upstream.
+    Tables without ``updated_at`` are fully reloaded at reconcile time instead.
+    Writes to the SQLite file run in worker threads, off the event loop.
+    """
+
+    def __init__(
+        self,
+        client: AsyncSupabaseClient,
+        replica: LocalReplica,
+        interval: float = 10.0,
+        reconcile_interval: float = 600.0,
+        page_size: int = 1000,
+        overlap: float = 5.0,
+    ) -> None:
+        self.client = client
+        self.replica = replica
+        self.interval = interval
+        self.reconcile_interval = reconcile_interval
+        self.page_size = page_size
+        self.overlap = overlap
+
+    async def run(self) -> None:
+        while True:
+            for table in self.replica.id_columns:
+                try:
+                    await self.sync_table(table)
+                except (httpx.HTTPError, sqlite3.Error) as exc:
+                    logging.warning("Не удалось синхронизировать реплику %s: %s", table, exc)
+            await asyncio.sleep(self.interval)
+
+    async def sync_table(self, table: str) -> Dict[str, int]:
+        started = time.time()
+        meta = self.replica.meta(table)
+        incremental = meta.get("incremental", True)
+        reconcile_due = time.time() - (meta.get("reconciled_at") or 0) >= self.reconcile_interval
+        stats = {"pulled": 0, "removed": 0}
+        if meta.get("watermark") is None and incremental or reconcile_due and not incremental:
+            keys = await self._full_load(table)
+            stats["pulled"] = len(keys)
+            stats["removed"] = await anyio.to_thread.run_sync(self.replica.retain, table, keys)
+            self.replica.set_meta(table, reconciled_at=started)
+        elif incremental:
+            stats["pulled"] = await self._pull_changes(table, meta)
+            if reconcile_due:
+                keys = await self._remote_keys(table)
+                stats["removed"] = await anyio.to_thread.run_sync(self.replica.retain, table, keys)
+                self.replica.set_meta(table, reconciled_at=started)
+        self.replica.set_meta(table, synced_at=started)
+        if stats["pulled"] or stats["removed"]:
+            logging.info("Реплика %s: получено %s, удалено %s", table, stats["pulled"], stats["removed"])
+        return stats
+
+    async def _full_load(self, table: str) -> List[Any]:
+        id_column = self.replica.id_columns[table]
+        keys: List[Any] = []
+        watermark: Optional[Tuple[str, Any]] = None
+        while True:
+            params: Dict[str, Any] = {"select": "*", "order": f"{id_column}.asc", "limit": self.page_size}
+            if keys:
+                params[id_column] = f"gt.{keys[-1]}"
+            rows = await self._fetch(table, params)
+            await anyio.to_thread.run_sync(self.replica.upsert, table, rows)
+            keys.extend(row[id_column] for row in rows)
+            for row in rows:
+                if row.get("updated_at") and (watermark is None or row["updated_at"] > watermark[0]):
+                    watermark = (row["updated_at"], row[id_column])
+            if len(rows) < self.page_size:
+                break
+        if watermark is not None:
+            self.replica.set_meta(table, watermark=watermark[0], watermark_pk=watermark[1], incremental=1)
+        elif keys:
+            # rows but no updated_at values: nothing to follow incrementally
+            self.replica.set_meta(table, incremental=0)
+        return keys
+
+    async def _pull_changes(self, table: str, meta: Dict[str, Any]) -> int:
+        id_column = self.replica.id_columns[table]
+        since = _minus_seconds(meta["watermark"], self.overlap)
+        pulled = 0
+        cursor: Optional[Tuple[str, Any]] = None
+        watermark = (meta["watermark"], meta["watermark_pk"])
+        while True:
+            params: Dict[str, Any] = {
+                "select": "*",
+                "order": f"updated_at.asc,{id_column}.asc",
+                "limit": self.page_size,
+                "updated_at": f"gte.{since}",
+            }
+            if cursor is not None:
+                stamp = _quote_filter_value(cursor[0])
+                after = f"{id_column}.gt.{_quote_filter_value(str(cursor[1]))}"
+                params["or"] = f"(updated_at.gt.{stamp},and(updated_at.eq.{stamp},{after}))"
+            try:
+                rows = await self._fetch(table, params)
+            except httpx.HTTPStatusError as exc:
+                if exc.response.status_code != 400:
+                    raise
+                # no updated_at column: fall back to full reloads at reconcile time
+                self.replica.set_meta(table, incremental=0)
+                return pulled
+            if not rows:
+                break
+            await anyio.to_thread.run_sync(self.replica.upsert, table, rows)
+            pulled += len(rows)
+            cursor = (rows[-1]["updated_at"], rows[-1][id_column])
+            if cursor[0] > watermark[0]:
+                watermark = cursor
+            if len(rows) < self.page_size:
+                break
+        self.replica.set_meta(table, watermark=watermark[0], watermark_pk=watermark[1])
+        return pulled
+
+    async def _remote_keys(self, table: str) -> List[Any]:
+        id_column = self.replica.id_columns[table]
+        keys: List[Any] = []
+        while True:
+            params: Dict[str, Any] = {"select": id_column, "order": f"{id_column}.asc", "limit": self.page_size * 10}
+            if keys:
+                params[id_column] = f"gt.{keys[-1]}"
+            rows = await self._fetch(table, params)
+            keys.extend(row[id_column] for row in rows)
+            if len(rows) < params["limit"]:
+                return keys
+
+    async def _fetch(self, table: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        response = await self.client.client.get(self.client._rest_url(table), params=params)
+        response.raise_for_status()
+        return response.json()
+
+
+def _search_candidates(
+    term: str, address_index: AddressIndex, price_index: PriceIndex, text_limit: int
+) -> List[Tuple[Any, int, int]]:
+    """``(pk, rank, position)`` for every object the term can match: exact ID 0, text 1, price 2."""
+    exact = term.strip()
+    tiers: Dict[Any, Tuple[int, int]] = {}
+    price_range = parse_price_range(exact)
+    if price_range is not None:
+        for pk in price_index.in_range(*price_range):
+            tiers.setdefault(pk, (2, 0))
+        return [(pk, rank, position) for pk, (rank, position) in tiers.items()]
+    # the pk may be stored as text or as a number
+    tiers[exact] = (0, 0)
+    if exact.isdigit():
+        tiers.setdefault(int(exact), (0, 0))
+    for position, (pk, _) in enumerate(address_index.search(exact, limit=text_limit)):
+        tiers.setdefault(pk, (1, position))
+    if NUMERIC_TERM_RE.match(exact):
+        for pk in price_index.match_digits(_only_digits(term)):
+            tiers.setdefault(pk, (2, 0))
+    return [(pk, rank, position) for pk, (rank, position) in tiers.items()]
+
+
+def _check_column(name: str) -> str:
+    if not COLUMN_RE.match(name):
+        raise ValueError(f"Недопустимое имя колонки: {name}")
+    return name
+
+
+def _json_path_sql(column: str, id_column: str) -> str:
+    if column == id_column:
+        return "pk"
+    if column == "updated_at":
+        return "updated_at"
+    return f"json_extract(data, '$.{_check_column(column)}')"
+
+
+def _key_params(values: Iterable[Any]) -> List[Any]:
+    """Lookup values for a key column: each key as text and, if it is an integer, also as a number.
+
+    The pk keeps the JSON type of the upstream column, so both forms are tried
+    with a plain ``in (...)`` that SQLite answers from the primary key index.
+    """
+    params: List[Any] = []
+    for key in dict.fromkeys(str(value) for value in values):
+        params.append(key)
+        if INTEGER_RE.match(key):
+            params.append(int(key))
+    return params
+
+
+def _sql_value(raw: str) -> Any:
+    lowered = raw.lower()
+    if lowered in ("true", "false"):
+        return int(lowered == "true")
+    try:
+        return int(raw)
+    except ValueError:
+        pass
+    try:
+        return float(raw)
+    except ValueError:
+        return raw.strip('"')
+
+
+def _where(filters: Dict[str, str], id_column: str = "") -> Optional[Tuple[List[str], List[Any]]]:
+    """Translate simple PostgREST filters to SQL; None if any of them is not supported."""
+    clauses: List[str] = []
+    params: List[Any] = []
+    for column, expression in filters.items():
+        if not COLUMN_RE.match(column) or column in ("or", "and", "not"):
+            return None
+        operator, _, value = str(expression).partition(".")
+        target = _json_path_sql(column, id_column)
+        if operator in FILTER_OPERATORS:
+            sql_op = FILTER_OPERATORS[operator]
+            if operator in ("eq", "neq"):
+                # match typed JSON values and their text form, like PostgREST's implicit casts;
+                # an in (...) list keeps the pk and expression indexes usable
+                clauses.append(f"{target} {'in' if operator == 'eq' else 'not in'} (?, ?)")
+                params.extend([_sql_value(value), value.strip('"')])
+            else:
+                clauses.append(f"{target} {sql_op} ?")
+                params.append(_sql_value(value))
+        elif operator == "is" and value in ("null", "true", "false"):
+            clauses.append(f"{target} is null" if value == "null" else f"{target} = ?")
+            if value != "null":
+                params.append(_sql_value(value))
+        elif operator == "in" and value.startswith("(") and value.endswith(")"):
+            items = [item.strip().strip('"') for item in value[1:-1].split(",") if item.strip()]
+            values = list(dict.fromkeys(variant for item in items for variant in (_sql_value(item), item)))
+            clauses.append(f"{target} in ({', '.join('?' * len(values))})")
+            params.extend(values)
+        else:
+            return None
+    return clauses, params
+
+
+def _order_sql(order: str, id_column: str) -> str:
+    parts = []
+    for item in order.split(","):
+        column, *modifiers = item.strip().split(".")
+        direction = "desc" if "desc" in modifiers else "asc"
+        nulls = " nulls first" if "nullsfirst" in modifiers else " nulls last" if "nullslast" in modifiers else ""
+        parts.append(f"{_json_path_sql(column, id_column)} {direction}{nulls}")
+    return ", ".join(parts)
+
+
+def _select_columns(select: str) -> Any:
+    """Column list for a plain select, None for ``*``, False for embeds and other unsupported forms."""
+    if select.strip() == "*":
+        return None
+    columns = [column.strip() for column in select.split(",")]
+    if not all(COLUMN_RE.match(column) for column in columns):
+        return False
+    return columns
+
+
+def _project(rows: List[Dict[str, Any]], select: str) -> List[Dict[str, Any]]:
+    columns = _select_columns(select)
+    if not columns:
+        return rows
+    return [{column: row.get(column) for column in columns if column in row} for row in rows]
+
+
+def _casefold(value: Any) -> Optional[str]:
+    return None if value is None else str(value).casefold()
+
+
+def _only_digits(value: Any) -> str:
+    return "" if value is None else "".join(ch for ch in str(value) if ch.isdigit())
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _minus_seconds(stamp: str, seconds: float) -> str:
+    try:
+        moment = datetime.fromisoformat(stamp.replace("Z", "+00:00"))
+    except ValueError:
+        return stamp
+    return (moment - timedelta(seconds=seconds)).isoformat()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Одноразовое заполнение cian_id / cian_url для всей таблицы objects.
+
+Проходит таблицу пачками по возрастанию ID и сохраняет недостающие значения
+одним вызовом `apply_patches` на пачку (sql/apply_patches.sql; без функции —
+PATCH-запросами по одинаковым значениям). Удалённые строки не создаются заново,
+и после прохода мини-приложению больше нечего дописывать при чтении.
+
+Пример:
+    python3 scripts/backfill_cian_identifiers.py --batch-size 500
+
+Опции:
+    --batch-size N   Сколько объектов читать и сохранять за один запрос (по умолчанию 500).
+    --dry-run        Только посчитать объекты, которые нужно исправить.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from pathlib import Path
+from typing import Optional
+
+from dotenv import load_dotenv
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from cian_identifiers import cian_identifier_patch  # noqa: E402
+from supabase_client import SupabaseClient  # noqa: E402
+
+load_dotenv()
+
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+OBJECT_ID_COLUMN = os.getenv("SUPABASE_OBJECT_ID_COLUMN", "id")
+
+
+def require_env(name: str, value: Optional[str]) -> str:
+    if not value:
+        raise SystemExit(f"{name} is not set. Please export it or add to .env.")
+    return value
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Заполнение cian_id/cian_url в таблице objects.")
+    parser.add_argument("--batch-size", type=int, default=500, help="Размер пачки")
+    parser.add_argument("--dry-run", action="store_true", help="Ничего не записывать")
+    args = parser.parse_args()
+
+    client = SupabaseClient(
+        base_url=require_env("SUPABASE_URL", SUPABASE_URL),
+        api_key=require_env("SUPABASE_SERVICE_ROLE_KEY", SUPABASE_KEY),
+        object_id_column=OBJECT_ID_COLUMN,
+    )
+    select = ",".join(dict.fromkeys([OBJECT_ID_COLUMN, "external_id", "cian_id", "cian_url"]))
+
+    scanned = fixed = 0
+    last_id: Optional[str] = None
+    while True:
+        filters = {OBJECT_ID_COLUMN: f"gt.{last_id}"} if last_id is not None else None
+        rows = client.list_objects(
+            limit=args.batch_size,
+            select=select,
+            filters=filters,
+            order=f"{OBJECT_ID_COLUMN}.asc",
+        )
+        if not rows:
+            break
+        last_id = str(rows[-1][OBJECT_ID_COLUMN])
+        scanned += len(rows)
+
+        updates = []
+        for row in rows:
+            patch = cian_identifier_patch(row, row[OBJECT_ID_COLUMN])
+            if patch:
+                updates.append({OBJECT_ID_COLUMN: row[OBJECT_ID_COLUMN], **patch})
+        if updates and not args.dry_run:
+            client.patch_records(client.table, updates, OBJECT_ID_COLUMN)
+        fixed += len(updates)
+        print(f"Просмотрено {scanned}, исправлено {fixed} (последний ID {last_id})")
+
+        if len(rows) < args.batch_size:
+            break
+
+    suffix = " (dry run, ничего не записано)" if args.dry_run else ""
+    print(f"Готово: просмотрено {scanned}, исправлено {fixed}{suffix}.")
+
+
+if __name__ == "__main__":
+    main()
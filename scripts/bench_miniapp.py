@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест мини-приложения на локальных заглушках Supabase, CIAN и Telegram.
+
+Поднимает `scripts/fake_upstreams.py` и `miniapp_server.py` (uvicorn) как
+отдельные процессы, по очереди гоняет сценарии и печатает для каждого
+пропускную способность и задержки p50/p95/p99. Реальные Supabase/CIAN/Telegram
+не используются — переменные окружения сервера подменяются.
+
+Пример:
+    python3 scripts/bench_miniapp.py --objects 100000 --concurrency 20 --duration 15 \\
+        --supabase-latency 25 --cian-latency 150
+
+Опции:
+    --scenarios LIST         Сценарии через запятую: listing, search, moderation, showings, cian-report
+                             (по умолчанию все).
+    --objects N              Размер сгенерированной таблицы objects (по умолчанию 10000).
+    --concurrency N          Одновременных клиентов (по умолчанию 10).
+    --duration SEC           Длительность замера каждого сценария (по умолчанию 10).
+    --warmup SEC             Прогрев перед замером, в статистику не входит (по умолчанию 2).
+    --supabase-latency MS    Задержка заглушки PostgREST (по умолчанию 20).
+    --cian-latency MS        Задержка заглушки CIAN (по умолчанию 100).
+    --telegram-latency MS    Задержка заглушки Telegram (по умолчанию 50).
+    --replica                Включить локальную реплику (SUPABASE_REPLICA_PATH во временном каталоге).
+    --server-env K=V         Дополнительная переменная окружения сервера (можно повторять).
+    --base-url URL           Не поднимать процессы, а нагружать уже запущенный сервер.
+    --replay FILE            Вместо сценариев повторить запись TRAFFIC_RECORD_PATH: сервер отвечает
+                             записанными ответами Supabase/CIAN/Telegram, входящие запросы /api/
+                             отправляются заново; рядом печатаются задержки из записи.
+    --replay-speed X         Темп повтора: 0 — подряд в --concurrency потоков (по умолчанию),
+                             1 — в исходном темпе, 10 — в десять раз быстрее.
+    --latency-scale X        Множитель записанных задержек внешних сервисов (по умолчанию 1, 0 — без задержек).
+    --json PATH              Сохранить результаты в JSON, чтобы сравнить прогоны до и после изменения.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+from fake_upstreams import COMPLEXES, STREETS
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from recording import TrafficReplay  # noqa: E402
+
+ROOT = Path(__file__).resolve().parent.parent
+SCENARIOS = ("listing", "search", "moderation", "showings", "cian-report")
+STARTUP_TIMEOUT = 600.0
+
+# (method, path, json body)
+Call = Tuple[str, str, Optional[Dict[str, Any]]]
+
+
+@dataclass
+class Result:
+    scenario: str
+    duration: float
+    latencies: List[float] = field(default_factory=list)
+    errors: Dict[str, int] = field(default_factory=dict)
+
+    def percentile(self, fraction: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+    def summary(self, recorded: Optional["Result"] = None) -> Dict[str, Any]:
+        extra = {}
+        if recorded is not None:
+            extra = {
+                "recorded_p50_ms": round(recorded.percentile(0.50) * 1000, 1),
+                "recorded_p95_ms": round(recorded.percentile(0.95) * 1000, 1),
+            }
+        return {
+            **extra,
+            "scenario": self.scenario,
+            "requests": len(self.latencies),
+            "errors": sum(self.errors.values()),
+            "error_kinds": self.errors,
+            "rps": round(len(self.latencies) / self.duration, 1) if self.duration else 0.0,
+            "p50_ms": round(self.percentile(0.50) * 1000, 1),
+            "p95_ms": round(self.percentile(0.95) * 1000, 1),
+            "p99_ms": round(self.percentile(0.99) * 1000, 1),
+            "max_ms": round(max(self.latencies, default=0.0) * 1000, 1),
+        }
+
+
+def scenario_calls(name: str, objects: int, rnd: random.Random) -> Callable[[], List[Call]]:
+    """One iteration of a page: the API calls the mini app makes when the page is opened."""
+
+    def object_id() -> int:
+        return rnd.randint(1, objects)
+
+    def listing() -> List[Call]:
+        return [("GET", "/api/objects?limit=100&view=card", None), ("GET", f"/api/objects/{object_id()}?include=owner", None)]
+
+    def search() -> List[Call]:
+        term = rnd.choice(
+            [
+                STREETS[rnd.randrange(len(STREETS))].split(". ", 1)[-1],
+                f"{STREETS[rnd.randrange(len(STREETS))]} {rnd.randint(1, 180)}",
+                COMPLEXES[rnd.randrange(len(COMPLEXES))],
+                str(object_id()),
+                f"{rnd.randrange(50, 300)}000",
+            ]
+        )
+        return [("GET", f"/api/objects?{httpx.QueryParams({'q': term, 'limit': 50})}", None)]
+
+    def moderation() -> List[Call]:
+        return [("GET", "/api/moderation?limit=50&view=card", None), ("GET", "/api/moderation/count", None)]
+
+    def showings() -> List[Call]:
+        body = {
+            "object_id": str(object_id()),
+            "schedule": {"date": "2025-01-15", "time": "12:00"},
+            "owner": {},
+            "client": {"name": "Нагрузочный тест", "phone": "+70000000000", "group": "family"},
+        }
+        return [("POST", "/api/showings", body)]
+
+    def cian_report() -> List[Call]:
+        return [
+            ("GET", "/api/cian/order-info", None),
+            ("GET", "/api/cian/order-report", None),
+            ("GET", f"/api/cian/images-report?page={rnd.randint(1, 5)}&page_size=100", None),
+        ]
+
+    return {
+        "listing": listing,
+        "search": search,
+        "moderation": moderation,
+        "showings": showings,
+        "cian-report": cian_report,
+    }[name]
+
+
+async def run_scenario(
+    client: httpx.AsyncClient, name: str, objects: int, concurrency: int, duration: float, warmup: float
+) -> Result:
+    rnd = random.Random(name)
+    next_calls = scenario_calls(name, objects, rnd)
+    result = Result(name, duration)
+    started = time.perf_counter()
+    measure_from = started + warmup
+    deadline = measure_from + duration
+
+    async def worker() -> None:
+        while True:
+            for method, path, body in next_calls():
+                now = time.perf_counter()
+                if now >= deadline:
+                    return
+                try:
+                    response = await client.request(method, path, json=body)
+                    await response.aread()
+                    error = None if response.status_code < 400 else f"HTTP {response.status_code}"
+                except httpx.HTTPError as exc:
+                    error = type(exc).__name__
+                elapsed = time.perf_counter() - now
+                if now < measure_from:
+                    continue
+                if error:
+                    result.errors[error] = result.errors.get(error, 0) + 1
+                else:
+                    result.latencies.append(elapsed)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return result
+
+
+def route_label(method: str, path: str) -> str:
+    return f"{method} {re.sub(r'/[0-9]+(?=/|$)', '/{id}', path)}"
+
+
+async def run_replay(
+    client: httpx.AsyncClient, entries: List[Dict[str, Any]], concurrency: int, speed: float
+) -> List[Dict[str, Any]]:
+    """Send recorded inbound requests again; results per route next to the latencies from the recording."""
+    replayed: Dict[str, Result] = {}
+    recorded: Dict[str, Result] = {}
+    for entry in entries:
+        label = route_label(entry["method"], entry["path"])
+        recorded.setdefault(label, Result(label, 0.0)).latencies.append(entry["duration"])
+    started = time.perf_counter()
+    first = entries[0]["t"] if entries else 0.0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(entry: Dict[str, Any]) -> None:
+        if speed > 0:
+            await asyncio.sleep(max(0.0, (entry["t"] - first) / speed - (time.perf_counter() - started)))
+        label = route_label(entry["method"], entry["path"])
+        result = replayed.setdefault(label, Result(label, 0.0))
+        path = f"{entry['path']}?{entry['query']}" if entry["query"] else entry["path"]
+        body = entry.get("request_body") or None
+        async with semaphore:
+            now = time.perf_counter()
+            try:
+                response = await client.request(
+                    entry["method"], path, content=body, headers={"content-type": "application/json"} if body else None
+                )
+                await response.aread()
+                error = None if response.status_code == entry["status"] or response.status_code < 400 else f"HTTP {response.status_code}"
+            except httpx.HTTPError as exc:
+                error = type(exc).__name__
+            elapsed = time.perf_counter() - now
+        if error:
+            result.errors[error] = result.errors.get(error, 0) + 1
+        else:
+            result.latencies.append(elapsed)
+
+    await asyncio.gather(*(send(entry) for entry in entries))
+    wall = time.perf_counter() - started
+    summaries = []
+    for label, result in sorted(replayed.items()):
+        result.duration = wall
+        summaries.append(result.summary(recorded.get(label)))
+    return summaries
+
+
+def _wait_ready(url: str, process: Optional[subprocess.Popen], name: str) -> None:
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise SystemExit(f"{name} завершился с кодом {process.returncode}")
+        try:
+            if httpx.get(url, timeout=2).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise SystemExit(f"{name} не ответил за {STARTUP_TIMEOUT:.0f} с ({url})")
+
+
+@contextmanager
+def local_stack(args: argparse.Namespace) -> Iterator[str]:
+    """Fake upstreams plus the mini app server on loopback ports; yields the server base URL."""
+    fake_url = f"http://127.0.0.1:{args.fake_port}"
+    app_url = f"http://127.0.0.1:{args.app_port}"
+    fake: Optional[subprocess.Popen] = None
+    if args.replay:
+        # nothing listens there: every upstream call is answered from the recording
+        fake_url = "http://replay.invalid"
+    else:
+        fake = subprocess.Popen(
+            [
+                sys.executable,
+                str(ROOT / "scripts" / "fake_upstreams.py"),
+                "--port", str(args.fake_port),
+                "--objects", str(args.objects),
+                "--supabase-latency", str(args.supabase_latency),
+                "--cian-latency", str(args.cian_latency),
+                "--telegram-latency", str(args.telegram_latency),
+            ]
+        )
+    server: Optional[subprocess.Popen] = None
+    with tempfile.TemporaryDirectory() as workdir:
+        try:
+            if fake is not None:
+                _wait_ready(f"{fake_url}/_fake/stats", fake, "fake_upstreams")
+            env = {
+                **os.environ,
+                "SUPABASE_URL": fake_url,
+                "SUPABASE_SERVICE_ROLE_KEY": "bench",
+                "SUPABASE_OBJECT_ID_COLUMN": "id",
+                "CIAN_API_BASE_URL": f"{fake_url}/cian",
+                "CIAN_API_TOKEN": "bench",
+                "TELEGRAM_API_BASE_URL": f"{fake_url}/telegram",
+                "NOTIFY_BOT_TOKEN": "1:bench",
+                "NOTIFY_CHAT_ID": "1",
+                "SHOWING_BOT_TOKEN": "2:bench",
+                "SHOWING_CHAT_ID": "2",
+                "TELEGRAM_OUTBOX_DB": "",
+                "SUPABASE_REPLICA_PATH": str(Path(workdir) / "replica.sqlite3") if args.replica else "",
+                "TRAFFIC_RECORD_PATH": "",
+                "TRAFFIC_REPLAY_PATH": str(Path(args.replay).resolve()) if args.replay else "",
+                "TRAFFIC_REPLAY_LATENCY_SCALE": str(args.latency_scale),
+            }
+            for item in args.server_env:
+                key, _, value = item.partition("=")
+                env[key] = value
+            server = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "miniapp_server:app", "--port", str(args.app_port), "--log-level", "warning"],
+                cwd=ROOT,
+                env=env,
+            )
+            _wait_ready(f"{app_url}/api/moderation/count", server, "miniapp_server")
+            yield app_url
+        finally:
+            for process in (server, fake):
+                if process is not None:
+                    process.terminate()
+                    try:
+                        process.wait(timeout=10)
+                    except subprocess.TimeoutExpired:
+                        process.kill()
+
+
+def print_table(results: List[Dict[str, Any]]) -> None:
+    width = max([12, *(len(row["scenario"]) for row in results)])
+    recorded = any("recorded_p50_ms" in row for row in results)
+    header = f"{'сценарий':<{width}} {'запросов':>9} {'ошибок':>7} {'rps':>8} {'p50 мс':>8} {'p95 мс':>8} {'p99 мс':>8} {'max мс':>8}"
+    if recorded:
+        header += f" {'p50 зап.':>9} {'p95 зап.':>9}"
+    print(header)
+    print("-" * len(header))
+    for row in results:
+        line = (
+            f"{row['scenario']:<{width}} {row['requests']:>9} {row['errors']:>7} {row['rps']:>8} "
+            f"{row['p50_ms']:>8} {row['p95_ms']:>8} {row['p99_ms']:>8} {row['max_ms']:>8}"
+        )
+        if recorded:
+            line += f" {row.get('recorded_p50_ms', '—'):>9} {row.get('recorded_p95_ms', '—'):>9}"
+        print(line)
+        if row["error_kinds"]:
+            print(f"{'':<{width}} ошибки: {row['error_kinds']}")
+
+
+async def run_all(base_url: str, args: argparse.Namespace, scenarios: List[str]) -> List[Dict[str, Any]]:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        if args.replay:
+            entries = sorted(TrafficReplay.load(args.replay).inbound, key=lambda entry: entry["t"])
+            print(f"→ повтор {len(entries)} запросов из {args.replay}", flush=True)
+            return await run_replay(client, entries, args.concurrency, args.replay_speed)
+        results = []
+        for name in scenarios:
+            print(f"→ {name}: {args.concurrency} клиентов, {args.duration:.0f} с", flush=True)
+            result = await run_scenario(client, name, args.objects, args.concurrency, args.duration, args.warmup)
+            results.append(result.summary())
+        return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Нагрузочный тест мини-приложения на заглушках внешних сервисов.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Сценарии через запятую")
+    parser.add_argument("--objects", type=int, default=10_000, help="Размер таблицы objects")
+    parser.add_argument("--concurrency", type=int, default=10, help="Одновременных клиентов")
+    parser.add_argument("--duration", type=float, default=10.0, help="Секунд замера на сценарий")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Секунд прогрева на сценарий")
+    parser.add_argument("--supabase-latency", type=float, default=20.0, help="Задержка PostgREST, мс")
+    parser.add_argument("--cian-latency", type=float, default=100.0, help="Задержка CIAN, мс")
+    parser.add_argument("--telegram-latency", type=float, default=50.0, help="Задержка Telegram, мс")
+    parser.add_argument("--replica", action="store_true", help="Включить локальную реплику SQLite")
+    parser.add_argument("--server-env", action="append", default=[], metavar="K=V", help="Переменная окружения сервера")
+    parser.add_argument("--fake-port", type=int, default=8900)
+    parser.add_argument("--app-port", type=int, default=8901)
+    parser.add_argument("--base-url", help="Нагружать уже запущенный сервер")
+    parser.add_argument("--replay", help="Повторить запись трафика (TRAFFIC_RECORD_PATH)")
+    parser.add_argument("--replay-speed", type=float, default=0.0, help="0 — подряд, 1 — в исходном темпе")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Множитель записанных задержек")
+    parser.add_argument("--json", dest="json_path", help="Куда сохранить результаты")
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Неизвестные сценарии: {', '.join(sorted(unknown))}")
+
+    if args.base_url:
+        results = asyncio.run(run_all(args.base_url.rstrip("/"), args, scenarios))
+    else:
+        with local_stack(args) as base_url:
+            results = asyncio.run(run_all(base_url, args, scenarios))
+
+    print()
+    print_table(results)
+    if args.json_path:
+        settings = {key: value for key, value in vars(args).items() if key != "json_path"}
+        Path(args.json_path).write_text(
+            json.dumps({"settings": settings, "results": results}, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+        print(f"\nРезультаты сохранены в {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Микробенчмарк карточки объекта в боте (`bot.build_object_summary`).
+
+Генерирует объекты, похожие на строки `objects`, с 50–200 колонками (поля
+из таблиц карточки, служебные колонки, описания и фото, которые в карточку
+не попадают) и печатает среднее время на одну карточку и число карточек в
+секунду для каждого размера.
+
+Пример:
+    python3 scripts/bench_summary.py --columns 50,100,200 --objects 200 --repeat 20
+
+Опции:
+    --columns LIST   Числа колонок через запятую (по умолчанию 50,100,200).
+    --objects N      Сколько разных объектов каждого размера (по умолчанию 200).
+    --repeat N       Сколько раз прогнать весь набор (по умолчанию 20).
+    --seed N         Зерно генератора (по умолчанию 1).
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import bot  # noqa: E402
+
+EXTRA_VALUES = (
+    lambda rnd: rnd.randint(0, 10_000),
+    lambda rnd: round(rnd.uniform(0, 1000), 2),
+    lambda rnd: rnd.choice([True, False]),
+    lambda rnd: rnd.choice(["да", "нет", "по запросу", ""]),
+    lambda rnd: None,
+    lambda rnd: {"lat": round(rnd.uniform(55, 56), 5), "lon": round(rnd.uniform(37, 38), 5)},
+    lambda rnd: [f"тег {rnd.randint(1, 50)}" for _ in range(rnd.randint(0, 4))],
+)
+
+
+def generate_object(columns: int, rnd: random.Random) -> Dict[str, Any]:
+    """A row with the card fields filled the way production rows are, padded with extra columns."""
+    obj: Dict[str, Any] = {
+        "id": rnd.randint(100_000, 999_999),
+        "external_id": str(rnd.randint(100_000, 999_999)),
+        "status": rnd.choice(["active", "draft", "rejected"]),
+        "rooms": rnd.randint(1, 5),
+        "area": f"{rnd.uniform(25, 160):.1f} м²",
+        "kitchen_area": round(rnd.uniform(6, 25), 1),
+        "ceiling_height": rnd.choice(["2,7", "3.05", 2.8]),
+        "floor": rnd.randint(1, 30),
+        "floors_total": rnd.randint(5, 40),
+        "complex": rnd.choice(["ЖК Символ", "ЖК Солнечный", None]),
+        "address": f"Москва, ул. Ленина, д. {rnd.randint(1, 180)}",
+        "metro": rnd.choice(["Тверская", "Арбатская", "Октябрьская"]),
+        "coords": {"lat": 55.75, "lon": 37.61},
+        "price": rnd.choice([rnd.randint(30_000, 400_000), f"{rnd.randint(30, 400)} 000 ₽"]),
+        "deposit": rnd.randint(30_000, 400_000),
+        "commission": rnd.choice(["50%", 0, ""]),
+        "contact_name": "Анна",
+        "phone": "+79990000000",
+        "url": "https://www.cian.ru/rent/flat/300000001/",
+        "description": "Светлая квартира с ремонтом. " * rnd.randint(5, 40),
+        "photos": [f"https://img.example.com/{index}.jpg" for index in range(rnd.randint(5, 30))],
+        "moderator": rnd.choice([True, False]),
+        "updated_at": "2025-01-01T12:00:00+00:00",
+    }
+    index = 0
+    while len(obj) < columns:
+        name = rnd.choice(["param", "cian_image_url", "feature", "photo_thumb", "amenity", "option"])
+        obj[f"{name}_{index}"] = EXTRA_VALUES[rnd.randrange(len(EXTRA_VALUES))](rnd)
+        index += 1
+    return obj
+
+
+def measure(objects: List[Dict[str, Any]], repeat: int) -> float:
+    """Seconds per summary, best of three runs over the whole set."""
+    best = float("inf")
+    for _ in range(3):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for obj in objects:
+                bot.build_object_summary(obj)
+        best = min(best, time.perf_counter() - started)
+    return best / (repeat * len(objects))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Микробенчмарк bot.build_object_summary.")
+    parser.add_argument("--columns", default="50,100,200", help="Числа колонок через запятую")
+    parser.add_argument("--objects", type=int, default=200, help="Объектов каждого размера")
+    parser.add_argument("--repeat", type=int, default=20, help="Повторов всего набора")
+    parser.add_argument("--seed", type=int, default=1, help="Зерно генератора")
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    print(f"{'колонок':>8} {'мкс/карточка':>14} {'карточек/с':>12} {'символов':>9}")
+    for columns in (int(value) for value in args.columns.split(",") if value.strip()):
+        objects = [generate_object(columns, rnd) for _ in range(args.objects)]
+        per_call = measure(objects, args.repeat)
+        length = sum(len(bot.build_object_summary(obj)) for obj in objects) // len(objects)
+        print(f"{columns:>8} {per_call * 1e6:>14.1f} {1 / per_call:>12.0f} {length:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,626 @@
+#!/usr/bin/env python3
+"""
+Локальные заглушки Supabase (PostgREST), CIAN API и Telegram Bot API для нагрузочных тестов.
+
+Один процесс отвечает на три «сервиса» с настраиваемой задержкой:
+    /rest/v1/...          PostgREST: eq/neq/gt/gte/lt/lte/like/ilike/in/is/not, or/and,
+                          order, limit, offset, select с встраиванием owner:owners(*),
+                          Prefer: count=exact|planned|estimated и return=representation|minimal,
+                          upsert (on_conflict), rpc/search_objects, rpc/apply_patches
+    /cian/v1/...          get-order, get-last-order-info, get-images-report
+    /telegram/bot<token>/<метод>
+
+Таблица objects генерируется при старте (10k–1M строк). Подходит для
+`scripts/bench_miniapp.py`, но её можно запустить и отдельно:
+
+    python3 scripts/fake_upstreams.py --objects 100000 --port 8900 --supabase-latency 20
+
+и указать мини-приложению SUPABASE_URL=http://127.0.0.1:8900,
+CIAN_API_BASE_URL=http://127.0.0.1:8900/cian, TELEGRAM_API_BASE_URL=http://127.0.0.1:8900/telegram.
+
+Опции:
+    --objects N              Сколько объектов сгенерировать (по умолчанию 10000).
+    --seed N                 Зерно генератора данных (по умолчанию 1).
+    --supabase-latency MS    Задержка ответа PostgREST в миллисекундах (по умолчанию 0).
+    --cian-latency MS        Задержка CIAN API (по умолчанию 0).
+    --telegram-latency MS    Задержка Telegram (по умолчанию 0).
+    --jitter FRACTION        Разброс задержки, доля от неё (по умолчанию 0.2).
+    --cian-offers N          Сколько объявлений в отчёте CIAN (по умолчанию 500).
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import bisect
+import json
+import random
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+STREETS = (
+    "ул. Ленина", "ул. Тверская", "пр-т Мира", "Ленинский пр-т", "ул. Арбат", "ул. Профсоюзная",
+    "ул. Новослободская", "Кутузовский пр-т", "ул. Маросейка", "ул. Садовая-Кудринская",
+    "ул. Большая Якиманка", "ул. Пятницкая", "Варшавское ш.", "ул. Вавилова", "ул. Остоженка",
+)
+METRO = ("Тверская", "Арбатская", "Проспект Мира", "Октябрьская", "Профсоюзная", "Кропоткинская", "Тульская")
+COMPLEXES = ("ЖК Солнечный", "ЖК Символ", "ЖК Садовые кварталы", "ЖК Level Причальный", "ЖК Пресня Сити")
+STATUSES = ("active", "draft", "rejected", "inactive")
+CIAN_STATUSES = ("Published", "Moderate", "Refused", "Deactivated")
+SEARCH_TEXT_COLUMNS = ("address", "full_address", "complex_name")
+PRICE_COLUMNS = ("price", "price_total", "price_rub", "price_month", "price_per_month")
+# sql/search_objects.sql only matches prices for purely numeric terms
+NUMERIC_TERM_RE = re.compile(r"^[0-9][0-9 .,]*$")
+KEYSET_RE = re.compile(r'^\(updated_at\.lt\.(?P<stamp>"[^"]*"|[^,]*),and\(updated_at\.eq\.[^,]*,id\.lt\.(?P<id>"[^"]*"|[^)]*)\)')
+PLANNED_COUNT_TTL = 60.0
+
+Row = Dict[str, Any]
+Predicate = Callable[[Row], bool]
+
+
+def generate_objects(count: int, seed: int = 1) -> Tuple[List[Row], List[Row]]:
+    """Objects and owners shaped like the production tables; ``updated_at`` goes back one minute per row."""
+    rnd = random.Random(seed)
+    now = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    owners_count = max(1, count // 3)
+    objects = []
+    for index in range(count):
+        object_id = index + 1
+        street = STREETS[rnd.randrange(len(STREETS))]
+        address = f"Москва, {street}, д. {rnd.randint(1, 180)}"
+        objects.append(
+            {
+                "id": object_id,
+                "external_id": str(object_id),
+                "address": address,
+                "full_address": f"{address}, кв. {rnd.randint(1, 400)}" if rnd.random() < 0.5 else None,
+                "location": "Москва",
+                "complex_name": COMPLEXES[rnd.randrange(len(COMPLEXES))] if rnd.random() < 0.3 else None,
+                "metro": METRO[rnd.randrange(len(METRO))],
+                "price": rnd.randrange(30_000, 400_000, 500),
+                "rooms": rnd.randint(1, 5),
+                "area": round(rnd.uniform(25, 160), 1),
+                "floor": rnd.randint(1, 30),
+                "status": STATUSES[rnd.randrange(len(STATUSES))],
+                "moderator": rnd.random() > 0.1,
+                "owners_id": rnd.randint(1, owners_count),
+                "cian_id": None,
+                "cian_url": None,
+                "description": "Светлая квартира с ремонтом, рядом метро и парк." * rnd.randint(1, 4),
+                "updated_at": _stamp(now - timedelta(minutes=index)),
+            }
+        )
+    owners = [
+        {"id": owner_id, "name": f"Собственник {owner_id}", "phone": f"+7999{owner_id:07d}", "url": None, "parsed": False}
+        for owner_id in range(1, owners_count + 1)
+    ]
+    return objects, owners
+
+
+def _stamp(moment: datetime) -> str:
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.%f+00:00")
+
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+    return value
+
+
+def _split_top(text: str) -> List[str]:
+    """Split a PostgREST list on top-level commas, keeping quoted values and nested groups intact."""
+    parts: List[str] = []
+    depth = 0
+    quoted = False
+    escaped = False
+    current = ""
+    for char in text:
+        if escaped:
+            current += char
+            escaped = False
+            continue
+        if char == "\\" and quoted:
+            current += char
+            escaped = True
+            continue
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and char == "," and depth == 0:
+            parts.append(current)
+            current = ""
+            continue
+        current += char
+    if current:
+        parts.append(current)
+    return parts
+
+
+def _coerce(sample: Any, literal: str) -> Any:
+    if isinstance(sample, bool):
+        return literal.lower() == "true"
+    if isinstance(sample, (int, float)):
+        try:
+            return float(literal)
+        except ValueError:
+            return literal
+    return literal
+
+
+def _like_regex(pattern: str, insensitive: bool) -> "re.Pattern[str]":
+    body = ".*".join(re.escape(chunk) for chunk in re.split(r"[*%]", pattern))
+    return re.compile(f"^{body}$", re.IGNORECASE | re.DOTALL if insensitive else re.DOTALL)
+
+
+def compile_condition(column: str, expression: str) -> Predicate:
+    operator, _, literal = expression.partition(".")
+    if operator == "not":
+        inner = compile_condition(column, literal)
+        return lambda row: not inner(row)
+    if operator == "is":
+        expected = {"null": None, "true": True, "false": False}[literal.lower()]
+        return lambda row: row.get(column) is expected
+    if operator in ("like", "ilike"):
+        regex = _like_regex(_unquote(literal), operator == "ilike")
+        return lambda row: row.get(column) is not None and regex.match(str(row[column])) is not None
+    if operator == "in":
+        values = {_unquote(item) for item in _split_top(literal.strip()[1:-1])}
+        return lambda row: row.get(column) is not None and _as_text(row[column]) in values
+    value = _unquote(literal)
+    compare = {
+        "eq": lambda a, b: a == b,
+        "neq": lambda a, b: a != b,
+        "gt": lambda a, b: a > b,
+        "gte": lambda a, b: a >= b,
+        "lt": lambda a, b: a < b,
+        "lte": lambda a, b: a <= b,
+    }.get(operator)
+    if compare is None:
+        raise ValueError(f"unsupported operator: {operator}")
+
+    def predicate(row: Row) -> bool:
+        current = row.get(column)
+        if current is None:
+            return False
+        try:
+            return compare(current, _coerce(current, value))
+        except TypeError:
+            return compare(str(current), value)
+
+    return predicate
+
+
+def compile_logic(kind: str, body: str) -> Predicate:
+    predicates = []
+    for part in _split_top(body.strip()[1:-1]):
+        head, _, rest = part.partition("(")
+        if head in ("and", "or", "not.and", "not.or") and part.endswith(")"):
+            inner = compile_logic(head.split(".")[-1], "(" + rest)
+            predicates.append((lambda p: lambda row: not p(row))(inner) if head.startswith("not.") else inner)
+        else:
+            column, _, expression = part.partition(".")
+            predicates.append(compile_condition(column, expression))
+    if kind == "or":
+        return lambda row: any(predicate(row) for predicate in predicates)
+    return lambda row: all(predicate(row) for predicate in predicates)
+
+
+def _as_text(value: Any) -> str:
+    if isinstance(value, bool):
+        return str(value).lower()
+    return str(value)
+
+
+def _order_key(column: str, descending: bool, nulls_last: bool) -> Callable[[Row], Any]:
+    # the list is sorted with reverse=descending, so "nulls after" flips with the direction
+    def key(row: Row) -> Any:
+        value = row.get(column)
+        is_null = value is None
+        nulls_after = is_null != descending if nulls_last else is_null == descending
+        return (nulls_after, 0 if is_null else value)
+
+    return key
+
+
+def sort_rows(rows: List[Row], order: str) -> List[Row]:
+    for part in reversed(order.split(",")):
+        column, *modifiers = part.split(".")
+        descending = "desc" in modifiers
+        # PostgREST default: nulls last for asc, nulls first for desc
+        nulls_last = "nullslast" in modifiers or ("nullsfirst" not in modifiers and not descending)
+        rows.sort(key=_order_key(column, descending, nulls_last), reverse=descending)
+    return rows
+
+
+class FakeTable:
+    """Rows by primary key plus an ascending (updated_at, id) list for keyset pages and text for search."""
+
+    def __init__(self, name: str, rows: Iterable[Row], pk: str = "id") -> None:
+        self.name = name
+        self.pk = pk
+        self.rows: Dict[Any, Row] = {}
+        self.keys: List[Tuple[str, Any]] = []
+        self.text: Dict[Any, str] = {}
+        self.digits: Dict[Any, str] = {}
+        for row in rows:
+            self.rows[row[pk]] = row
+            self._index_text(row)
+        self.keys = sorted(self._sort_key(row) for row in self.rows.values())
+        self._planned: Dict[str, Tuple[float, int]] = {}
+
+    def default_order(self) -> str:
+        return f"updated_at.desc.nullslast,{self.pk}.desc"
+
+    def lookup(self, value: str) -> Optional[Row]:
+        for key in (value, _coerce(0, value)):
+            if isinstance(key, float) and key.is_integer():
+                key = int(key)
+            if key in self.rows:
+                return self.rows[key]
+        return None
+
+    def candidates(self, params: List[Tuple[str, str]]) -> Optional[List[Row]]:
+        """Rows narrowed through the primary key when the query filters on it with eq or in."""
+        for column, expression in params:
+            if column != self.pk:
+                continue
+            operator, _, literal = expression.partition(".")
+            if operator == "eq":
+                row = self.lookup(_unquote(literal))
+                return [row] if row else []
+            if operator == "in":
+                values = [_unquote(item) for item in _split_top(literal.strip()[1:-1])]
+                return [row for row in map(self.lookup, values) if row is not None]
+        return None
+
+    def walk_default_order(self, keyset: Optional[str]) -> Iterable[Row]:
+        """Rows in ``updated_at desc nulls last, id desc`` order, starting after the keyset cursor if any."""
+        end = len(self.keys)
+        match = KEYSET_RE.match(keyset) if keyset else None
+        if match:
+            cursor_id: Any = _unquote(match.group("id"))
+            cursor_id = int(cursor_id) if cursor_id.isdigit() else cursor_id
+            end = bisect.bisect_left(self.keys, (_unquote(match.group("stamp")), cursor_id))
+        for index in range(end - 1, -1, -1):
+            yield self.rows[self.keys[index][1]]
+
+    def planned_count(self, cache_key: str, exact: Callable[[], int]) -> int:
+        # like the planner's estimate: cheap, refreshed now and then rather than per request
+        cached = self._planned.get(cache_key)
+        now = time.monotonic()
+        if cached is None or now - cached[0] > PLANNED_COUNT_TTL:
+            cached = (now, exact())
+            self._planned[cache_key] = cached
+        return cached[1]
+
+    def write(self, row: Row) -> None:
+        key = row[self.pk]
+        previous = self.rows.get(key)
+        if previous is not None:
+            self.keys.pop(bisect.bisect_left(self.keys, self._sort_key(previous)))
+        row["updated_at"] = _stamp(datetime.now(timezone.utc))  # the updated_at trigger
+        self.rows[key] = row
+        self._index_text(row)
+        bisect.insort(self.keys, self._sort_key(row))
+
+    def delete(self, row: Row) -> None:
+        key = row[self.pk]
+        self.keys.pop(bisect.bisect_left(self.keys, self._sort_key(row)))
+        self.rows.pop(key, None)
+        self.text.pop(key, None)
+        self.digits.pop(key, None)
+
+    def _sort_key(self, row: Row) -> Tuple[str, Any]:
+        return (row.get("updated_at") or "", row[self.pk])
+
+    def _index_text(self, row: Row) -> None:
+        key = row[self.pk]
+        self.text[key] = " | ".join(str(row[column]) for column in SEARCH_TEXT_COLUMNS if row.get(column)).casefold()
+        self.digits[key] = "|".join(
+            re.sub(r"\D", "", str(row[column])) for column in PRICE_COLUMNS if row.get(column) is not None
+        )
+
+
+class FakeUpstreams:
+    def __init__(
+        self,
+        objects: int = 10_000,
+        seed: int = 1,
+        latency: Optional[Dict[str, float]] = None,
+        jitter: float = 0.2,
+        cian_offers: int = 500,
+    ) -> None:
+        object_rows, owner_rows = generate_objects(objects, seed)
+        self.tables = {"objects": FakeTable("objects", object_rows), "owners": FakeTable("owners", owner_rows)}
+        self.latency = {"supabase": 0.0, "cian": 0.0, "telegram": 0.0, **(latency or {})}
+        self.jitter = jitter
+        self.random = random.Random(seed)
+        self.requests: Dict[str, int] = {"supabase": 0, "cian": 0, "telegram": 0}
+        self.telegram_messages = 0
+        self.cian_report = self._cian_report(object_rows, cian_offers)
+
+    def app(self) -> Starlette:
+        return Starlette(
+            routes=[
+                Route("/rest/v1/rpc/{function}", self.rpc, methods=["GET", "POST"]),
+                Route("/rest/v1/{table}", self.rest, methods=["GET", "HEAD", "PATCH", "POST", "DELETE"]),
+                Route("/cian/v1/{method}", self.cian, methods=["GET"]),
+                Route("/telegram/bot{token}/{method}", self.telegram, methods=["GET", "POST"]),
+                Route("/_fake/stats", self.stats, methods=["GET"]),
+            ]
+        )
+
+    async def _delay(self, service: str) -> None:
+        self.requests[service] += 1
+        latency = self.latency[service]
+        if latency > 0:
+            spread = latency * self.jitter
+            await asyncio.sleep(max(0.0, self.random.uniform(latency - spread, latency + spread)) / 1000)
+
+    async def stats(self, request: Request) -> Response:
+        return JSONResponse(
+            {
+                "requests": self.requests,
+                "telegram_messages": self.telegram_messages,
+                "rows": {name: len(table.rows) for name, table in self.tables.items()},
+            }
+        )
+
+    async def rest(self, request: Request) -> Response:
+        await self._delay("supabase")
+        table = self.tables.get(request.path_params["table"])
+        if table is None:
+            return JSONResponse({"code": "42P01", "message": "relation does not exist"}, status_code=404)
+        params = parse_qsl(request.url.query, keep_blank_values=True)
+        prefer = request.headers.get("prefer", "")
+        if request.method in ("GET", "HEAD"):
+            return self._select(table, params, prefer, request.method == "HEAD")
+        if request.method == "POST":
+            return self._upsert(table, params, prefer, await request.json())
+        matched = self._filter(table, params)
+        if request.method == "PATCH":
+            patch = await request.json()
+            changed = []
+            for row in matched:
+                updated = {**row, **patch}
+                table.write(updated)
+                changed.append(updated)
+            return self._written(changed, prefer, params)
+        for row in matched:
+            table.delete(row)
+        return self._written(matched, prefer, params)
+
+    async def rpc(self, request: Request) -> Response:
+        await self._delay("supabase")
+        function = request.path_params["function"]
+        if function == "apply_patches":
+            return await self._apply_patches(request)
+        if function != "search_objects":
+            return JSONResponse({"code": "PGRST202", "message": "function not found"}, status_code=404)
+        params = parse_qsl(request.url.query, keep_blank_values=True)
+        term = dict(params).get("term", "").strip()
+        table = self.tables["objects"]
+        rows = self._search(table, term)
+        predicate = self._predicate([(k, v) for k, v in params if k not in ("term", "id_column")])
+        rows = [row for row in rows if predicate(row)]
+        limit = dict(params).get("limit")
+        return self._project(rows[: int(limit)] if limit else rows, params)
+
+    async def _apply_patches(self, request: Request) -> Response:
+        """Same contract as sql/apply_patches.sql: update existing rows only, return how many."""
+        args = await request.json()
+        table = self.tables.get(args.get("target"))
+        if table is None:
+            return JSONResponse({"code": "42P01", "message": "relation does not exist"}, status_code=400)
+        id_column = args.get("id_column", "id")
+        updated = 0
+        for patch in args.get("patches") or []:
+            existing = table.lookup(str(patch.get(id_column)))
+            if existing is not None:
+                table.write({**existing, **{k: v for k, v in patch.items() if k != id_column}})
+                updated += 1
+        return JSONResponse(updated)
+
+    async def cian(self, request: Request) -> Response:
+        await self._delay("cian")
+        method = request.path_params["method"]
+        if method == "get-order":
+            return JSONResponse(self.cian_report)
+        if method == "get-last-order-info":
+            return JSONResponse(
+                {
+                    "operationId": "fake-info",
+                    "result": {
+                        "activeFeedUrls": ["https://example.com/feed.xml"],
+                        "hasImagesProblems": False,
+                        "hasOffersProblems": True,
+                        "lastFeedCheckDate": "2025-01-01T12:00:00Z",
+                        "lastProcessDate": "2025-01-01T11:55:00Z",
+                        "orderId": 1,
+                    },
+                }
+            )
+        if method == "get-images-report":
+            page = int(request.query_params.get("page", 1))
+            size = int(request.query_params.get("pageSize", 100))
+            offers = self.cian_report["result"]["offers"][(page - 1) * size : page * size]
+            items = [{"externalId": offer["externalId"], "images": [{"url": f"https://img.example.com/{offer['offerId']}.jpg", "errors": []}]} for offer in offers]
+            return JSONResponse({"operationId": "fake-images", "result": {"items": items}})
+        return JSONResponse({"message": "unknown method"}, status_code=404)
+
+    async def telegram(self, request: Request) -> Response:
+        await self._delay("telegram")
+        self.telegram_messages += 1
+        return JSONResponse({"ok": True, "result": {"message_id": self.telegram_messages, "date": int(time.time())}})
+
+    def _predicate(self, params: List[Tuple[str, str]]) -> Predicate:
+        predicates: List[Predicate] = []
+        for column, expression in params:
+            if column in ("select", "order", "limit", "offset", "on_conflict", "columns"):
+                continue
+            if column in ("or", "and"):
+                predicates.append(compile_logic(column, expression))
+            elif column in ("not.or", "not.and"):
+                inner = compile_logic(column[4:], expression)
+                predicates.append(lambda row, inner=inner: not inner(row))
+            else:
+                predicates.append(compile_condition(column, expression))
+        return lambda row: all(predicate(row) for predicate in predicates)
+
+    def _filter(self, table: FakeTable, params: List[Tuple[str, str]]) -> List[Row]:
+        predicate = self._predicate(params)
+        candidates = table.candidates(params)
+        rows = candidates if candidates is not None else table.rows.values()
+        return [row for row in rows if predicate(row)]
+
+    def _select(self, table: FakeTable, params: List[Tuple[str, str]], prefer: str, head: bool) -> Response:
+        args = dict(params)
+        limit = int(args["limit"]) if "limit" in args else None
+        offset = int(args.get("offset", 0))
+        order = args.get("order")
+        count_mode = next((item.split("=", 1)[1] for item in prefer.split(",") if item.strip().startswith("count=")), None)
+
+        if order == table.default_order() and limit is not None and table.candidates(params) is None and count_mode is None:
+            # the listing access path: walk the (updated_at, id) index and stop at the page end
+            keyset = args.get("or") if "or" in args and KEYSET_RE.match(args["or"]) else None
+            predicate = self._predicate([(k, v) for k, v in params if not (k == "or" and keyset)])
+            rows: List[Row] = []
+            for row in table.walk_default_order(keyset):
+                if predicate(row):
+                    rows.append(row)
+                    if len(rows) >= offset + limit:
+                        break
+            page = rows[offset:]
+            total = None
+        else:
+            matched = self._filter(table, params)
+            if order:
+                matched = sort_rows(matched, order)
+            total = len(matched)
+            if count_mode in ("planned", "estimated"):
+                cache_key = json.dumps([item for item in params if item[0] not in ("select", "limit", "offset")])
+                total = table.planned_count(cache_key, lambda: len(matched))
+            page = matched[offset : offset + limit if limit is not None else None]
+        span = f"{offset}-{offset + len(page) - 1}" if page else "*"
+        content_range = f"{span}/{total if count_mode else '*'}"
+        if head:
+            return Response(status_code=200, headers={"Content-Range": content_range})
+        response = self._project(page, params)
+        response.headers["Content-Range"] = content_range
+        return response
+
+    def _project(self, rows: List[Row], params: List[Tuple[str, str]], status_code: int = 200) -> Response:
+        columns = _split_top(dict(params).get("select", "*"))
+        embeds = [column for column in columns if "(" in column]
+        plain = [column for column in columns if "(" not in column]
+        owners = self.tables["owners"]
+        result = []
+        for row in rows:
+            item = dict(row) if "*" in plain else {column: row.get(column) for column in plain}
+            for embed in embeds:
+                alias, _, _ = embed.partition(":")
+                owner = owners.rows.get(row.get("owners_id"))
+                item[alias] = dict(owner) if owner else None
+            result.append(item)
+        return JSONResponse(result, status_code=status_code)
+
+    def _upsert(self, table: FakeTable, params: List[Tuple[str, str]], prefer: str, body: Any) -> Response:
+        payload = body if isinstance(body, list) else [body]
+        conflict = dict(params).get("on_conflict", table.pk)
+        written = []
+        for item in payload:
+            existing = table.lookup(str(item.get(conflict))) if conflict == table.pk else None
+            row = {**existing, **item} if existing and "merge-duplicates" in prefer else dict(item)
+            if table.pk not in row:
+                row[table.pk] = max(table.rows, default=0) + 1
+            table.write(row)
+            written.append(row)
+        return self._written(written, prefer, params, created=True)
+
+    def _written(self, rows: List[Row], prefer: str, params: List[Tuple[str, str]], created: bool = False) -> Response:
+        if "return=representation" in prefer:
+            return self._project(rows, params, status_code=201 if created else 200)
+        return Response(status_code=201 if created else 204)
+
+    def _search(self, table: FakeTable, term: str) -> List[Row]:
+        """Same precedence as sql/search_objects.sql: exact ID, then text, then price digits."""
+        if not term:
+            return []
+        ranked: Dict[Any, int] = {}
+        exact = table.lookup(term)
+        if exact is not None:
+            ranked[exact[table.pk]] = 0
+        words = [word for word in term.replace(",", "").casefold().split() if word]
+        pattern = re.compile(".*".join(re.escape(word) for word in words), re.DOTALL) if words else None
+        if pattern is not None:
+            for key, text in table.text.items():
+                if key not in ranked and pattern.search(text):
+                    ranked[key] = 1
+        digits = re.sub(r"\D", "", term) if NUMERIC_TERM_RE.match(term) else ""
+        if digits:
+            for key, values in table.digits.items():
+                if key not in ranked and digits in values:
+                    ranked[key] = 2
+        rows = [table.rows[key] for key in ranked]
+        rows = sort_rows(rows, "updated_at.desc.nullslast")
+        rows.sort(key=lambda row: ranked[row[table.pk]])
+        return rows
+
+    @staticmethod
+    def _cian_report(objects: List[Row], count: int) -> Dict[str, Any]:
+        offers = []
+        for index, row in enumerate(objects[:count]):
+            status = CIAN_STATUSES[index % len(CIAN_STATUSES)]
+            offers.append(
+                {
+                    "externalId": row["external_id"],
+                    "offerId": 300_000_000 + row["id"],
+                    "status": status,
+                    "errors": ["Укажите корректный адрес"] if status == "Refused" else [],
+                    "warnings": [],
+                    "url": f"https://www.cian.ru/rent/flat/{300_000_000 + row['id']}/",
+                }
+            )
+        return {"operationId": "fake-order", "result": {"offers": offers}}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Заглушки Supabase, CIAN и Telegram для нагрузочных тестов.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--objects", type=int, default=10_000, help="Сколько объектов сгенерировать")
+    parser.add_argument("--seed", type=int, default=1, help="Зерно генератора данных")
+    parser.add_argument("--supabase-latency", type=float, default=0.0, help="Задержка PostgREST, мс")
+    parser.add_argument("--cian-latency", type=float, default=0.0, help="Задержка CIAN API, мс")
+    parser.add_argument("--telegram-latency", type=float, default=0.0, help="Задержка Telegram, мс")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Разброс задержки, доля от неё")
+    parser.add_argument("--cian-offers", type=int, default=500, help="Объявлений в отчёте CIAN")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    started = time.perf_counter()
+    upstreams = FakeUpstreams(
+        objects=args.objects,
+        seed=args.seed,
+        latency={"supabase": args.supabase_latency, "cian": args.cian_latency, "telegram": args.telegram_latency},
+        jitter=args.jitter,
+        cian_offers=args.cian_offers,
+    )
+    print(f"Сгенерировано {args.objects} объектов за {time.perf_counter() - started:.1f} с", flush=True)
+    uvicorn.run(upstreams.app(), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
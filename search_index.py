@@ -0,0 +1,370 @@
+import bisect
+import heapq
+import math
+import re
+import threading
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+
+# field -> weight of a match in it
+ADDRESS_FIELDS = {
+    "address": 1.0,
+    "full_address": 1.0,
+    "complex_name": 1.0,
+    "metro": 0.8,
+    "subway": 0.8,
+    "metro_station": 0.8,
+}
+# address abbreviations and their full forms share one token
+ABBREVIATIONS = {
+    "ул": "улица",
+    "д": "дом",
+    "пр": "проспект",
+    "просп": "проспект",
+    "пр-т": "проспект",
+    "пр-кт": "проспект",
+    "пер": "переулок",
+    "ш": "шоссе",
+    "б-р": "бульвар",
+    "бул": "бульвар",
+    "наб": "набережная",
+    "пл": "площадь",
+    "туп": "тупик",
+    "ал": "аллея",
+    "мкр": "микрорайон",
+    "мкрн": "микрорайон",
+    "р-н": "район",
+    "обл": "область",
+    "г": "город",
+    "пос": "поселок",
+    "к": "корпус",
+    "корп": "корпус",
+    "стр": "строение",
+    "кв": "квартира",
+    "м": "метро",
+    "ст": "станция",
+}
+# tokens that describe the kind of place rather than the place; never required to match
+GENERIC_TOKENS = frozenset(ABBREVIATIONS.values())
+TOKEN_RE = re.compile(r"\w+(?:-\w+)*")
+EXACT_WEIGHT = 3.0
+PREFIX_WEIGHT = 2.0
+FUZZY_WEIGHT = 1.5
+MIN_PREFIX_LENGTH = 2
+MAX_PREFIX_EXPANSION = 64
+MIN_FUZZY_LENGTH = 4
+MIN_FUZZY_SIMILARITY = 0.45
+
+
+def normalize_tokens(text: Any) -> List[str]:
+    """Lower-case, ``ё`` -> ``е``, abbreviations expanded: ``"ул. Тёплая, д.5"`` -> ``["улица", "теплая", "дом", "5"]``."""
+    if text is None:
+        return []
+    if isinstance(text, (list, tuple)):
+        text = " ".join(str(item) for item in text if item is not None)
+    tokens: List[str] = []
+    for raw in TOKEN_RE.findall(str(text).casefold().replace("ё", "е")):
+        raw = raw.strip("_")
+        if raw in ABBREVIATIONS:
+            tokens.append(ABBREVIATIONS[raw])
+        elif "-" in raw:
+            # "санкт-петербург" is findable as a whole and by its parts
+            tokens.append(raw)
+            tokens.extend(ABBREVIATIONS.get(part, part) for part in raw.split("-") if part)
+        elif raw:
+            tokens.append(raw)
+    return tokens
+
+
+def _trigrams(token: str) -> Set[str]:
+    padded = f"  {token} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class AddressIndex:
+    """In-memory inverted index over the address-like fields of objects.
+
+    Documents are kept up to date one at a time with ``upsert``/``remove``.
+    ``search`` matches every query token exactly, by prefix (so a half-typed
+    last word already matches) or, for longer words, by trigram similarity to
+    tolerate typos; tokens are weighted by rarity so "улица"/"Москва" matter
+    less than a street name. All distinctive query tokens must match.
+    """
+
+    def __init__(self, fields: Optional[Dict[str, float]] = None) -> None:
+        self.fields = dict(fields or ADDRESS_FIELDS)
+        self._docs: Dict[Hashable, Dict[str, float]] = {}
+        self._postings: Dict[str, Dict[Hashable, float]] = {}
+        self._vocabulary: List[str] = []
+        self._trigram_tokens: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def rebuild(self, rows: Iterable[Tuple[Hashable, Dict[str, Any]]]) -> None:
+        with self._lock:
+            self._docs.clear()
+            self._postings.clear()
+            self._vocabulary.clear()
+            self._trigram_tokens.clear()
+            for key, row in rows:
+                self._add(key, row)
+
+    def upsert(self, key: Hashable, row: Dict[str, Any]) -> None:
+        with self._lock:
+            self._drop(key)
+            self._add(key, row)
+
+    def remove(self, key: Hashable) -> None:
+        with self._lock:
+            self._drop(key)
+
+    def search(self, term: str, limit: int = 50) -> List[Tuple[Hashable, float]]:
+        """Keys of the best matching documents with their scores, best first."""
+        query = list(dict.fromkeys(normalize_tokens(term)))
+        if not query:
+            return []
+        with self._lock:
+            total = len(self._docs) or 1
+            # a lone letter typed so far narrows nothing yet
+            required = [
+                token
+                for token in query
+                if token not in GENERIC_TOKENS and (len(token) >= MIN_PREFIX_LENGTH or token.isdigit())
+            ] or query
+            expansions = {token: self._expand(token) for token in query}
+            # intersect the rarest required tokens first; the rest only score the survivors
+            required.sort(key=lambda token: sum(len(self._postings[word]) for word, _ in expansions[token]))
+            scores: Optional[Dict[Hashable, float]] = None
+            for token in required:
+                best = self._score(expansions[token], total, scores)
+                if not best:
+                    return []
+                scores = {key: (scores or {}).get(key, 0.0) + score for key, score in best.items()}
+            for token in query:
+                if token not in required:
+                    for key, score in self._score(expansions[token], total, scores).items():
+                        scores[key] += score
+            return heapq.nlargest(limit, scores.items(), key=lambda hit: hit[1])
+
+    def _score(
+        self, expansion: List[Tuple[str, float]], total: int, within: Optional[Dict[Hashable, float]]
+    ) -> Dict[Hashable, float]:
+        """Best score per document for one query token, optionally only among ``within``."""
+        best: Dict[Hashable, float] = {}
+        for word, weight in expansion:
+            postings = self._postings[word]
+            idf = math.log(1 + total / len(postings))
+            if within is not None and len(within) < len(postings):
+                keys: Iterable[Hashable] = (key for key in within if key in postings)
+            else:
+                keys = postings if within is None else (key for key in postings if key in within)
+            for key in keys:
+                score = weight * postings[key] * idf
+                if score > best.get(key, 0.0):
+                    best[key] = score
+        return best
+
+    def _expand(self, token: str) -> List[Tuple[str, float]]:
+        """Vocabulary tokens ``token`` can stand for, each with its match weight."""
+        candidates: Dict[str, float] = {}
+        if token in self._postings:
+            candidates[token] = EXACT_WEIGHT
+        if len(token) >= MIN_PREFIX_LENGTH or token.isdigit():
+            # house numbers too: "Ленина 1" already finds "Ленина, 12" while typing
+            start = bisect.bisect_left(self._vocabulary, token)
+            for word in self._vocabulary[start : start + MAX_PREFIX_EXPANSION]:
+                if not word.startswith(token):
+                    break
+                candidates.setdefault(word, PREFIX_WEIGHT)
+        if not candidates and len(token) >= MIN_FUZZY_LENGTH and not token.isdigit():
+            grams = _trigrams(token)
+            overlaps: Dict[str, int] = {}
+            for gram in grams:
+                for word in self._trigram_tokens.get(gram, ()):
+                    overlaps[word] = overlaps.get(word, 0) + 1
+            for word, shared in overlaps.items():
+                similarity = shared / (len(grams) + len(_trigrams(word)) - shared)
+                if similarity >= MIN_FUZZY_SIMILARITY:
+                    candidates[word] = FUZZY_WEIGHT * similarity
+        return list(candidates.items())
+
+    def _add(self, key: Hashable, row: Dict[str, Any]) -> None:
+        tokens: Dict[str, float] = {}
+        for field, weight in self.fields.items():
+            for token in normalize_tokens(row.get(field)):
+                if weight > tokens.get(token, 0.0):
+                    tokens[token] = weight
+        if not tokens:
+            return
+        self._docs[key] = tokens
+        for token, weight in tokens.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                bisect.insort(self._vocabulary, token)
+                for gram in _trigrams(token):
+                    self._trigram_tokens.setdefault(gram, set()).add(token)
+            postings[key] = weight
+
+    def _drop(self, key: Hashable) -> None:
+        tokens = self._docs.pop(key, None)
+        if not tokens:
+            return
+        for token in tokens:
+            postings = self._postings[token]
+            postings.pop(key, None)
+            if postings:
+                continue
+            del self._postings[token]
+            del self._vocabulary[bisect.bisect_left(self._vocabulary, token)]
+            for gram in _trigrams(token):
+                words = self._trigram_tokens.get(gram)
+                if words is not None:
+                    words.discard(token)
+                    if not words:
+                        del self._trigram_tokens[gram]
+
+
+PRICE_FIELDS = ("price", "price_total", "price_rub", "price_month", "price_per_month")
+PRICE_MULTIPLIERS = {"к": 1_000, "k": 1_000, "т": 1_000, "тыс": 1_000, "м": 1_000_000, "m": 1_000_000, "млн": 1_000_000}
+PRICE_NUMBER = r"(\d{1,3}(?:[  ]\d{3})+|\d+)(?:[.,](\d+))?\s*(тыс|млн|к|k|т|м|m)?\.?"
+PRICE_CURRENCY = r"\s*(?:₽|руб\.?|р\.?)?"
+PRICE_BETWEEN_RE = re.compile(rf"^(?:от\s*)?{PRICE_NUMBER}{PRICE_CURRENCY}\s*(?:-|–|—|до)\s*{PRICE_NUMBER}{PRICE_CURRENCY}$")
+PRICE_UPTO_RE = re.compile(rf"^(?:до|<=?)\s*{PRICE_NUMBER}{PRICE_CURRENCY}$")
+PRICE_FROM_RE = re.compile(rf"^(?:от|>=?)\s*{PRICE_NUMBER}{PRICE_CURRENCY}$")
+
+
+def parse_price_range(term: str) -> Optional[Tuple[Optional[float], Optional[float]]]:
+    """``"50000-70000"`` -> ``(50000, 70000)``, ``"до 60к"`` -> ``(None, 60000)``, ``"от 1,5 млн"`` -> ``(1500000, None)``.
+
+    None if ``term`` is not a price range (a bare number is a digit search, not a range).
+    """
+    text = term.strip().casefold()
+    match = PRICE_BETWEEN_RE.match(text)
+    if match:
+        low_whole, low_fraction, low_unit, high_whole, high_fraction, high_unit = match.groups()
+        # "50-70к": the unit written once applies to both ends
+        low = _price_value(low_whole, low_fraction, low_unit or high_unit)
+        high = _price_value(high_whole, high_fraction, high_unit)
+        return (low, high) if low <= high else (high, low)
+    match = PRICE_UPTO_RE.match(text)
+    if match:
+        return None, _price_value(*match.groups())
+    match = PRICE_FROM_RE.match(text)
+    if match:
+        return _price_value(*match.groups()), None
+    return None
+
+
+def _price_value(whole: str, fraction: Optional[str], unit: Optional[str]) -> float:
+    value = float(re.sub(r"\s", "", whole) + ("." + fraction if fraction else ""))
+    return value * PRICE_MULTIPLIERS.get(unit or "", 1)
+
+
+def _price_number(value: Any) -> Optional[float]:
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    cleaned = re.sub(r"[\s ₽]|руб\.?", "", str(value)).replace(",", ".")
+    try:
+        return float(cleaned)
+    except ValueError:
+        return None
+
+
+class PriceIndex:
+    """Price fields of objects, precomputed once per object for numeric search.
+
+    ``match_digits`` answers "the term's digits appear in a price" (what
+    sql/search_objects.sql does) with one ``str.find`` sweep over the joined
+    digit strings; ``in_range`` answers price ranges by bisecting a sorted
+    list of the numeric values.
+    """
+
+    def __init__(self, fields: Iterable[str] = PRICE_FIELDS) -> None:
+        self.fields = tuple(fields)
+        self._digits: Dict[Hashable, str] = {}
+        self._values: Dict[Hashable, Tuple[float, ...]] = {}
+        self._sorted: List[Tuple[float, int, Hashable]] = []
+        self._order: Dict[Hashable, int] = {}
+        self._next_order = 0
+        self._blob: Optional[Tuple[str, List[int], List[Hashable]]] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._digits)
+
+    def rebuild(self, rows: Iterable[Tuple[Hashable, Dict[str, Any]]]) -> None:
+        with self._lock:
+            self._digits.clear()
+            self._values.clear()
+            self._sorted.clear()
+            self._order.clear()
+            self._next_order = 0
+            self._blob = None
+            for key, row in rows:
+                self._add(key, row)
+
+    def upsert(self, key: Hashable, row: Dict[str, Any]) -> None:
+        with self._lock:
+            self._drop(key)
+            self._add(key, row)
+
+    def remove(self, key: Hashable) -> None:
+        with self._lock:
+            self._drop(key)
+
+    def match_digits(self, digits: str) -> List[Hashable]:
+        if not digits:
+            return []
+        with self._lock:
+            if self._blob is None:
+                keys = list(self._digits)
+                offsets: List[int] = []
+                position = 0
+                for key in keys:
+                    offsets.append(position)
+                    position += len(self._digits[key]) + 1
+                self._blob = ("\n".join(self._digits[key] for key in keys), offsets, keys)
+            blob, offsets, keys = self._blob
+        found: List[Hashable] = []
+        position = blob.find(digits)
+        while position != -1:
+            slot = bisect.bisect_right(offsets, position) - 1
+            found.append(keys[slot])
+            # continue after this object's digits so each object is reported once
+            following = offsets[slot + 1] if slot + 1 < len(offsets) else len(blob)
+            position = blob.find(digits, following)
+        return found
+
+    def in_range(self, low: Optional[float], high: Optional[float]) -> List[Hashable]:
+        with self._lock:
+            start = 0 if low is None else bisect.bisect_left(self._sorted, (low,))
+            stop = len(self._sorted) if high is None else bisect.bisect_right(self._sorted, (high, float("inf")))
+            return list(dict.fromkeys(key for _, _, key in self._sorted[start:stop]))
+
+    def _add(self, key: Hashable, row: Dict[str, Any]) -> None:
+        raw = [row.get(field) for field in self.fields if row.get(field) not in (None, "")]
+        if not raw:
+            return
+        # a separator that is not a digit keeps matches from spanning two fields
+        self._digits[key] = " ".join("".join(ch for ch in str(value) if ch.isdigit()) for value in raw)
+        values = tuple(dict.fromkeys(number for number in map(_price_number, raw) if number is not None))
+        self._values[key] = values
+        # tie-breaker between equal prices; never reused, so _drop always finds its own entries
+        order = self._order.setdefault(key, self._next_order)
+        self._next_order += 1
+        for number in values:
+            bisect.insort(self._sorted, (number, order, key))
+        self._blob = None
+
+    def _drop(self, key: Hashable) -> None:
+        if self._digits.pop(key, None) is None:
+            return
+        order = self._order.pop(key)
+        for number in self._values.pop(key, ()):
+            del self._sorted[bisect.bisect_left(self._sorted, (number, order))]
+        self._blob = None
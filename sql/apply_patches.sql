@@ -0,0 +1,48 @@
+-- Bulk patch used by SupabaseClient.patch_records (CIAN corrections, status sync, backfill).
+-- One call applies a JSON array of partial rows with a single UPDATE ... FROM:
+--   * every element names its row by id_column and carries only the columns it changes;
+--     a column missing from an element keeps its current value;
+--   * it never inserts, so rows deleted in the meantime stay deleted;
+--   * returns the number of rows actually updated.
+-- Without the function the clients fall back to PATCH requests grouped by payload.
+--
+-- Apply in the Supabase SQL editor, then reload the PostgREST schema cache:
+--   notify pgrst, 'reload schema';
+
+create or replace function public.apply_patches(target text, patches jsonb, id_column text default 'id')
+returns integer
+language plpgsql
+as $$
+declare
+  columns text[];
+  assignments text;
+  updated integer;
+begin
+  select array_agg(distinct key) into columns
+  from jsonb_array_elements(patches) as element(patch), jsonb_object_keys(element.patch) as key
+  where key <> id_column;
+  if columns is null then
+    return 0;
+  end if;
+
+  select string_agg(
+    format('%1$I = case when p.patch ? %2$L then r.%1$I else t.%1$I end', c, c), ', '
+  ) into assignments
+  from unnest(columns) as c;
+
+  execute format(
+    'update public.%1$I t set %2$s '
+    'from jsonb_array_elements($1) as p(patch), '
+    'lateral jsonb_populate_record(null::public.%1$I, p.patch) as r '
+    'where t.%3$I = r.%3$I',
+    target, assignments, id_column
+  )
+  using patches;
+  get diagnostics updated = row_count;
+  return updated;
+end;
+$$;
+
+-- writes go through the service key only
+revoke execute on function public.apply_patches(text, jsonb, text) from public, anon, authenticated;
+grant execute on function public.apply_patches(text, jsonb, text) to service_role;
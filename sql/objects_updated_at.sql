@@ -0,0 +1,18 @@
+-- Keeps objects.updated_at current on every write.
+-- The mini app's keyset cursors and ETag validators rely on it changing whenever a row does.
+
+create or replace function public.touch_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+  new.updated_at := now();
+  return new;
+end;
+$$;
+
+drop trigger if exists objects_touch_updated_at on public.objects;
+create trigger objects_touch_updated_at
+  before update on public.objects
+  for each row
+  execute function public.touch_updated_at();
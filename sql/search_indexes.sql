@@ -0,0 +1,17 @@
+-- Indexes backing search_objects() and the default listing order.
+-- ilike '%term%' on address / full_address / complex_name is served by trigram GIN indexes
+-- instead of a sequential scan of public.objects.
+
+create extension if not exists pg_trgm;
+
+create index if not exists objects_address_trgm_idx
+  on public.objects using gin (address gin_trgm_ops);
+
+create index if not exists objects_full_address_trgm_idx
+  on public.objects using gin (full_address gin_trgm_ops);
+
+create index if not exists objects_complex_name_trgm_idx
+  on public.objects using gin (complex_name gin_trgm_ops);
+
+create index if not exists objects_updated_at_idx
+  on public.objects (updated_at desc nulls last);
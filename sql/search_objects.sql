@@ -0,0 +1,81 @@
+-- Ranked object search used by SupabaseClient.search_objects / list_objects(search=...).
+-- One call replaces the exact-ID lookup, the per-column ilike queries and the price fallback.
+-- Precedence: exact ID, then address / full_address / complex_name, then price digits.
+-- Each branch is a separate scan so every branch can use its own index:
+--   * the exact-ID branch compares the ID column in its own type (primary key index) and is
+--     skipped when the term cannot be cast to that type;
+--   * the text branch uses the trigram indexes from sql/search_indexes.sql;
+--   * the price branch reads the price columns of every row, so it only runs for purely
+--     numeric terms ("150000", "150 000") - an address with a house number stays indexed.
+-- id_column is the SUPABASE_OBJECT_ID_COLUMN the clients are configured with; they only
+-- pass it when it is not "id".
+--
+-- Apply in the Supabase SQL editor, then reload the PostgREST schema cache:
+--   notify pgrst, 'reload schema';
+
+drop function if exists public.search_objects(text);
+
+create or replace function public.search_objects(term text, id_column text default 'id')
+returns setof public.objects
+language plpgsql
+stable
+as $$
+declare
+  exact text := btrim(term);
+  pattern text := '%' || replace(replace(btrim(term), ',', ''), ' ', '%') || '%';
+  digits text := regexp_replace(term, '\D', '', 'g');
+  id_type text;
+  branches text[] := array[]::text[];
+begin
+  select format_type(a.atttypid, a.atttypmod) into id_type
+  from pg_attribute a
+  where a.attrelid = 'public.objects'::regclass
+    and a.attname = id_column
+    and a.attnum > 0
+    and not a.attisdropped;
+  if id_type is null then
+    raise exception 'public.objects has no column %', id_column;
+  end if;
+
+  begin
+    execute format('select cast($1 as %s)', id_type) using exact;
+    branches := branches || format(
+      'select o.%1$I as key, 0 as rank from public.objects o where o.%1$I = cast($1 as %2$s)',
+      id_column, id_type
+    );
+  exception when data_exception then
+    -- "Ленина 12" is not a bigint/uuid: no exact-ID branch
+    null;
+  end;
+
+  branches := branches || format(
+    'select o.%1$I as key, 1 as rank from public.objects o '
+    'where o.address ilike $2 or o.full_address ilike $2 or o.complex_name ilike $2',
+    id_column
+  );
+
+  if exact ~ '^[0-9][0-9 .,]*$' then
+    branches := branches || format(
+      'select o.%1$I as key, 2 as rank from public.objects o '
+      'where exists ('
+      '  select 1 from unnest(array['
+      '    to_jsonb(o) ->> ''price'', to_jsonb(o) ->> ''price_total'', to_jsonb(o) ->> ''price_rub'','
+      '    to_jsonb(o) ->> ''price_month'', to_jsonb(o) ->> ''price_per_month'''
+      '  ]) as price(value)'
+      '  where regexp_replace(price.value, ''\D'', '''', ''g'') like ''%%'' || $3 || ''%%'''
+      ')',
+      id_column
+    );
+  end if;
+
+  return query execute format(
+    'with hits as (%1$s), '
+    'ranked as (select key, min(rank) as rank from hits group by key) '
+    'select o.* from ranked join public.objects o on o.%2$I = ranked.key '
+    'order by ranked.rank, o.updated_at desc nulls last',
+    array_to_string(branches, ' union all '),
+    id_column
+  )
+  using exact, pattern, digits;
+end;
+$$;
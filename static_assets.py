@@ -0,0 +1,172 @@
+import gzip
+import hashlib
+import logging
+import mimetypes
+import re
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+from typing import Dict, List, Optional, Set, Tuple
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip variants are always built
+    brotli = None
+
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+COMPRESSIBLE_SUFFIXES = {".html", ".js", ".css", ".svg", ".json", ".txt", ".map"}
+MIN_COMPRESS_SIZE = 512
+# each encoded variant is a different representation and needs its own strong ETag (RFC 9110 8.8.3)
+ETAG_ENCODING_SUFFIXES = {"br": "-br", "gzip": "-gz"}
+
+# import ... from "./x.js", import "./x.js", export ... from "./x.js", import("./x.js")
+JS_IMPORT_RE = re.compile(r"""((?:\bfrom|\bimport)\s*\(?\s*)(["'])(\.{1,2}/[^"']+)\2()""")
+CSS_URL_RE = re.compile(r"""(url\(\s*)(["']?)(?!data:|https?:|//|#)([^"')]+)\2(\s*\))""")
+HTML_STATIC_RE = re.compile(r"""((?:src|href)=)(["'])/static/([^"'?#]+)\2""")
+
+
+@dataclass
+class Asset:
+    body: bytes
+    etag: str
+    media_type: str
+    gzip: Optional[bytes] = None
+    br: Optional[bytes] = None
+
+    def variant(self, accept_encoding: str) -> Tuple[bytes, Optional[str]]:
+        accepted = {token.split(";")[0].strip() for token in accept_encoding.lower().split(",")}
+        if self.br is not None and "br" in accepted:
+            return self.br, "br"
+        if self.gzip is not None and "gzip" in accepted:
+            return self.gzip, "gzip"
+        return self.body, None
+
+    def etag_for(self, encoding: Optional[str]) -> str:
+        """``etag`` for the identity body, ``"<hash>-br"`` / ``"<hash>-gz"`` for the compressed ones."""
+        if not encoding:
+            return self.etag
+        return self.etag[:-1] + ETAG_ENCODING_SUFFIXES[encoding] + '"'
+
+
+class AssetPipeline:
+    """Build-free asset pipeline for the webapp, run once at startup.
+
+    Every file under ``root`` is served both by its own path (revalidated via
+    ETag) and by a content-hashed name such as ``scripts/app.3f2a9c1d04be.js``
+    (cached as immutable). Relative ES module imports and CSS ``url()``
+    references are rewritten to the hashed names before hashing, so a change
+    to a dependency changes the hash of everything importing it. HTML pages get
+    their ``/static/...`` references rewritten the same way. Text assets are
+    precompressed with gzip, and with brotli when the module is installed.
+    """
+
+    def __init__(self, root: Path, url_prefix: str = "/static") -> None:
+        self.root = root
+        self.url_prefix = url_prefix.rstrip("/")
+        self.hashed_names: Dict[str, str] = {}
+        self.assets: Dict[str, Asset] = {}
+        self._immutable: Set[str] = set()
+
+    def build(self) -> "AssetPipeline":
+        files = [path for path in sorted(self.root.rglob("*")) if path.is_file() and not path.name.startswith(".")]
+        for path in files:
+            if path.suffix != ".html":
+                self._fingerprint(path.relative_to(self.root).as_posix(), ())
+        for path in files:
+            if path.suffix == ".html":
+                name = path.relative_to(self.root).as_posix()
+                self.assets[name] = self._asset(name, self._rewrite_html(path.read_bytes()))
+        logging.info(
+            "Собрано %s статических файлов (brotli: %s)", len(self.hashed_names), "да" if brotli else "нет"
+        )
+        return self
+
+    def url(self, name: str) -> str:
+        return f"{self.url_prefix}/{self.hashed_names.get(name, name)}"
+
+    def lookup(self, name: str) -> Optional[Asset]:
+        return self.assets.get(name)
+
+    def cache_control(self, name: str) -> str:
+        return IMMUTABLE_CACHE_CONTROL if name in self._immutable else REVALIDATE_CACHE_CONTROL
+
+    def _fingerprint(self, name: str, visiting: tuple) -> Optional[str]:
+        if name in self.hashed_names:
+            return self.hashed_names[name]
+        path = self.root / name
+        if name in visiting or not path.is_file() or path.suffix == ".html":
+            # import cycles and missing files keep their plain name
+            return None
+        body = path.read_bytes()
+        if name.endswith(".js"):
+            body = self._rewrite(body, JS_IMPORT_RE, name, visiting + (name,))
+        elif name.endswith(".css"):
+            body = self._rewrite(body, CSS_URL_RE, name, visiting + (name,))
+
+        digest = hashlib.sha256(body).hexdigest()[:12]
+        pure = PurePosixPath(name)
+        hashed = str(pure.with_name(f"{pure.stem}.{digest}{pure.suffix}"))
+        self.hashed_names[name] = hashed
+        self.assets[hashed] = self.assets[name] = self._asset(name, body)
+        self._immutable.add(hashed)
+        return hashed
+
+    def _rewrite(self, body: bytes, pattern: "re.Pattern[str]", name: str, visiting: tuple) -> bytes:
+        base = PurePosixPath(name).parent
+
+        def replace(match: "re.Match[str]") -> str:
+            reference = match.group(3)
+            target = _normalize(base / reference)
+            hashed = self._fingerprint(target, visiting) if target else None
+            if not hashed:
+                return match.group(0)
+            relative = _relative_to(hashed, base)
+            if name.endswith(".js") and not relative.startswith("."):
+                relative = "./" + relative
+            prefix, quote, _, suffix = match.groups()
+            return f"{prefix}{quote}{relative}{quote}{suffix}"
+
+        return pattern.sub(replace, body.decode("utf-8")).encode("utf-8")
+
+    def _rewrite_html(self, body: bytes) -> bytes:
+        def replace(match: "re.Match[str]") -> str:
+            return f"{match.group(1)}{match.group(2)}{self.url(match.group(3))}{match.group(2)}"
+
+        return HTML_STATIC_RE.sub(replace, body.decode("utf-8")).encode("utf-8")
+
+    def _asset(self, name: str, body: bytes) -> Asset:
+        media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        if media_type.startswith("text/") or media_type in {"application/javascript", "image/svg+xml"}:
+            media_type += "; charset=utf-8"
+        asset = Asset(
+            body=body,
+            etag='"' + hashlib.sha256(body).hexdigest()[:32] + '"',
+            media_type=media_type,
+        )
+        if PurePosixPath(name).suffix in COMPRESSIBLE_SUFFIXES and len(body) >= MIN_COMPRESS_SIZE:
+            asset.gzip = gzip.compress(body, compresslevel=9, mtime=0)
+            if brotli is not None:
+                asset.br = brotli.compress(body)
+        return asset
+
+
+def _normalize(path: PurePosixPath) -> Optional[str]:
+    parts: List[str] = []
+    for part in path.parts:
+        if part == "..":
+            if not parts:
+                return None
+            parts.pop()
+        elif part not in ("", "."):
+            parts.append(part)
+    return "/".join(parts)
+
+
+def _relative_to(target: str, base: PurePosixPath) -> str:
+    base_parts = [part for part in base.parts if part not in ("", ".")]
+    target_parts = target.split("/")
+    common = 0
+    while common < min(len(base_parts), len(target_parts) - 1) and base_parts[common] == target_parts[common]:
+        common += 1
+    return "/".join([".."] * (len(base_parts) - common) + target_parts[common:])
@@ -1,7 +1,42 @@
+import asyncio
+import base64
+import functools
+import json
+import re
+
+import anyio.to_thread
+import httpx
 import requests
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional
-from requests.exceptions import HTTPError
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+from cache import RecordCache
+from metrics import InstrumentedTransport
+from search_index import parse_price_range
+from singleflight import SingleFlight
+
+if TYPE_CHECKING:
+    from replica import LocalReplica
+
+# Postgres function installed by sql/search_objects.sql
+SEARCH_FUNCTION = "search_objects"
+SEARCH_TEXT_COLUMNS = ("address", "full_address", "complex_name")
+# only terms like "150000" or "150 000" are matched against prices, never an address with a house number
+NUMERIC_TERM_RE = re.compile(r"^[0-9][0-9 .,]*$")
+# price columns the or=(...) search fallback matches; the default OBJECT_CARD_COLUMNS selects the same ones
+SEARCH_PRICE_COLUMNS = ("price", "price_total", "price_rub")
+# Postgres function installed by sql/apply_patches.sql
+PATCH_FUNCTION = "apply_patches"
+# concurrent PATCH requests per patch_records() call when apply_patches() is not installed
+PATCH_CONCURRENCY = 8
+# PostgREST resource embedding of the owners row through the objects -> owners foreign key
+OWNER_EMBED = "owner:owners(*)"
+OWNER_ID_COLUMNS = ("owners_id", "owner_id")
+# 400: no relationship found, 300: ambiguous relationship
+EMBED_ERROR_STATUSES = (300, 400)
+# Budget for the encoded in.(...) list so batched reads stay well under proxy URL limits.
+IN_FILTER_MAX_CHARS = 4000
 
 
 def build_headers(api_key: str) -> Dict[str, str]:
@@ -13,6 +48,15 @@ def build_headers(api_key: str) -> Dict[str, str]:
     }
 
 
+def _parse_count(content_range: Optional[str]) -> Optional[int]:
+    if content_range and "/" in content_range:
+        try:
+            return int(content_range.split("/")[-1])
+        except ValueError:
+            pass
+    return None
+
+
 @dataclass
 class SupabaseClient:
     base_url: str
@@ -20,26 +64,80 @@ class SupabaseClient:
     table: str = "objects"
     object_id_column: str = "id"
     session: requests.Session = field(default_factory=requests.Session)
+    cache: Optional[RecordCache] = None
+    replica: Optional["LocalReplica"] = None
 
     def _rest_url(self) -> str:
         return self.base_url.rstrip("/") + f"/rest/v1/{self.table}"
 
-    def get_object(self, object_id: str, object_id_column: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    def get_object(
+        self, object_id: str, object_id_column: Optional[str] = None, include_owner: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """Fetch one object; ``include_owner`` embeds its owners row as ``owner`` in the same request."""
         column = object_id_column or self.object_id_column
-        params = {column: f"eq.{object_id}", "select": "*"}
+        if self.cache is not None:
+            cached = _cached_object(self.cache, self.table, column, object_id, include_owner)
+            if cached is not None:
+                return cached
+        local = _local(self.replica, self.table, column)
+        if local is not None and (not include_owner or _local(local, "owners", "id")):
+            return _local_object(local, self.table, object_id, include_owner)
+        params = {column: f"eq.{object_id}", "select": _with_owner("*") if include_owner else "*"}
         response = self.session.get(self._rest_url(), headers=build_headers(self.api_key), params=params, timeout=15)
+        if include_owner and response.status_code in EMBED_ERROR_STATUSES:
+            # no usable owners foreign key: load the owner separately
+            obj = self.get_object(object_id, column)
+            if obj is not None:
+                owner_id = _owner_id(obj)
+                obj["owner"] = self.get_record("owners", "id", owner_id) if owner_id else None
+            return obj
         response.raise_for_status()
         data = response.json()
+        if data and self.cache is not None:
+            _cache_object(self.cache, self.table, column, object_id, data[0])
         return data[0] if data else None
 
     def get_record(self, table: str, column: str, value: Any) -> Optional[Dict[str, Any]]:
+        if self.cache is not None:
+            cached = self.cache.get(table, column, value)
+            if cached is not None:
+                return cached
+        local = _local(self.replica, table, column)
+        if local is not None:
+            return local.get(table, value)
         url = self.base_url.rstrip("/") + f"/rest/v1/{table}"
         params = {column: f"eq.{value}", "select": "*", "limit": 1}
         response = self.session.get(url, headers=build_headers(self.api_key), params=params, timeout=15)
         response.raise_for_status()
         data = response.json()
+        if data and self.cache is not None:
+            self.cache.set(table, column, value, data[0])
         return data[0] if data else None
 
+    def get_records(self, table: str, column: str, values: Iterable[Any], select: str = "*") -> List[Dict[str, Any]]:
+        """Fetch every row whose ``column`` is in ``values``, chunking the in.(...) filter by URL length."""
+        local = _local(self.replica, table, column, select)
+        if local is not None:
+            return local.get_many(table, values, select)
+        url = self.base_url.rstrip("/") + f"/rest/v1/{table}"
+        rows: List[Dict[str, Any]] = []
+        for chunk in _in_filter_chunks(values):
+            params = {column: f"in.({','.join(chunk)})", "select": select}
+            response = self.session.get(url, headers=build_headers(self.api_key), params=params, timeout=15)
+            response.raise_for_status()
+            rows.extend(response.json())
+        return rows
+
+    def get_record_map(self, table: str, column: str, values: Iterable[Any]) -> Dict[str, Dict[str, Any]]:
+        """Rows keyed by ``str(row[column])``: cached rows first, the rest through chunked in.(...) queries."""
+        found, missing = _split_cached(self.cache, table, column, values)
+        if missing:
+            _collect_rows(self.cache, table, column, self.get_records(table, column, missing), found)
+        return found
+
+    def get_objects(self, object_ids: Iterable[Any], object_id_column: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        return self.get_record_map(self.table, object_id_column or self.object_id_column, object_ids)
+
     def update_object(self, object_id: str, payload: Dict[str, Any], object_id_column: Optional[str] = None) -> Dict[str, Any]:
         column = object_id_column or self.object_id_column
         headers = build_headers(self.api_key)
@@ -52,7 +150,11 @@ class SupabaseClient:
             timeout=15,
         )
         response.raise_for_status()
+        if self.cache is not None:
+            self.cache.invalidate(self.table, column, object_id)
         data = response.json()
+        if self.replica is not None:
+            self.replica.after_write(self.table, column, object_id, rows=data, patch=payload)
         return data[0] if data else payload
 
     def update_record(self, table: str, column: str, value: Any, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
@@ -67,9 +169,51 @@ class SupabaseClient:
             timeout=15,
         )
         response.raise_for_status()
+        if self.cache is not None:
+            self.cache.invalidate(table, column, value)
         data = response.json()
+        if self.replica is not None:
+            self.replica.after_write(table, column, value, rows=data, patch=payload)
         return data[0] if data else None
 
+    def patch_records(self, table: str, rows: List[Dict[str, Any]], column: str) -> int:
+        """Apply ``rows`` as patches to the existing rows they name by ``column``; returns the number written.
+
+        All rows go out in one apply_patches() call (sql/apply_patches.sql), whatever
+        columns each of them changes. Without the function, rows carrying the same
+        values share one PATCH with a chunked in.(...) filter. Neither path inserts,
+        so rows deleted in the meantime stay deleted.
+        """
+        patches = _merge_by_key(rows, column)
+        if not patches:
+            return 0
+        url = self.base_url.rstrip("/") + f"/rest/v1/rpc/{PATCH_FUNCTION}"
+        response = self.session.post(
+            url, headers=build_headers(self.api_key), json=_patch_args(table, patches, column), timeout=15
+        )
+        if response.status_code != 404:
+            response.raise_for_status()
+            written = int(response.json() or 0)
+        else:
+            # apply_patches() is not installed: one PATCH per distinct payload
+            url = self.base_url.rstrip("/") + f"/rest/v1/{table}"
+            headers = build_headers(self.api_key)
+            headers["Prefer"] = "return=minimal"
+            written = 0
+            for payload, keys in _group_by_payload(patches, column):
+                for chunk in _in_filter_chunks(keys):
+                    response = self.session.patch(
+                        url, headers=headers, params={column: f"in.({','.join(chunk)})"}, json=payload, timeout=15
+                    )
+                    response.raise_for_status()
+                    written += len(chunk)
+        for patch in patches:
+            if self.cache is not None:
+                self.cache.invalidate(table, column, patch[column])
+            if self.replica is not None:
+                self.replica.after_write(table, column, patch[column], patch=_without(patch, column))
+        return written
+
     def delete_object(self, object_id: str, object_id_column: Optional[str] = None) -> bool:
         column = object_id_column or self.object_id_column
         headers = build_headers(self.api_key)
@@ -82,6 +226,10 @@ class SupabaseClient:
         )
         if response.status_code not in (200, 204):
             response.raise_for_status()
+        if self.cache is not None:
+            self.cache.invalidate(self.table, column, object_id)
+        if self.replica is not None:
+            self.replica.after_write(self.table, column, object_id, deleted=True)
         if response.status_code == 204 or not response.content:
             return True
         return bool(response.json())
@@ -92,97 +240,684 @@ class SupabaseClient:
         limit: int = 50,
         select: str = "*",
         filters: Optional[Dict[str, str]] = None,
+        order: str = "updated_at.desc.nullslast",
+        include_owner: bool = False,
     ) -> List[Dict[str, Any]]:
-        base_params: Dict[str, Any] = {
+        local = None if include_owner else _local(self.replica, self.table, select=select, filters=filters)
+        if local is not None:
+            if search and search.strip():
+                items = local.search(self.table, search.strip(), select=select, filters=filters, limit=limit)
+                if items:
+                    return items
+            return local.select(self.table, select=select, filters=filters, order=order, limit=limit)
+        if include_owner:
+            select = _with_owner(select)
+        if search and search.strip():
+            items = self.search_objects(search.strip(), limit=limit, select=select, filters=filters)
+            if items:
+                return items
+
+        params: Dict[str, Any] = {
             "select": select,
             "limit": limit,
-            "order": "updated_at.desc.nullslast",
+            "order": order,
         }
+        if filters:
+            params.update(filters)
+        response = self.session.get(self._rest_url(), headers=build_headers(self.api_key), params=params, timeout=15)
+        response.raise_for_status()
+        return response.json()
 
-        def fetch(extra_params: Dict[str, Any]) -> List[Dict[str, Any]]:
-            params = base_params.copy()
-            params.update(extra_params)
-            if filters:
-                params.update(filters)
-            response = self.session.get(
-                self._rest_url(),
-                headers=build_headers(self.api_key),
-                params=params,
-                timeout=15,
-            )
-            response.raise_for_status()
-            return response.json()
+    def list_objects_page(
+        self,
+        limit: int = 50,
+        select: str = "*",
+        filters: Optional[Dict[str, str]] = None,
+        cursor: Optional[str] = None,
+        include_owner: bool = False,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """One keyset page ordered by (updated_at, id) desc; returns the rows and the next page cursor.
 
-        if not search:
-            return fetch({})
+        ``select`` must include ``updated_at`` and the ID column. Raises ValueError for a malformed cursor.
+        """
+        local = None if include_owner else _local(self.replica, self.table, select=select, filters=filters)
+        if local is not None:
+            order = f"updated_at.desc.nullslast,{self.object_id_column}.desc"
+            rows = local.select(self.table, select=select, filters=filters, order=order, limit=limit, cursor=cursor)
+            return rows, _next_cursor(rows, limit, self.object_id_column)
+        params: Dict[str, Any] = {
+            "select": _with_owner(select) if include_owner else select,
+            "limit": limit,
+            "order": f"updated_at.desc.nullslast,{self.object_id_column}.desc",
+        }
+        if filters:
+            params.update(filters)
+        if cursor:
+            params.update(_keyset_filter(cursor, self.object_id_column))
+        response = self.session.get(self._rest_url(), headers=build_headers(self.api_key), params=params, timeout=15)
+        response.raise_for_status()
+        rows = response.json()
+        return rows, _next_cursor(rows, limit, self.object_id_column)
 
-        term = search.strip()
-        term_digits = _digits(term)
-        like_term = term.replace(",", "").replace(" ", "%")
-        aggregated: Dict[str, Dict[str, Any]] = {}
+    def search_objects(
+        self,
+        term: str,
+        limit: int = 50,
+        select: str = "*",
+        filters: Optional[Dict[str, str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Ranked search in a single round trip (see sql/search_objects.sql)."""
+        local = _local(self.replica, self.table, select=select, filters=filters)
+        if local is not None:
+            return local.search(self.table, term, select=select, filters=filters, limit=limit)
+        price_range = parse_price_range(term)
+        if price_range is not None:
+            # "до 60к": gte/lte filters on the price columns instead of a text search
+            params = _price_range_params(price_range, select, limit, filters)
+            response = self.session.get(self._rest_url(), headers=build_headers(self.api_key), params=params, timeout=15)
+            if response.status_code != 400:
+                response.raise_for_status()
+                return response.json()
+        params = _search_params(term, select, limit, self.object_id_column)
+        if filters:
+            params.update(filters)
+        url = self.base_url.rstrip("/") + f"/rest/v1/rpc/{SEARCH_FUNCTION}"
+        response = self.session.get(url, headers=build_headers(self.api_key), params=params, timeout=15)
+        if response.status_code != 404:
+            response.raise_for_status()
+            return response.json()
 
-        def add_items(items: List[Dict[str, Any]]):
-            for item in items:
-                key = str(item.get(self.object_id_column) or item.get("id") or len(aggregated))
-                aggregated[key] = item
+        # search_objects() is not installed: fall back to one or=(...) query
+        params = {"select": select, "limit": limit, "order": "updated_at.desc.nullslast"}
+        if filters:
+            params.update(filters)
+        for condition in _search_or_filters(term, self.object_id_column):
+            params["or"] = condition
+            response = self.session.get(self._rest_url(), headers=build_headers(self.api_key), params=params, timeout=15)
+            if response.status_code != 400:
+                break
+        response.raise_for_status()
+        return _rank_search_results(response.json(), term, self.object_id_column)
 
-        # exact ID match
-        try:
-            if term:
-                add_items(fetch({self.object_id_column: f"eq.{term}"}))
-        except HTTPError as exc:
-            if exc.response.status_code not in (400, 404):
-                raise
-
-        # fuzzy address/full address search
-        for column in ("address", "full_address", "complex_name"):
-            try:
-                add_items(fetch({column: f"ilike.*{like_term}*"}))
-            except HTTPError as exc:
-                if exc.response.status_code not in (400, 404):
-                    raise
-
-        if not aggregated and term_digits:
-            fallback_items = fetch({})
-            for item in fallback_items:
-                if _item_price_matches(item, term_digits):
-                    key = str(item.get(self.object_id_column) or item.get("id") or len(aggregated))
-                    aggregated[key] = item
-
-        if aggregated:
-            return list(aggregated.values())[:limit]
-
-        # fallback to default listing if nothing matched
-        return fetch({})
-
-    def count_records(self, table: str, filters: Optional[Dict[str, str]] = None) -> int:
+    def count_records(self, table: str, filters: Optional[Dict[str, str]] = None, mode: str = "exact") -> int:
+        """Row count via ``Prefer: count=<mode>``; ``planned``/``estimated`` skip the full count on big tables."""
+        local = _local(self.replica, table, filters=filters)
+        if local is not None:
+            return local.count(table, filters)
         url = self.base_url.rstrip("/") + f"/rest/v1/{table}"
         headers = build_headers(self.api_key)
-        headers["Prefer"] = "count=exact"
+        headers["Prefer"] = f"count={mode}"
         params = {"select": "id", "limit": 1}
         if filters:
             params.update(filters)
         response = self.session.get(url, headers=headers, params=params, timeout=15)
         response.raise_for_status()
-        content_range = response.headers.get("Content-Range")
-        if content_range and "/" in content_range:
-            try:
-                return int(content_range.split("/")[-1])
-            except ValueError:
-                pass
+        count = _parse_count(response.headers.get("Content-Range"))
+        if count is not None:
+            return count
         return len(response.json())
-def _digits(value: Any) -> str:
-    return "".join(ch for ch in str(value) if ch.isdigit())
-
-
-def _item_price_matches(item: Dict[str, Any], digits: str) -> bool:
-    if not digits:
-        return False
-    for field in ("price", "price_total", "price_rub", "price_month"):
-        value = item.get(field)
-        if value is None:
-            continue
-        value_digits = _digits(value)
-        if value_digits and digits in value_digits:
+
+
+@dataclass
+class AsyncSupabaseClient:
+    """Async twin of SupabaseClient backed by a pooled keep-alive httpx client.
+
+    ``max_connections`` bounds the number of concurrent sockets to Supabase;
+    requests above the limit wait for a free connection for up to ``timeout``
+    seconds instead of opening new ones. With ``metrics_pool`` set, every call
+    is recorded in the metrics registry under that pool name. ``wrap_transport``
+    replaces or wraps the network transport (traffic recording and replay).
+    Reads and writes of the local ``replica`` run in worker threads.
+    """
+
+    base_url: str
+    api_key: str
+    table: str = "objects"
+    object_id_column: str = "id"
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    timeout: float = 15.0
+    client: Optional[httpx.AsyncClient] = None
+    cache: Optional[RecordCache] = None
+    replica: Optional["LocalReplica"] = None
+    flight: Optional[SingleFlight] = None
+    metrics_pool: Optional[str] = None
+    wrap_transport: Optional[Callable[[httpx.AsyncBaseTransport], httpx.AsyncBaseTransport]] = None
+
+    def __post_init__(self) -> None:
+        if self.client is None:
+            transport: httpx.AsyncBaseTransport = httpx.AsyncHTTPTransport(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    keepalive_expiry=self.keepalive_expiry,
+                )
+            )
+            if self.wrap_transport is not None:
+                transport = self.wrap_transport(transport)
+            if self.metrics_pool:
+                transport = InstrumentedTransport(transport, self.metrics_pool, self.max_connections)
+            self.client = httpx.AsyncClient(headers=build_headers(self.api_key), transport=transport, timeout=self.timeout)
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+    def _rest_url(self, table: Optional[str] = None) -> str:
+        return self.base_url.rstrip("/") + f"/rest/v1/{table or self.table}"
+
+    async def _get(
+        self, url: str, params: Dict[str, Any], headers: Optional[Dict[str, str]] = None
+    ) -> httpx.Response:
+        """GET through the single-flight group: identical concurrent reads share one response."""
+        if self.flight is None:
+            return await self.client.get(url, params=params, headers=headers)
+        key = (url, tuple(sorted((k, str(v)) for k, v in params.items())), tuple(sorted((headers or {}).items())))
+        return await self.flight.do(key, lambda: self.client.get(url, params=params, headers=headers))
+
+    async def get_object(
+        self, object_id: str, object_id_column: Optional[str] = None, include_owner: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        column = object_id_column or self.object_id_column
+        if self.cache is not None:
+            cached = _cached_object(self.cache, self.table, column, object_id, include_owner)
+            if cached is not None:
+                return cached
+        local = _local(self.replica, self.table, column)
+        if local is not None and (not include_owner or _local(local, "owners", "id")):
+            return await _in_thread(_local_object, local, self.table, object_id, include_owner)
+        params = {column: f"eq.{object_id}", "select": _with_owner("*") if include_owner else "*"}
+        response = await self._get(self._rest_url(), params=params)
+        if include_owner and response.status_code in EMBED_ERROR_STATUSES:
+            obj = await self.get_object(object_id, column)
+            if obj is not None:
+                owner_id = _owner_id(obj)
+                obj["owner"] = await self.get_record("owners", "id", owner_id) if owner_id else None
+            return obj
+        response.raise_for_status()
+        data = response.json()
+        if data and self.cache is not None:
+            _cache_object(self.cache, self.table, column, object_id, data[0])
+        return data[0] if data else None
+
+    async def get_record(self, table: str, column: str, value: Any) -> Optional[Dict[str, Any]]:
+        if self.cache is not None:
+            cached = self.cache.get(table, column, value)
+            if cached is not None:
+                return cached
+        local = _local(self.replica, table, column)
+        if local is not None:
+            return await _in_thread(local.get, table, value)
+        params = {column: f"eq.{value}", "select": "*", "limit": 1}
+        response = await self._get(self._rest_url(table), params=params)
+        response.raise_for_status()
+        data = response.json()
+        if data and self.cache is not None:
+            self.cache.set(table, column, value, data[0])
+        return data[0] if data else None
+
+    async def get_records(self, table: str, column: str, values: Iterable[Any], select: str = "*") -> List[Dict[str, Any]]:
+        local = _local(self.replica, table, column, select)
+        if local is not None:
+            return await _in_thread(local.get_many, table, list(values), select)
+        rows: List[Dict[str, Any]] = []
+        for chunk in _in_filter_chunks(values):
+            params = {column: f"in.({','.join(chunk)})", "select": select}
+            response = await self._get(self._rest_url(table), params=params)
+            response.raise_for_status()
+            rows.extend(response.json())
+        return rows
+
+    async def get_record_map(self, table: str, column: str, values: Iterable[Any]) -> Dict[str, Dict[str, Any]]:
+        found, missing = _split_cached(self.cache, table, column, values)
+        if missing:
+            _collect_rows(self.cache, table, column, await self.get_records(table, column, missing), found)
+        return found
+
+    async def get_objects(
+        self, object_ids: Iterable[Any], object_id_column: Optional[str] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        return await self.get_record_map(self.table, object_id_column or self.object_id_column, object_ids)
+
+    async def update_object(
+        self, object_id: str, payload: Dict[str, Any], object_id_column: Optional[str] = None
+    ) -> Dict[str, Any]:
+        column = object_id_column or self.object_id_column
+        response = await self.client.patch(
+            self._rest_url(),
+            headers={"Prefer": "return=representation"},
+            params={column: f"eq.{object_id}"},
+            json=payload,
+        )
+        response.raise_for_status()
+        if self.cache is not None:
+            self.cache.invalidate(self.table, column, object_id)
+        data = response.json()
+        if self.replica is not None:
+            await _in_thread(self.replica.after_write, self.table, column, object_id, rows=data, patch=payload)
+        return data[0] if data else payload
+
+    async def update_record(
+        self, table: str, column: str, value: Any, payload: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        response = await self.client.patch(
+            self._rest_url(table),
+            headers={"Prefer": "return=representation"},
+            params={column: f"eq.{value}"},
+            json=payload,
+        )
+        response.raise_for_status()
+        if self.cache is not None:
+            self.cache.invalidate(table, column, value)
+        data = response.json()
+        if self.replica is not None:
+            await _in_thread(self.replica.after_write, table, column, value, rows=data, patch=payload)
+        return data[0] if data else None
+
+    async def patch_records(self, table: str, rows: List[Dict[str, Any]], column: str) -> int:
+        patches = _merge_by_key(rows, column)
+        if not patches:
+            return 0
+        response = await self.client.post(self._rest_url(f"rpc/{PATCH_FUNCTION}"), json=_patch_args(table, patches, column))
+        if response.status_code != 404:
+            response.raise_for_status()
+            written = int(response.json() or 0)
+        else:
+            written = await self._patch_groups(table, patches, column)
+        for patch in patches:
+            if self.cache is not None:
+                self.cache.invalidate(table, column, patch[column])
+            if self.replica is not None:
+                await _in_thread(self.replica.after_write, table, column, patch[column], patch=_without(patch, column))
+        return written
+
+    async def _patch_groups(self, table: str, patches: List[Dict[str, Any]], column: str) -> int:
+        """Fallback without apply_patches(): one PATCH per distinct payload, a few groups at a time."""
+        semaphore = asyncio.Semaphore(PATCH_CONCURRENCY)
+
+        async def patch_group(payload: Dict[str, Any], keys: List[Any]) -> int:
+            async with semaphore:
+                for chunk in _in_filter_chunks(keys):
+                    response = await self.client.patch(
+                        self._rest_url(table),
+                        headers={"Prefer": "return=minimal"},
+                        params={column: f"in.({','.join(chunk)})"},
+                        json=payload,
+                    )
+                    response.raise_for_status()
+            return len(keys)
+
+        results = await asyncio.gather(
+            *(patch_group(payload, keys) for payload, keys in _group_by_payload(patches, column)), return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return sum(results)
+
+    async def delete_object(self, object_id: str, object_id_column: Optional[str] = None) -> bool:
+        column = object_id_column or self.object_id_column
+        response = await self.client.delete(
+            self._rest_url(),
+            headers={"Prefer": "return=representation"},
+            params={column: f"eq.{object_id}"},
+        )
+        if response.status_code not in (200, 204):
+            response.raise_for_status()
+        if self.cache is not None:
+            self.cache.invalidate(self.table, column, object_id)
+        if self.replica is not None:
+            await _in_thread(self.replica.after_write, self.table, column, object_id, deleted=True)
+        if response.status_code == 204 or not response.content:
             return True
-    return False
+        return bool(response.json())
+
+    async def list_objects(
+        self,
+        search: Optional[str] = None,
+        limit: int = 50,
+        select: str = "*",
+        filters: Optional[Dict[str, str]] = None,
+        order: str = "updated_at.desc.nullslast",
+        include_owner: bool = False,
+    ) -> List[Dict[str, Any]]:
+        local = None if include_owner else _local(self.replica, self.table, select=select, filters=filters)
+        if local is not None:
+            if search and search.strip():
+                items = await _in_thread(
+                    local.search, self.table, search.strip(), select=select, filters=filters, limit=limit
+                )
+                if items:
+                    return items
+            return await _in_thread(local.select, self.table, select=select, filters=filters, order=order, limit=limit)
+        if include_owner:
+            select = _with_owner(select)
+        if search and search.strip():
+            items = await self.search_objects(search.strip(), limit=limit, select=select, filters=filters)
+            if items:
+                return items
+
+        params: Dict[str, Any] = {
+            "select": select,
+            "limit": limit,
+            "order": order,
+        }
+        if filters:
+            params.update(filters)
+        response = await self._get(self._rest_url(), params=params)
+        response.raise_for_status()
+        return response.json()
+
+    async def list_objects_page(
+        self,
+        limit: int = 50,
+        select: str = "*",
+        filters: Optional[Dict[str, str]] = None,
+        cursor: Optional[str] = None,
+        include_owner: bool = False,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        local = None if include_owner else _local(self.replica, self.table, select=select, filters=filters)
+        if local is not None:
+            order = f"updated_at.desc.nullslast,{self.object_id_column}.desc"
+            rows = await _in_thread(
+                local.select, self.table, select=select, filters=filters, order=order, limit=limit, cursor=cursor
+            )
+            return rows, _next_cursor(rows, limit, self.object_id_column)
+        params: Dict[str, Any] = {
+            "select": _with_owner(select) if include_owner else select,
+            "limit": limit,
+            "order": f"updated_at.desc.nullslast,{self.object_id_column}.desc",
+        }
+        if filters:
+            params.update(filters)
+        if cursor:
+            params.update(_keyset_filter(cursor, self.object_id_column))
+        response = await self._get(self._rest_url(), params=params)
+        response.raise_for_status()
+        rows = response.json()
+        return rows, _next_cursor(rows, limit, self.object_id_column)
+
+    async def search_objects(
+        self,
+        term: str,
+        limit: int = 50,
+        select: str = "*",
+        filters: Optional[Dict[str, str]] = None,
+    ) -> List[Dict[str, Any]]:
+        local = _local(self.replica, self.table, select=select, filters=filters)
+        if local is not None:
+            return await _in_thread(local.search, self.table, term, select=select, filters=filters, limit=limit)
+        price_range = parse_price_range(term)
+        if price_range is not None:
+            response = await self._get(self._rest_url(), params=_price_range_params(price_range, select, limit, filters))
+            if response.status_code != 400:
+                response.raise_for_status()
+                return response.json()
+        params = _search_params(term, select, limit, self.object_id_column)
+        if filters:
+            params.update(filters)
+        response = await self._get(self._rest_url(f"rpc/{SEARCH_FUNCTION}"), params=params)
+        if response.status_code != 404:
+            response.raise_for_status()
+            return response.json()
+
+        params = {"select": select, "limit": limit, "order": "updated_at.desc.nullslast"}
+        if filters:
+            params.update(filters)
+        for condition in _search_or_filters(term, self.object_id_column):
+            params["or"] = condition
+            response = await self._get(self._rest_url(), params=params)
+            if response.status_code != 400:
+                break
+        response.raise_for_status()
+        return _rank_search_results(response.json(), term, self.object_id_column)
+
+    async def count_records(self, table: str, filters: Optional[Dict[str, str]] = None, mode: str = "exact") -> int:
+        """Row count via ``Prefer: count=<mode>``; ``planned``/``estimated`` skip the full count on big tables."""
+        local = _local(self.replica, table, filters=filters)
+        if local is not None:
+            return await _in_thread(local.count, table, filters)
+        params: Dict[str, Any] = {"select": "id", "limit": 1}
+        if filters:
+            params.update(filters)
+        response = await self._get(self._rest_url(table), headers={"Prefer": f"count={mode}"}, params=params)
+        response.raise_for_status()
+        count = _parse_count(response.headers.get("Content-Range"))
+        if count is not None:
+            return count
+        return len(response.json())
+
+
+def _merge_by_key(rows: List[Dict[str, Any]], column: str) -> List[Dict[str, Any]]:
+    """One patch per ``column`` value; a later row wins for the columns it repeats."""
+    merged: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        merged.setdefault(str(row[column]), {}).update(row)
+    return list(merged.values())
+
+
+def _without(row: Dict[str, Any], column: str) -> Dict[str, Any]:
+    return {key: value for key, value in row.items() if key != column}
+
+
+def _patch_args(table: str, patches: List[Dict[str, Any]], column: str) -> Dict[str, Any]:
+    return {"target": table, "patches": patches, "id_column": column}
+
+
+def _group_by_payload(rows: List[Dict[str, Any]], column: str) -> List[Tuple[Dict[str, Any], List[Any]]]:
+    """``(payload, keys)`` pairs: the ``column`` values of every row that carries the same other values."""
+    groups: Dict[str, Tuple[Dict[str, Any], List[Any]]] = {}
+    for row in rows:
+        payload = _without(row, column)
+        signature = json.dumps(payload, sort_keys=True, default=str)
+        groups.setdefault(signature, (payload, []))[1].append(row[column])
+    return list(groups.values())
+
+
+def _quote_filter_value(value: str) -> str:
+    escaped = value.replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+def _in_filter_chunks(values: Iterable[Any], max_chars: int = IN_FILTER_MAX_CHARS) -> Iterator[List[str]]:
+    chunk: List[str] = []
+    size = 0
+    for value in dict.fromkeys(str(value) for value in values):
+        quoted = _quote_filter_value(value)
+        length = len(quote(quoted, safe="")) + 3
+        if chunk and size + length > max_chars:
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(quoted)
+        size += length
+    if chunk:
+        yield chunk
+
+
+def _with_owner(select: str) -> str:
+    return f"{select},{OWNER_EMBED}"
+
+
+def _owner_id(row: Dict[str, Any]) -> Optional[Any]:
+    for key in OWNER_ID_COLUMNS:
+        if row.get(key):
+            return row[key]
+    return None
+
+
+def _cached_object(
+    cache: RecordCache, table: str, column: str, value: Any, include_owner: bool
+) -> Optional[Dict[str, Any]]:
+    obj = cache.get(table, column, value)
+    if obj is None or not include_owner:
+        return obj
+    owner_id = _owner_id(obj)
+    owner = cache.get("owners", "id", owner_id) if owner_id else None
+    if owner_id and owner is None:
+        return None
+    obj["owner"] = owner
+    return obj
+
+
+def _cache_object(cache: RecordCache, table: str, column: str, value: Any, row: Dict[str, Any]) -> None:
+    """Cache an object row and, if embedded, its owner under their own keys."""
+    obj = dict(row)
+    owner = obj.pop("owner", None)
+    cache.set(table, column, value, obj)
+    if isinstance(owner, dict) and owner.get("id") is not None:
+        cache.set("owners", "id", owner["id"], owner)
+
+
+def _local(
+    replica: Optional["LocalReplica"],
+    table: str,
+    column: Optional[str] = None,
+    select: str = "*",
+    filters: Optional[Dict[str, str]] = None,
+) -> Optional["LocalReplica"]:
+    """The replica if it can answer this read within its staleness bound, else None (go upstream)."""
+    if replica is not None and replica.serves(table, column, select, filters):
+        return replica
+    return None
+
+
+async def _in_thread(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run a blocking replica call in a worker thread so SQLite never stalls the event loop."""
+    return await anyio.to_thread.run_sync(functools.partial(func, *args, **kwargs))
+
+
+def _local_object(replica: "LocalReplica", table: str, object_id: Any, include_owner: bool) -> Optional[Dict[str, Any]]:
+    obj = replica.get(table, object_id)
+    if obj is not None and include_owner:
+        owner_id = _owner_id(obj)
+        obj["owner"] = replica.get("owners", owner_id) if owner_id else None
+    return obj
+
+
+def _split_cached(
+    cache: Optional[RecordCache], table: str, column: str, values: Iterable[Any]
+) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+    found: Dict[str, Dict[str, Any]] = {}
+    missing: List[str] = []
+    for value in dict.fromkeys(str(value) for value in values):
+        cached = cache.get(table, column, value) if cache is not None else None
+        if cached is not None:
+            found[value] = cached
+        else:
+            missing.append(value)
+    return found, missing
+
+
+def _collect_rows(
+    cache: Optional[RecordCache],
+    table: str,
+    column: str,
+    rows: List[Dict[str, Any]],
+    found: Dict[str, Dict[str, Any]],
+) -> None:
+    for row in rows:
+        key = str(row.get(column))
+        found.setdefault(key, row)
+        if cache is not None:
+            cache.set(table, column, key, row)
+
+
+def encode_cursor(updated_at: Optional[str], object_id: Any) -> str:
+    raw = json.dumps([updated_at, object_id], separators=(",", ":"), ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[str], Any]:
+    try:
+        updated_at, object_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+    return updated_at, object_id
+
+
+def _keyset_filter(cursor: str, id_column: str) -> Dict[str, str]:
+    # rows strictly after (updated_at, id) in "updated_at desc nulls last, id desc" order
+    updated_at, object_id = decode_cursor(cursor)
+    after_id = f"{id_column}.lt.{_quote_filter_value(str(object_id))}"
+    if updated_at is None:
+        return {"and": f"(updated_at.is.null,{after_id})"}
+    stamp = _quote_filter_value(str(updated_at))
+    return {"or": f"(updated_at.lt.{stamp},and(updated_at.eq.{stamp},{after_id}),updated_at.is.null)"}
+
+
+def _next_cursor(rows: List[Dict[str, Any]], limit: int, id_column: str) -> Optional[str]:
+    if not rows or len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_cursor(last.get("updated_at"), last.get(id_column))
+
+
+def _search_params(term: str, select: str, limit: int, id_column: str) -> Dict[str, Any]:
+    params: Dict[str, Any] = {"term": term, "select": select, "limit": limit}
+    if id_column != "id":
+        # the function's default; older installs without the argument keep working
+        params["id_column"] = id_column
+    return params
+
+
+def _search_or_filters(term: str, id_column: str) -> List[str]:
+    """``or=(...)`` filters for the search fallback, best first.
+
+    The full filter has the same tiers as sql/search_objects.sql: exact ID, text,
+    and for numeric terms the price columns. PostgREST cannot search digits
+    inside a number, so prices match the whole term. A 400 (an ID column that
+    cannot hold the term, a missing price column) retries without those clauses.
+    """
+    exact = term.strip()
+    like_term = exact.replace(",", "").replace(" ", "*")
+    text = [f"{column}.ilike.{_quote_filter_value(f'*{like_term}*')}" for column in SEARCH_TEXT_COLUMNS]
+    id_clause = [f"{id_column}.eq.{_quote_filter_value(exact)}"]
+    price: List[str] = []
+    if NUMERIC_TERM_RE.match(exact):
+        digits = "".join(ch for ch in exact if ch.isdigit())
+        price = [f"{column}.eq.{digits}" for column in SEARCH_PRICE_COLUMNS]
+    variants = (id_clause + text + price, text + price, id_clause + text, text)
+    return list(dict.fromkeys(f"({','.join(conditions)})" for conditions in variants))
+
+
+def _price_range_params(
+    price_range: Tuple[Optional[float], Optional[float]], select: str, limit: int, filters: Optional[Dict[str, str]]
+) -> Dict[str, Any]:
+    """Query params for a price range search: any of ``SEARCH_PRICE_COLUMNS`` within the bounds.
+
+    A 400 (a missing price column) makes the caller fall back to the plain search.
+    """
+    low, high = price_range
+    conditions = []
+    for column in SEARCH_PRICE_COLUMNS:
+        bounds = [
+            f"{column}.{operator}.{_price_literal(value)}"
+            for operator, value in (("gte", low), ("lte", high))
+            if value is not None
+        ]
+        conditions.append(f"and({','.join(bounds)})" if len(bounds) > 1 else bounds[0])
+    params: Dict[str, Any] = {"select": select, "limit": limit, "order": "updated_at.desc.nullslast"}
+    if filters:
+        params.update(filters)
+    params["or"] = f"({','.join(conditions)})"
+    return params
+
+
+def _price_literal(value: float) -> str:
+    return str(int(value)) if value.is_integer() else str(value)
+
+
+def _rank_search_results(items: List[Dict[str, Any]], term: str, id_column: str) -> List[Dict[str, Any]]:
+    # exact ID first, then address/complex matches, then prices; sorted() keeps the updated_at order inside a rank
+    exact = term.strip()
+    words = [re.escape(word) for word in exact.replace(",", "").casefold().split()]
+    pattern = re.compile(".*".join(words), re.DOTALL)
+
+    def rank(item: Dict[str, Any]) -> int:
+        if str(item.get(id_column)) == exact:
+            return 0
+        if any(pattern.search(str(item.get(column) or "").casefold()) for column in SEARCH_TEXT_COLUMNS):
+            return 1
+        return 2
+
+    return sorted(items, key=rank)
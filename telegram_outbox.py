@@ -0,0 +1,262 @@
+import asyncio
+import hashlib
+import logging
+import random
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+
+@dataclass
+class TelegramChannel:
+    token: str
+    chat_id: str
+    thread_id: Optional[int] = None
+
+    @property
+    def min_interval(self) -> float:
+        # Telegram allows ~1 message/s in private chats and ~20/min in groups
+        return 3.0 if str(self.chat_id).startswith("-") else 1.0
+
+
+@dataclass
+class OutboxMessage:
+    channel: str
+    text: str
+    merge_key: Optional[str] = None
+    not_before: float = 0.0
+    attempts: int = 0
+    row_id: Optional[int] = None
+
+
+class TelegramOutbox:
+    """In-process outbox for Telegram notifications.
+
+    Handlers enqueue and return immediately; a background task sends messages
+    in order per channel, spacing them by the chat's rate limit, honouring
+    ``retry_after`` on 429 and retrying network/5xx failures with exponential
+    backoff. Messages sharing a ``merge_key`` are held for ``merge_window``
+    seconds and collapse into the newest one; a text identical to the last one
+    sent under its key within ``dedupe_ttl`` is dropped. ``max_pending`` bounds
+    each channel separately, so a rate-limited channel that backs up cannot
+    crowd out the others. Channels sharing a chat share its rate limit but not
+    their order: a notice held for merging does not delay a showing. With ``db_path`` the pending messages are kept in
+    SQLite and resent after a restart.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        base_url: str = "https://api.telegram.org",
+        max_pending: int = 1000,
+        max_attempts: int = 8,
+        merge_window: float = 30.0,
+        dedupe_ttl: float = 3600.0,
+        db_path: Optional[str] = None,
+    ) -> None:
+        self.client = client
+        self.base_url = base_url.rstrip("/")
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.merge_window = merge_window
+        self.dedupe_ttl = dedupe_ttl
+        self.channels: Dict[str, TelegramChannel] = {}
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self._pending: List[OutboxMessage] = []
+        self._pending_per_channel: Dict[str, int] = {}
+        self._sending: Optional[OutboxMessage] = None
+        self._chat_ready: Dict[str, float] = {}
+        self._last_sent: Dict[str, Tuple[str, float]] = {}
+        self._wakeup = asyncio.Event()
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path:
+            self._open_db(db_path)
+
+    def register(self, name: str, token: Optional[str], chat_id: Optional[str], thread_id: Optional[str] = None) -> bool:
+        if not token or not chat_id:
+            return False
+        self.channels[name] = TelegramChannel(token, chat_id, int(thread_id) if thread_id else None)
+        return True
+
+    def enqueue(self, channel: str, text: str, merge_key: Optional[str] = None) -> bool:
+        if channel not in self.channels:
+            return False
+        if merge_key is not None:
+            last = self._last_sent.get(merge_key)
+            if last and last[0] == _digest(text) and time.monotonic() - last[1] < self.dedupe_ttl:
+                return True
+            for message in self._pending:
+                if (
+                    message.merge_key == merge_key
+                    and message.channel == channel
+                    and message.attempts == 0
+                    and message is not self._sending
+                ):
+                    message.text = text[:TELEGRAM_MESSAGE_LIMIT]
+                    self._save(message)
+                    return True
+        if self._pending_per_channel.get(channel, 0) >= self.max_pending:
+            self.dropped += 1
+            logging.warning("Очередь Telegram переполнена, сообщение для %s отброшено", channel)
+            return False
+        delay = self.merge_window if merge_key is not None else 0.0
+        message = OutboxMessage(channel, text[:TELEGRAM_MESSAGE_LIMIT], merge_key, time.monotonic() + delay)
+        self._append(message)
+        self._save(message)
+        self._wakeup.set()
+        return True
+
+    async def run(self) -> None:
+        while True:
+            delay = await self._send_due()
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def flush(self, timeout: float = 5.0) -> None:
+        """Best-effort send of everything pending, e.g. on shutdown; leftovers stay in SQLite."""
+        deadline = time.monotonic() + timeout
+        for message in self._pending:
+            message.not_before = min(message.not_before, time.monotonic())
+        while self._pending and time.monotonic() < deadline:
+            delay = await self._send_due()
+            if not self._pending:
+                break
+            await asyncio.sleep(min(delay, max(deadline - time.monotonic(), 0)))
+
+    def stats(self) -> Dict[str, int]:
+        return {"pending": len(self._pending), "sent": self.sent, "failed": self.failed, "dropped": self.dropped}
+
+    async def _send_due(self) -> float:
+        """Send every message that is due; return the seconds until the next one is."""
+        next_due = 60.0
+        blocked: set = set()
+        for message in list(self._pending):
+            channel = self.channels.get(message.channel)
+            if channel is None:
+                logging.warning("Канал Telegram %s не настроен, сообщение отброшено", message.channel)
+                self._remove(message)
+                continue
+            queue = (channel.chat_id, message.channel)
+            if queue in blocked:
+                continue
+            now = time.monotonic()
+            ready = max(message.not_before, self._chat_ready.get(channel.chat_id, 0.0))
+            if ready > now:
+                # keep per-channel order: later messages of this channel wait too
+                blocked.add(queue)
+                next_due = min(next_due, ready - now)
+                continue
+            await self._send(message, channel)
+            if message in self._pending:
+                blocked.add(queue)
+                next_due = min(next_due, max(message.not_before - time.monotonic(), 0.0))
+            else:
+                next_due = min(next_due, channel.min_interval)
+        return next_due
+
+    async def _send(self, message: OutboxMessage, channel: TelegramChannel) -> None:
+        payload: Dict[str, object] = {"chat_id": channel.chat_id, "text": message.text, "parse_mode": "HTML"}
+        if channel.thread_id:
+            payload["message_thread_id"] = channel.thread_id
+        url = f"{self.base_url}/bot{channel.token}/sendMessage"
+        self._sending = message
+        try:
+            response = await self.client.post(url, json=payload, timeout=10)
+        except httpx.HTTPError as exc:
+            self._retry(message, f"{type(exc).__name__}: {exc}")
+            return
+        finally:
+            self._sending = None
+        self._chat_ready[channel.chat_id] = time.monotonic() + channel.min_interval
+
+        if response.status_code == 429:
+            retry_after = _retry_after(response)
+            self._chat_ready[channel.chat_id] = time.monotonic() + retry_after
+            message.not_before = time.monotonic() + retry_after
+            self._save(message)
+            logging.info("Telegram просит подождать %s с для %s", retry_after, message.channel)
+        elif response.status_code >= 500:
+            self._retry(message, f"HTTP {response.status_code}")
+        elif response.is_error:
+            self.failed += 1
+            logging.warning("Telegram отклонил сообщение для %s: %s", message.channel, response.text)
+            self._remove(message)
+        else:
+            self.sent += 1
+            if message.merge_key is not None:
+                self._last_sent[message.merge_key] = (_digest(message.text), time.monotonic())
+            self._remove(message)
+
+    def _retry(self, message: OutboxMessage, reason: str) -> None:
+        message.attempts += 1
+        if message.attempts >= self.max_attempts:
+            self.failed += 1
+            logging.warning("Сообщение для %s не отправлено после %s попыток: %s", message.channel, message.attempts, reason)
+            self._remove(message)
+            return
+        backoff = min(2 ** message.attempts, 300) * (0.5 + random.random() / 2)
+        message.not_before = time.monotonic() + backoff
+        self._save(message)
+        logging.info("Повтор отправки в Telegram через %.1f с (%s)", backoff, reason)
+
+    def _append(self, message: OutboxMessage) -> None:
+        self._pending.append(message)
+        self._pending_per_channel[message.channel] = self._pending_per_channel.get(message.channel, 0) + 1
+
+    def _remove(self, message: OutboxMessage) -> None:
+        self._pending.remove(message)
+        self._pending_per_channel[message.channel] -= 1
+        if self._db is not None and message.row_id is not None:
+            with self._db:
+                self._db.execute("delete from outbox where id = ?", (message.row_id,))
+
+    def _open_db(self, path: str) -> None:
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                "create table if not exists outbox ("
+                "id integer primary key, channel text not null, text text not null, merge_key text, attempts integer not null)"
+            )
+        rows = self._db.execute("select id, channel, text, merge_key, attempts from outbox order by id").fetchall()
+        for row_id, channel, text, merge_key, attempts in rows:
+            self._append(OutboxMessage(channel, text, merge_key, 0.0, attempts, row_id))
+        if rows:
+            logging.info("Восстановлено %s неотправленных сообщений Telegram", len(rows))
+
+    def _save(self, message: OutboxMessage) -> None:
+        if self._db is None:
+            return
+        with self._db:
+            if message.row_id is None:
+                cursor = self._db.execute(
+                    "insert into outbox (channel, text, merge_key, attempts) values (?, ?, ?, ?)",
+                    (message.channel, message.text, message.merge_key, message.attempts),
+                )
+                message.row_id = cursor.lastrowid
+            else:
+                self._db.execute(
+                    "update outbox set text = ?, attempts = ? where id = ?",
+                    (message.text, message.attempts, message.row_id),
+                )
+
+
+def _retry_after(response: httpx.Response) -> float:
+    try:
+        return float(response.json()["parameters"]["retry_after"])
+    except (ValueError, KeyError, TypeError):
+        return float(response.headers.get("Retry-After", 5))
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
@@ -980,11 +980,12 @@ const openDetail = async (objectId, options = {}) => {
   }
   showModal('<div class="empty-state">Загружаем объект...</div>');
   try {
-    const response = await fetch(`/api/objects/${encodeURIComponent(objectId)}`);
+    const response = await fetch(`/api/objects/${encodeURIComponent(objectId)}?include=owner`);
     if (!response.ok) {
       throw new Error(await formatError(response));
     }
-    const data = await response.json();
+    const { owner, ...data } = await response.json();
+    if (owner && data.owners_id) ownerCache.set(data.owners_id, owner);
     objectCache.set(String(objectId), data);
     showModal(buildDetailHtml(data));
     if (data.owners_id) hydrateOwnerLink(data.owners_id);
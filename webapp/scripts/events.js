@@ -0,0 +1,35 @@
+// One EventSource per page for /api/events; the browser reconnects on its own and
+// resends Last-Event-ID, so missed events are replayed (or a "resync" event arrives).
+let source = null;
+let live = false;
+
+const connect = () => {
+  if (source || typeof EventSource === "undefined") return source;
+  source = new EventSource("/api/events");
+  source.addEventListener("open", () => {
+    live = true;
+  });
+  source.addEventListener("error", () => {
+    live = false;
+  });
+  return source;
+};
+
+export const isLive = () => live;
+
+export const onServerEvent = (name, handler) => {
+  const stream = connect();
+  if (!stream) return () => {};
+  const listener = (event) => {
+    let data = {};
+    try {
+      data = JSON.parse(event.data || "{}");
+    } catch (error) {
+      console.warn("Некорректное событие", name, error);
+      return;
+    }
+    handler(data);
+  };
+  stream.addEventListener(name, listener);
+  return () => stream.removeEventListener(name, listener);
+};
@@ -1,3 +1,4 @@
+import { onServerEvent } from "./events.js";
 import { initImportBanner } from "./import-banner.js";
 
 initImportBanner();
@@ -163,21 +164,27 @@ publishLinkInput?.addEventListener("input", () => {
   publishLinkSubmit.classList.toggle("hidden", !hasValue);
 });
 
+const renderModerationBadge = (count) => {
+  if (!moderationBadge) return;
+  moderationBadge.textContent = count > 99 ? "99+" : String(count);
+  moderationBadge.classList.toggle("hidden", count === 0);
+};
+
 const refreshModerationBadge = async () => {
   if (!moderationBadge) return;
   try {
     const response = await fetch("/api/moderation/count");
     if (!response.ok) throw new Error("count");
     const data = await response.json();
-    const count = Number(data.count) || 0;
-    moderationBadge.textContent = count > 99 ? "99+" : String(count);
-    moderationBadge.classList.toggle("hidden", count === 0);
+    renderModerationBadge(Number(data.count) || 0);
   } catch (error) {
     moderationBadge.classList.add("hidden");
   }
 };
 
 refreshModerationBadge();
+onServerEvent("moderation-count", (data) => renderModerationBadge(Number(data.count) || 0));
+onServerEvent("resync", refreshModerationBadge);
 
 const updateWizardStatus = (step, text, completed = false) => {
   wizardStatuses.forEach((label) => {
@@ -252,7 +259,7 @@ const fetchObjectSuggestions = async (query = "") => {
   }
   suggestionAbortController = new AbortController();
   try {
-    const params = new URLSearchParams({ limit: "10" });
+    const params = new URLSearchParams({ limit: "10", view: "card" });
     if (trimmed) params.set("q", trimmed);
     const response = await fetch(`/api/objects?${params.toString()}`, {
       signal: suggestionAbortController.signal,
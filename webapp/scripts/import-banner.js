@@ -1,3 +1,5 @@
+import { isLive, onServerEvent } from "./events.js";
+
 const POLL_INTERVAL_MS = 5 * 60 * 1000;
 
 const formatTimeLabel = (iso) => {
@@ -129,11 +131,16 @@ export const initImportBanner = (options = {}) => {
     countdownInterval = setInterval(updateCountdown, 1000);
     const delay = POLL_INTERVAL_MS;
     pollTimeout = setTimeout(async () => {
-      await fetchBannerData();
+      // while the event stream is up the server watches CIAN and pushes "cian-import"
+      if (!isLive()) await fetchBannerData();
       scheduleNext();
     }, delay);
   };
 
   fetchBannerData();
   scheduleNext();
+  onServerEvent("cian-import", () => {
+    fetchBannerData();
+    scheduleNext();
+  });
 };
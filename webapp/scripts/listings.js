@@ -1,3 +1,5 @@
+import { onServerEvent } from "./events.js";
+
 const DEAL_TYPE_FALLBACK = "rent";
 const POLL_INTERVAL_MS = 15 * 60 * 1000;
 const POLL_OFFSET_SECONDS = 15;
@@ -1581,14 +1583,21 @@ const renderPhotoCards = () => {
 
   let currentFilter = "published";
 
+  const isVisible = (item) => {
+    const status = item.meta?.status || "active";
+    const inTab =
+      currentFilter === "published"
+        ? status === "active"
+        : currentFilter === "staging"
+          ? status === "staging"
+          : currentFilter === "rejected"
+            ? status === "rejected"
+            : status !== "active" && status !== "staging" && status !== "rejected";
+    return inTab && matchesSearch(item);
+  };
+
   const render = () => {
-    const filtered = listingsCache.filter((item) => {
-      const status = item.meta?.status || "active";
-      if (currentFilter === "published") return status === "active";
-      if (currentFilter === "staging") return status === "staging";
-      if (currentFilter === "rejected") return status === "rejected";
-      return status !== "active" && status !== "staging" && status !== "rejected";
-    }).filter(matchesSearch);
+    const filtered = listingsCache.filter(isVisible);
 
     if (!filtered.length) {
       container.innerHTML = searchQuery
@@ -1598,25 +1607,31 @@ const renderPhotoCards = () => {
     }
 
     container.innerHTML = filtered.map((item) => renderCard(item)).join("");
+  };
 
-    container.querySelectorAll(".listing-card").forEach((card) => {
-      card.addEventListener("click", (event) => {
-        if (event.target.closest(".listing-menu-btn")) return;
-        const objectId = card.dataset.id;
-        if (objectId) {
-          window.location.href = `/object.html?id=${encodeURIComponent(objectId)}`;
-        }
-      });
-      const menuBtn = card.querySelector(".listing-menu-btn");
-      if (menuBtn) {
-        menuBtn.addEventListener("click", (event) => {
-          event.stopPropagation();
-          openCardMenu(card.dataset.id, menuBtn);
-        });
-      }
-    });
+  // Adds the cards of newly streamed entries below the ones already shown instead of rebuilding the list.
+  const appendCards = (entries) => {
+    const visible = entries.filter(isVisible);
+    if (!visible.length) return;
+    if (!container.querySelector(".listing-card")) container.innerHTML = "";
+    container.insertAdjacentHTML("beforeend", visible.map((item) => renderCard(item)).join(""));
   };
 
+  container.addEventListener("click", (event) => {
+    const card = event.target.closest(".listing-card");
+    if (!card) return;
+    const menuBtn = event.target.closest(".listing-menu-btn");
+    if (menuBtn) {
+      event.stopPropagation();
+      openCardMenu(card.dataset.id, menuBtn);
+      return;
+    }
+    const objectId = card.dataset.id;
+    if (objectId) {
+      window.location.href = `/object.html?id=${encodeURIComponent(objectId)}`;
+    }
+  });
+
 let cianStatusMap = {};
 
 const syncCianStatuses = async () => {
@@ -1654,40 +1669,71 @@ const syncCianStatuses = async () => {
   }
 };
 
+const toListingEntry = (item) => {
+  const obj = item.raw || {};
+  const cianStatus =
+    mapCianStatus(
+      obj.cian_status ||
+        obj.cianStatus ||
+        obj.status_cian ||
+        obj.statusCian ||
+        obj.cian_state
+    ) || resolveStatus(obj);
+  const hasCianId = hasCianIdentifier(obj.cian_id || obj.cianId);
+  let derivedStatus = cianStatus;
+  if (!hasCianId && !["rejected", "inactive"].includes(derivedStatus)) {
+    derivedStatus = "staging";
+  } else if (hasCianId && derivedStatus === "staging") {
+    derivedStatus = "active";
+  }
+  return {
+    ...item,
+    meta: {
+      status: derivedStatus,
+      dealType: resolveDealType(obj),
+      hasCianId,
+    },
+  };
+};
+
+// Objects arrive as NDJSON, one per line, so the first cards render before the whole catalog is loaded.
+const streamListings = async (onBatch) => {
+  const response = await fetch("/api/objects?limit=200&format=ndjson");
+  if (!response.ok) {
+    throw new Error(await response.text());
+  }
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+    const lines = buffer.split("\n");
+    buffer = done ? "" : lines.pop();
+    const batch = [];
+    lines.forEach((line) => {
+      if (!line.trim()) return;
+      const entry = JSON.parse(line);
+      if (entry.error) throw new Error(entry.error);
+      batch.push(entry);
+    });
+    if (batch.length) onBatch(batch);
+    if (done) break;
+  }
+};
+
 const fetchListings = async () => {
   try {
-    const response = await fetch("/api/objects?limit=200");
-    if (!response.ok) {
-      throw new Error(await response.text());
-    }
-    const data = await response.json();
-    listingsCache = (data.items || []).map((item) => {
-      const obj = item.raw || {};
-      const cianStatus =
-        mapCianStatus(
-          obj.cian_status ||
-            obj.cianStatus ||
-            obj.status_cian ||
-            obj.statusCian ||
-            obj.cian_state
-        ) || resolveStatus(obj);
-      const hasCianId = hasCianIdentifier(obj.cian_id || obj.cianId);
-      let derivedStatus = cianStatus;
-      if (!hasCianId && !["rejected", "inactive"].includes(derivedStatus)) {
-        derivedStatus = "staging";
-      } else if (hasCianId && derivedStatus === "staging") {
-        derivedStatus = "active";
-      }
-      return {
-        ...item,
-        meta: {
-          status: derivedStatus,
-          dealType: resolveDealType(obj),
-          hasCianId,
-        },
-      };
+    listingsCache = [];
+    let first = true;
+    await streamListings((batch) => {
+      const entries = batch.map(toListingEntry);
+      listingsCache.push(...entries);
+      if (first) render();
+      else appendCards(entries);
+      first = false;
     });
-    render();
+    if (!listingsCache.length) render();
     if (pendingAutoEdit) {
       const exists = listingsCache.find(
         (item) => resolveObjectId(item) === String(pendingAutoEdit)
@@ -1703,6 +1749,34 @@ const fetchListings = async () => {
   }
 };
 
+const applyListingUpdate = (id, item) => {
+  const key = String(id);
+  let entry = toListingEntry(item);
+  const override = cianStatusMap[key];
+  if (override) entry = { ...entry, meta: { ...entry.meta, status: override } };
+  const index = listingsCache.findIndex((existing) => resolveObjectId(existing) === key);
+  if (index >= 0) {
+    listingsCache = listingsCache.map((existing, position) => (position === index ? entry : existing));
+  } else {
+    listingsCache = [entry, ...listingsCache];
+  }
+  render();
+};
+
+  onServerEvent("object-updated", ({ id, item }) => {
+    if (id == null || !item) return;
+    applyListingUpdate(id, item);
+  });
+  onServerEvent("object-deleted", ({ id }) => {
+    if (id == null) return;
+    const key = String(id);
+    const remaining = listingsCache.filter((existing) => resolveObjectId(existing) !== key);
+    if (remaining.length === listingsCache.length) return;
+    listingsCache = remaining;
+    render();
+  });
+  onServerEvent("resync", () => fetchListings());
+
   searchInput?.addEventListener("input", (event) => {
     searchQuery = event.target.value.trim().toLowerCase();
     render();
@@ -1,3 +1,5 @@
+import { onServerEvent } from "./events.js";
+
 const listEl = document.getElementById("moderationList");
 const modalEl = document.getElementById("moderationModal");
 const modalCloseButtons = document.querySelectorAll('[data-close-modal="moderationModal"]');
@@ -24,6 +26,12 @@ const modalCounters = document.querySelectorAll(".counter-field");
 const modTabs = document.querySelectorAll(".mod-tab");
 const modPanes = document.querySelectorAll("[data-tab-panel]");
 const DEFAULT_TAB = "queue";
+const queueObjects = new Map();
+const queueOwners = new Map();
+const PREFETCH_DELAY_MS = 150;
+const prefetchRequested = new Set();
+let prefetchPending = [];
+let prefetchTimer = null;
 
 const escapeHtml = (value) =>
   String(value ?? "")
@@ -402,14 +410,57 @@ const populateModal = (data) => {
   setStatus("");
 };
 
+const fetchBatch = async (url, ids) => {
+  const response = await fetch(url, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ ids }),
+  });
+  if (!response.ok) throw new Error(await response.text());
+  const data = await response.json();
+  return data.items || {};
+};
+
+const prefetchQueueDetails = async (ids = []) => {
+  try {
+    const objects = await fetchBatch("/api/objects/batch", ids);
+    Object.entries(objects).forEach(([id, item]) => queueObjects.set(id, item));
+    const ownerIds = [...new Set(Object.values(objects).map((item) => item.owners_id).filter(Boolean))];
+    if (!ownerIds.length) return;
+    const owners = await fetchBatch("/api/owners/batch", ownerIds);
+    Object.entries(owners).forEach(([id, owner]) => queueOwners.set(id, owner));
+  } catch (error) {
+    // cards still open through the per-object requests; a later hover may try again
+    ids.forEach((id) => prefetchRequested.delete(String(id)));
+  }
+};
+
+// Only cards the user points at or focuses are prefetched, batched over a short window,
+// so opening the page still downloads just the card view of the queue.
+const schedulePrefetch = (objectId) => {
+  const id = String(objectId);
+  if (queueObjects.has(id) || prefetchRequested.has(id)) return;
+  prefetchRequested.add(id);
+  prefetchPending.push(id);
+  clearTimeout(prefetchTimer);
+  prefetchTimer = setTimeout(() => {
+    const ids = prefetchPending;
+    prefetchPending = [];
+    prefetchQueueDetails(ids);
+  }, PREFETCH_DELAY_MS);
+};
+
 const fetchAndOpen = async (objectId) => {
   try {
     setStatus("");
-    const response = await fetch(`/api/objects/${encodeURIComponent(objectId)}`);
-    if (!response.ok) {
-      throw new Error(await response.text());
+    let data = queueObjects.get(String(objectId));
+    if (!data) {
+      const response = await fetch(`/api/objects/${encodeURIComponent(objectId)}`);
+      if (!response.ok) {
+        throw new Error(await response.text());
+      }
+      data = await response.json();
     }
-    const data = await response.json();
     populateModal(data);
     openModal();
   } catch (error) {
@@ -459,17 +510,19 @@ const patchObject = async (payload) => {
     const text = await response.text();
     throw new Error(text || response.statusText);
   }
+  return response.json();
 };
 
 modApproveBtn?.addEventListener("click", async () => {
   setStatus("Сохраняем...", "");
   modApproveBtn.disabled = true;
   try {
-    await patchObject({ moderator: true });
+    const updated = await patchObject({ moderator: true });
+    queueObjects.delete(String(modState.objectId));
     setStatus("Готово. Объявление снято с очереди", "success");
     window.invalidateObjectCache?.(modState.objectId);
+    applyQueueChange(modState.objectId, updated);
     closeModal();
-    fetchModerationItems();
   } catch (error) {
     setStatus(`Ошибка: ${error.message}`, "error");
   } finally {
@@ -482,11 +535,12 @@ modSaveBtn?.addEventListener("click", async () => {
   modSaveBtn.disabled = true;
   try {
     const payload = gatherPayload();
-    await patchObject(payload);
+    const updated = await patchObject(payload);
+    queueObjects.delete(String(modState.objectId));
     setStatus("Изменения сохранены", "success");
     window.invalidateObjectCache?.(modState.objectId);
+    applyQueueChange(modState.objectId, updated);
     closeModal();
-    fetchModerationItems();
   } catch (error) {
     setStatus(`Ошибка: ${error.message}`, "error");
   } finally {
@@ -534,9 +588,12 @@ modOwnerButton?.addEventListener("click", async () => {
   if (!ownerId) return;
   modOwnerButton.disabled = true;
   try {
-    const response = await fetch(`/api/owners/${encodeURIComponent(ownerId)}`);
-    if (!response.ok) throw new Error("Нет данных");
-    const owner = await response.json();
+    let owner = queueOwners.get(String(ownerId));
+    if (!owner) {
+      const response = await fetch(`/api/owners/${encodeURIComponent(ownerId)}`);
+      if (!response.ok) throw new Error("Нет данных");
+      owner = await response.json();
+    }
     if (owner.url) {
       window.open(owner.url, "_blank", "noopener");
     } else {
@@ -554,8 +611,11 @@ const setLoadingState = (message = "Загружаем данные...") => {
   listEl.innerHTML = `<div class="empty-state">${message}</div>`;
 };
 
+let moderationItems = [];
+
 const renderModerationItems = (items = []) => {
   if (!listEl) return;
+  moderationItems = items;
   if (!items.length) {
     listEl.innerHTML = '<div class="empty-state">Очередь пустая. Все объявления проверены.</div>';
     return;
@@ -585,18 +645,55 @@ const fetchModerationItems = async () => {
   if (!listEl) return;
   setLoadingState();
   try {
-    const response = await fetch("/api/moderation");
+    const response = await fetch("/api/moderation?view=card");
     if (!response.ok) {
       const text = await response.text();
       throw new Error(text || response.statusText);
     }
     const data = await response.json();
-    renderModerationItems(data.items || []);
+    const items = data.items || [];
+    renderModerationItems(items);
   } catch (error) {
     setLoadingState(`Не удалось загрузить очередь: ${error.message}`);
   }
 };
 
+const inQueue = (row) => String(row?.moderator).toLowerCase() === "false";
+
+// Keep the rendered queue in step with a single changed object instead of reloading it.
+const applyQueueChange = (objectId, row = null) => {
+  const id = String(objectId);
+  const rest = moderationItems.filter((item) => String(item.id) !== id);
+  const queued = Boolean(row) && inQueue(row);
+  if (!queued && rest.length === moderationItems.length) return;
+  if (queued) {
+    const entry = { id: objectId, address: row.address ?? row.full_address, raw: row };
+    const index = moderationItems.findIndex((item) => String(item.id) === id);
+    if (index >= 0) rest.splice(index, 0, entry);
+    else rest.unshift(entry);
+    queueObjects.set(id, row);
+  } else {
+    queueObjects.delete(id);
+  }
+  renderModerationItems(rest);
+};
+
+onServerEvent("object-updated", ({ id, item }) => {
+  if (id == null || !item?.raw) return;
+  applyQueueChange(id, item.raw);
+});
+onServerEvent("object-deleted", ({ id }) => {
+  if (id != null) applyQueueChange(id);
+});
+onServerEvent("resync", () => fetchModerationItems());
+
+const prefetchCard = (event) => {
+  const objectId = event.target.closest?.(".moderation-card")?.dataset.objectId;
+  if (objectId) schedulePrefetch(objectId);
+};
+listEl?.addEventListener("pointerover", prefetchCard);
+listEl?.addEventListener("focusin", prefetchCard);
+
 listEl?.addEventListener("click", (event) => {
   const analyzeBtn = event.target.closest('[data-action="analyze"]');
   if (!analyzeBtn) return;